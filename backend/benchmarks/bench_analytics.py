@@ -0,0 +1,74 @@
+"""
+Benchmark for the per-GPU analytics in AnalyticsService.
+
+Times usage patterns, anomalies, trends and efficiency over synthetic
+history frames of growing size, up to 64 GPUs sampled every 30 seconds for
+7 days (1.3M rows), and prints the cost per row. The per-row cost should
+stay flat as GPUs and days grow, i.e. the analyses scale linearly.
+
+Usage:
+    python benchmarks/bench_analytics.py
+"""
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+import numpy as np
+import pandas as pd
+
+from src.service.analytics_cache import AnalyticsCache
+from src.service.analytics_service import AnalyticsService
+
+INTERVAL = 30  # seconds between samples
+SIZES = ((8, 1), (16, 1), (64, 1), (64, 2), (64, 4), (64, 7))  # (GPUs, days)
+SECTIONS = ('usage_patterns', 'anomalies', 'trends', 'efficiency')
+END = datetime(2024, 2, 20, tzinfo=timezone.utc)
+
+
+def synthetic_frame(gpu_count: int, days: int) -> pd.DataFrame:
+    """History frame shaped like DatabaseClient.get_gpu_frame"""
+    rng = np.random.default_rng(0)
+    times = pd.date_range(END - timedelta(days=days), END, freq=f'{INTERVAL}s', inclusive='right')
+    rows = len(times) * gpu_count
+    gpus = np.tile(np.arange(gpu_count, dtype=np.int16), len(times))
+    busy = (gpus % 4 == 0).astype(np.float32)
+    return pd.DataFrame({
+        'timestamp': np.repeat(times, gpu_count),
+        'gpu_index': gpus,
+        'gpu_utilization': np.clip(busy * 90 + rng.normal(5, 3, rows), 0, 100).astype(np.float32),
+        'temperature': (40 + busy * 35 + rng.normal(0, 2, rows)).astype(np.float32),
+        'memory_used': (2000 + busy * 60000 + rng.normal(0, 500, rows)).astype(np.float32),
+        'memory_total': np.float32(81559),
+        'power_draw': (70 + busy * 550 + rng.normal(0, 20, rows)).astype(np.float32)
+    })
+
+
+def bench(fn, frame: pd.DataFrame) -> float:
+    """Best-of-3 time in seconds"""
+    timings = []
+    for _ in range(3):
+        started = time.perf_counter()
+        fn(frame)
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def main():
+    service = AnalyticsService(AnalyticsCache({'enabled': False}))
+    analyses = {name: getattr(service, f'_{name}') for name in SECTIONS}
+    header = ''.join(f'{name:>16}' for name in SECTIONS)
+    print(f"{'GPUs':>5} {'days':>5} {'rows':>10}{header}   (ms, then ns per row)")
+    for gpu_count, days in SIZES:
+        frame = synthetic_frame(gpu_count, days)
+        timings = {name: bench(fn, frame) for name, fn in analyses.items()}
+        cells = ''.join(
+            f"{seconds * 1000:>9.1f}{seconds / len(frame) * 1e9:>7.0f}"
+            for seconds in timings.values()
+        )
+        print(f"{gpu_count:>5} {days:>5} {len(frame):>10}{cells}")
+
+
+if __name__ == "__main__":
+    main()
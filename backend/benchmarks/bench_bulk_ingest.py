@@ -0,0 +1,103 @@
+"""
+Benchmark for writing GPU metrics to PostgreSQL.
+
+Compares rows/sec of the original path (one INSERT statement and one
+transaction per sample, as insert_gpu_metrics does), a multi-row INSERT
+and COPY FROM STDIN, using synthetic 8-GPU samples. Rows go to a temporary
+copy of gpu_metrics, so the real table is untouched. Needs the database
+configured in the `database` section of config.yaml.
+
+Usage:
+    python benchmarks/bench_bulk_ingest.py [--rows 20000]
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from psycopg2.extras import Json
+
+from src.database.bulk import GPU_METRICS_COLUMNS, copy_rows, insert_rows
+from src.database.client import db
+
+TABLE = 'bench_gpu_metrics'
+GPU_COUNT = 8
+
+
+def synthetic_rows(count: int):
+    gpus = [{
+        'index': i, 'name': 'NVIDIA H100 80GB HBM3', 'fan_speed': 40,
+        'power_draw': 312.5, 'power_limit': 700, 'memory_total': 81559,
+        'memory_used': 40000 + i, 'gpu_utilization': 87, 'temperature': 61,
+        'peak_temperature': 70, 'temp_change_rate': 0.5, 'power_change_rate': 1.2,
+        'utilization_change_rate': -0.4, 'compute_mode': 'Default'
+    } for i in range(GPU_COUNT)]
+    return [
+        (f"2024-02-20T15:{(n // 60) % 60:02d}:{n % 60:02d}", 0, 0, False,
+         '12.2', '535.104.05', gpus, [], True)
+        for n in range(count)
+    ]
+
+
+def per_row(conn, rows):
+    # One statement and one commit per sample, like insert_gpu_metrics
+    placeholders = ', '.join(['%s'] * len(GPU_METRICS_COLUMNS))
+    with conn.cursor() as cur:
+        for row in rows:
+            cur.execute(
+                f"INSERT INTO {TABLE} ({', '.join(GPU_METRICS_COLUMNS)}) VALUES ({placeholders})",
+                row[:6] + (Json(row[6]), Json(row[7]), row[8]))
+            conn.commit()
+
+
+def multi_row_insert(conn, rows, chunk=5000):
+    with conn.cursor() as cur:
+        for start in range(0, len(rows), chunk):
+            insert_rows(cur, TABLE, GPU_METRICS_COLUMNS, rows[start:start + chunk])
+            conn.commit()
+
+
+def copy(conn, rows, chunk=5000):
+    with conn.cursor() as cur:
+        for start in range(0, len(rows), chunk):
+            copy_rows(cur, TABLE, GPU_METRICS_COLUMNS, rows[start:start + chunk])
+            conn.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=20000)
+    args = parser.parse_args()
+
+    rows = synthetic_rows(args.rows)
+    # The per-row path is slow; time it on a slice and report the rate
+    per_row_rows = rows[:min(len(rows), 2000)]
+
+    with db.get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(f"CREATE TEMP TABLE {TABLE} (LIKE gpu_metrics INCLUDING DEFAULTS)")
+        conn.commit()
+
+        print(f"{'method':>18} {'rows':>8} {'seconds':>9} {'rows/s':>10}")
+        baseline = None
+        for name, fn, data in (('per-row INSERT', per_row, per_row_rows),
+                               ('multi-row INSERT', multi_row_insert, rows),
+                               ('COPY', copy, rows)):
+            with conn.cursor() as cur:
+                cur.execute(f"TRUNCATE {TABLE}")
+            conn.commit()
+            started = time.perf_counter()
+            fn(conn, data)
+            elapsed = time.perf_counter() - started
+            rate = len(data) / elapsed
+            baseline = baseline or rate
+            print(f"{name:>18} {len(data):>8} {elapsed:>9.2f} {rate:>10.0f}  "
+                  f"({rate / baseline:.1f}x)")
+
+        with conn.cursor() as cur:
+            cur.execute(f"DROP TABLE {TABLE}")
+
+
+if __name__ == "__main__":
+    main()
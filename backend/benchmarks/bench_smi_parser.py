@@ -0,0 +1,79 @@
+"""
+Micro-benchmark for parsing nvidia-smi GPU query output.
+
+Compares smi_parser.parse_gpu_csv against the original per-line parsing
+loop (string split, strip, float()/int(float()) and one pydantic model per
+GPU) on synthetic 8, 64 and 256 GPU outputs.
+
+Usage:
+    python benchmarks/bench_smi_parser.py
+"""
+import sys
+import timeit
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from src.models.gpu_metrics import GpuMetrics
+from src.service.smi_parser import parse_gpu_csv
+
+GPU_COUNTS = (8, 64, 256)
+
+
+def synthetic_output(gpu_count: int) -> str:
+    lines = []
+    for i in range(gpu_count):
+        fan = "[N/A]" if i % 8 == 7 else str(30 + i % 40)
+        lines.append(
+            f"{i}, NVIDIA H100 80GB HBM3, {fan}, {100 + i % 200}.25, 81559, "
+            f"{1000 + i * 13}, {i % 100}, {40 + i % 40}, Default, 700.00"
+        )
+    return "\n".join(lines) + "\n"
+
+
+def legacy_parse(output: str):
+    """The parsing loop get_gpu_metrics used before smi_parser existed"""
+    gpus = []
+    for line in output.strip().split('\n'):
+        values = [v.strip() for v in line.split(',')]
+        if len(values) >= 10:
+            try:
+                gpus.append(GpuMetrics(
+                    index=int(values[0]),
+                    name=values[1],
+                    fan_speed=int(float(values[2])),
+                    power_draw=float(values[3]),
+                    power_limit=int(float(values[9])),
+                    memory_total=int(float(values[4])),
+                    memory_used=int(float(values[5])),
+                    gpu_utilization=int(float(values[6])),
+                    temperature=int(float(values[7])),
+                    peak_temperature=int(float(values[7])),
+                    temp_change_rate=0,
+                    compute_mode=values[8]
+                ))
+            except ValueError:
+                # The old loop aborted the whole sample here
+                return None
+    return gpus
+
+
+def bench(fn, output: str) -> float:
+    """Best-of-5 time per call in microseconds"""
+    timer = timeit.Timer(lambda: fn(output))
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat=5, number=number)) / number * 1e6
+
+
+def main():
+    print(f"{'GPUs':>6} {'parse_gpu_csv':>16} {'legacy loop':>14} {'speedup':>9}")
+    for gpu_count in GPU_COUNTS:
+        # Legacy timings use output without [N/A] so the old loop completes
+        output = synthetic_output(gpu_count)
+        clean = output.replace("[N/A]", "30")
+        fast = bench(parse_gpu_csv, output)
+        legacy = bench(legacy_parse, clean)
+        print(f"{gpu_count:>6} {fast:>13.1f} us {legacy:>11.1f} us {legacy / fast:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+-- One row per GPU per sample with typed columns, replacing gpu_metrics.gpus.
+-- Missing readings (reported as -1 by the collector) are stored as NULL.
+create table if not exists gpu_samples (
+    timestamp timestamptz not null,
+    gpu_index smallint not null,
+    name text,
+    fan_speed smallint,
+    power_draw real,
+    power_limit real,
+    memory_total integer,
+    memory_used integer,
+    gpu_utilization smallint,
+    temperature smallint,
+    peak_temperature smallint,
+    temp_change_rate real,
+    power_change_rate real,
+    utilization_change_rate real,
+    compute_mode text,
+
+    -- Per-GPU time-range queries are index range scans on this key
+    primary key (gpu_index, timestamp)
+);
+
+-- All-GPU time-range queries
+create index if not exists idx_gpu_samples_timestamp on gpu_samples(timestamp);
+
+comment on table gpu_samples is 'Per-GPU metrics, one row per GPU per collected sample';
+
+-- Copy one chunk of gpu_metrics rows newer than after_ts into gpu_samples.
+-- Returns the newest timestamp copied, or NULL once there is nothing left,
+-- so callers can loop with one short transaction per chunk:
+--     select backfill_gpu_samples(null);          -- first chunk
+--     select backfill_gpu_samples('<returned>');  -- next chunk
+-- Rows already present (e.g. written by the collector's dual write) are skipped.
+create or replace function backfill_gpu_samples(
+    after_ts timestamptz, chunk_rows integer default 5000
+)
+returns timestamptz as $$
+declare
+    upper_ts timestamptz;
+begin
+    select max(chunk.timestamp) into upper_ts from (
+        select timestamp from gpu_metrics
+        where after_ts is null or timestamp > after_ts
+        order by timestamp
+        limit chunk_rows
+    ) chunk;
+
+    if upper_ts is null then
+        return null;
+    end if;
+
+    -- Samples sharing upper_ts are all taken so the next chunk can start after it
+    insert into gpu_samples (
+        timestamp, gpu_index, name, fan_speed, power_draw, power_limit,
+        memory_total, memory_used, gpu_utilization, temperature,
+        peak_temperature, temp_change_rate, power_change_rate,
+        utilization_change_rate, compute_mode
+    )
+    select
+        m.timestamp,
+        (g->>'index')::smallint,
+        g->>'name',
+        nullif((g->>'fan_speed')::numeric, -1)::smallint,
+        nullif((g->>'power_draw')::numeric, -1)::real,
+        nullif((g->>'power_limit')::numeric, -1)::real,
+        nullif((g->>'memory_total')::numeric, -1)::integer,
+        nullif((g->>'memory_used')::numeric, -1)::integer,
+        nullif((g->>'gpu_utilization')::numeric, -1)::smallint,
+        nullif((g->>'temperature')::numeric, -1)::smallint,
+        nullif((g->>'peak_temperature')::numeric, -1)::smallint,
+        (g->>'temp_change_rate')::real,
+        (g->>'power_change_rate')::real,
+        (g->>'utilization_change_rate')::real,
+        g->>'compute_mode'
+    from gpu_metrics m
+    cross join lateral jsonb_array_elements(m.gpus) g
+    where (after_ts is null or m.timestamp > after_ts)
+      and m.timestamp <= upper_ts
+    on conflict (gpu_index, timestamp) do nothing;
+
+    return upper_ts;
+end;
+$$ language plpgsql;
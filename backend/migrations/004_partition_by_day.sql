@@ -0,0 +1,182 @@
+-- Range-partition gpu_metrics, gpu_samples and alert_history by day so
+-- retention is a partition drop instead of a row-by-row DELETE, and time
+-- range queries only touch the partitions they need.
+--
+-- Existing rows are not copied: each old table is attached as a single
+-- "<table>_legacy" partition covering everything before tomorrow (UTC),
+-- and daily partitions start from there. The legacy partition is dropped
+-- by retention like any other once all of its rows have expired.
+
+-- Create daily partitions of tbl from today through days_ahead days from
+-- now (UTC). Days already covered by another partition are skipped. Rows
+-- of a day that landed in the "<table>_default" partition before the day
+-- had its own (e.g. after a long downtime) are moved into the new
+-- partition. A day that cannot be created is reported as a warning and
+-- the remaining days are still created. Returns the number of partitions
+-- created.
+create or replace function create_daily_partitions(tbl text, days_ahead integer default 7)
+returns integer as $$
+declare
+    today date := (now() at time zone 'utc')::date;
+    default_name text := tbl || '_default';
+    col text;
+    day date;
+    day_start text;
+    day_end text;
+    partition_name text;
+    stranded boolean;
+    moved bigint;
+    created integer := 0;
+begin
+    -- Partition key column (timestamp, created_at or bucket)
+    select a.attname into col
+    from pg_partitioned_table p
+    join pg_attribute a on a.attrelid = p.partrelid and a.attnum = p.partattrs[0]
+    where p.partrelid = tbl::regclass;
+
+    for day in select generate_series(today, today + days_ahead, interval '1 day')::date loop
+        partition_name := format('%s_p%s', tbl, to_char(day, 'YYYYMMDD'));
+        if to_regclass(partition_name) is not null then
+            continue;
+        end if;
+        day_start := day::text || ' 00:00:00+00';
+        day_end := (day + 1)::text || ' 00:00:00+00';
+
+        stranded := false;
+        if to_regclass(default_name) is not null then
+            execute format('select exists (select 1 from %I where %I >= %L and %I < %L)',
+                           default_name, col, day_start, col, day_end) into stranded;
+        end if;
+
+        begin
+            if stranded then
+                -- The new partition's bound would be violated by rows in the
+                -- default partition; move them while it is detached
+                execute format('alter table %I detach partition %I', tbl, default_name);
+                execute format(
+                    'create table %I partition of %I for values from (%L) to (%L)',
+                    partition_name, tbl, day_start, day_end
+                );
+                execute format('insert into %I select * from %I where %I >= %L and %I < %L',
+                               partition_name, default_name, col, day_start, col, day_end);
+                get diagnostics moved = row_count;
+                execute format('delete from %I where %I >= %L and %I < %L',
+                               default_name, col, day_start, col, day_end);
+                execute format('alter table %I attach partition %I default', tbl, default_name);
+                raise notice 'Moved % rows of % from % to %',
+                    moved, day, default_name, partition_name;
+            else
+                execute format(
+                    'create table %I partition of %I for values from (%L) to (%L)',
+                    partition_name, tbl, day_start, day_end
+                );
+            end if;
+            created := created + 1;
+        exception
+            when invalid_object_definition then
+                -- Overlaps the legacy partition
+                null;
+            when others then
+                -- Only this day is rolled back; keep creating the others
+                raise warning 'Could not create partition % of %: %', partition_name, tbl, sqlerrm;
+        end;
+    end loop;
+    return created;
+end;
+$$ language plpgsql;
+
+-- Drop partitions of tbl whose whole range is older than keep_days days.
+-- Metadata only: no rows are scanned or deleted. Returns partitions dropped.
+create or replace function drop_expired_partitions(tbl text, keep_days integer)
+returns integer as $$
+declare
+    cutoff timestamptz := now() - make_interval(days => keep_days);
+    part record;
+    upper_bound text;
+    dropped integer := 0;
+begin
+    for part in
+        select c.oid::regclass as name, pg_get_expr(c.relpartbound, c.oid) as bound
+        from pg_inherits i
+        join pg_class c on c.oid = i.inhrelid
+        where i.inhparent = tbl::regclass
+    loop
+        -- e.g. FOR VALUES FROM ('2024-02-20 00:00:00+00') TO ('2024-02-21 00:00:00+00');
+        -- the default partition has no upper bound and is never dropped
+        upper_bound := substring(part.bound from 'TO \(''([^'']+)''\)');
+        if upper_bound is not null and upper_bound::timestamptz <= cutoff then
+            execute format('drop table %s', part.name);
+            dropped := dropped + 1;
+        end if;
+    end loop;
+    return dropped;
+end;
+$$ language plpgsql;
+
+-- Replace tbl with a table partitioned by day on col, keyed on key_columns
+-- (which must include col), with an index on each of index_columns.
+create or replace function convert_to_daily_partitions(
+    tbl text, col text, key_columns text, index_columns text[] default '{}'
+) returns void as $$
+declare
+    legacy text := tbl || '_legacy';
+    bound text := ((now() at time zone 'utc')::date + 1)::text || ' 00:00:00+00';
+    index_column text;
+begin
+    if exists (select 1 from pg_partitioned_table where partrelid = tbl::regclass) then
+        return;
+    end if;
+
+    execute format('alter table %I rename to %I', tbl, legacy);
+    -- The partitioned table's key (which includes col) replaces the old one
+    execute format('alter table %I drop constraint if exists %I', legacy, tbl || '_pkey');
+
+    execute format(
+        'create table %I (like %I including defaults including comments) partition by range (%I)',
+        tbl, legacy, col
+    );
+    execute format('alter table %I add primary key (%s)', tbl, key_columns);
+    foreach index_column in array index_columns loop
+        execute format('create index on %I (%I)', tbl, index_column);
+    end loop;
+
+    -- A validated CHECK matching the bound lets ATTACH skip its own full scan
+    execute format('alter table %I add constraint %I check (%I < %L)',
+                   legacy, legacy || '_bound', col, bound);
+    execute format('alter table %I attach partition %I for values from (minvalue) to (%L)',
+                   tbl, legacy, bound);
+    execute format('alter table %I drop constraint %I', legacy, legacy || '_bound');
+
+    -- Catches rows outside the created days instead of failing the insert
+    execute format('create table %I partition of %I default', tbl || '_default', tbl);
+    perform create_daily_partitions(tbl, 7);
+end;
+$$ language plpgsql;
+
+select convert_to_daily_partitions('gpu_metrics', 'timestamp', 'id, timestamp', array['timestamp']);
+select convert_to_daily_partitions('gpu_samples', 'timestamp', 'gpu_index, timestamp',
+                                   array['timestamp']);
+select convert_to_daily_partitions('alert_history', 'created_at', 'id, created_at',
+                                   array['created_at']);
+
+-- Named and added only once so re-running this migration stays a no-op
+do $$
+begin
+    if not exists (
+        select 1 from pg_constraint
+        where conrelid = 'alert_history'::regclass and conname = 'alert_history_threshold_fkey'
+    ) then
+        alter table alert_history
+            add constraint alert_history_threshold_fkey
+            foreign key (alert_threshold_id) references alert_thresholds(id);
+    end if;
+end;
+$$;
+
+-- Retention for alerts is now a partition drop
+create or replace function cleanup_old_alerts(days_to_keep integer)
+returns void as $$
+begin
+    perform drop_expired_partitions('alert_history', days_to_keep);
+end;
+$$ language plpgsql;
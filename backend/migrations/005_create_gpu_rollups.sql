@@ -0,0 +1,67 @@
+-- Per-GPU aggregates of gpu_samples at 10 second, 1 minute and 1 hour
+-- resolution, maintained by the collector as samples are written.
+-- Each metric keeps min, max, sum and count (avg = sum / count, and
+-- partial aggregates merge exactly) plus the last value in the bucket.
+-- Missing readings are left out of every aggregate.
+create table if not exists gpu_rollup_10s (
+    bucket timestamptz not null,
+    gpu_index smallint not null,
+    samples integer not null,
+    last_at timestamptz not null,
+
+    temperature_min real,
+    temperature_max real,
+    temperature_sum double precision not null default 0,
+    temperature_count integer not null default 0,
+    temperature_last real,
+
+    gpu_utilization_min real,
+    gpu_utilization_max real,
+    gpu_utilization_sum double precision not null default 0,
+    gpu_utilization_count integer not null default 0,
+    gpu_utilization_last real,
+
+    power_draw_min real,
+    power_draw_max real,
+    power_draw_sum double precision not null default 0,
+    power_draw_count integer not null default 0,
+    power_draw_last real,
+
+    memory_used_min real,
+    memory_used_max real,
+    memory_used_sum double precision not null default 0,
+    memory_used_count integer not null default 0,
+    memory_used_last real,
+
+    fan_speed_min real,
+    fan_speed_max real,
+    fan_speed_sum double precision not null default 0,
+    fan_speed_count integer not null default 0,
+    fan_speed_last real,
+
+    primary key (gpu_index, bucket)
+) partition by range (bucket);
+
+-- Keys are declared in the create statements so re-running this migration
+-- is a no-op like 001-004
+create table if not exists gpu_rollup_1m (
+    like gpu_rollup_10s including defaults,
+    primary key (gpu_index, bucket)
+) partition by range (bucket);
+
+-- One row per GPU per hour is small enough to keep unpartitioned
+create table if not exists gpu_rollup_1h (
+    like gpu_rollup_10s including defaults,
+    primary key (gpu_index, bucket)
+);
+create index if not exists idx_gpu_rollup_1h_bucket on gpu_rollup_1h(bucket);
+
+-- Daily partitions, dropped by retention like the raw tables
+create table if not exists gpu_rollup_10s_default partition of gpu_rollup_10s default;
+create table if not exists gpu_rollup_1m_default partition of gpu_rollup_1m default;
+select create_daily_partitions('gpu_rollup_10s', 7);
+select create_daily_partitions('gpu_rollup_1m', 7);
+
+comment on table gpu_rollup_10s is 'Per-GPU 10 second aggregates of gpu_samples';
+comment on table gpu_rollup_1m is 'Per-GPU 1 minute aggregates of gpu_samples';
+comment on table gpu_rollup_1h is 'Per-GPU 1 hour aggregates of gpu_samples';
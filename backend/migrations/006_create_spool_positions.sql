@@ -0,0 +1,12 @@
+-- Position of the last sample each local metrics spool wrote to the
+-- database. It is updated in the transaction that writes the samples, so a
+-- batch replayed again after a crash (before the spool's own checkpoint
+-- was saved) is recognised and skipped instead of written twice.
+create table if not exists spool_positions (
+    spool_id text primary key,
+    segment bigint not null,
+    segment_offset bigint not null,
+    updated_at timestamptz not null default now()
+);
+
+comment on table spool_positions is 'Last replayed (segment, offset) per metrics spool directory';
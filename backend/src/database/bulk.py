@@ -0,0 +1,344 @@
+import json
+import logging
+from datetime import datetime
+from itertools import islice
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
+
+import psycopg2
+from psycopg2 import errors
+from psycopg2.extras import Json, execute_values
+
+from ..service.smi_parser import MISSING
+from .rollups import aggregate, upsert_rollups
+
+logger = logging.getLogger(__name__)
+
+GPU_METRICS_COLUMNS = (
+    'timestamp', 'duration', 'errors', 'running', 'cuda_version',
+    'driver_version', 'gpus', 'processes', 'success'
+)
+GPU_SAMPLES_COLUMNS = (
+    'timestamp', 'gpu_index', 'name', 'fan_speed', 'power_draw', 'power_limit',
+    'memory_total', 'memory_used', 'gpu_utilization', 'temperature',
+    'peak_temperature', 'temp_change_rate', 'power_change_rate',
+    'utilization_change_rate', 'compute_mode'
+)
+# Readings the collector reports as MISSING (-1); stored as NULL in gpu_samples
+NULLABLE_READINGS = frozenset((
+    'fan_speed', 'power_draw', 'power_limit', 'memory_total', 'memory_used',
+    'gpu_utilization', 'temperature', 'peak_temperature'
+))
+ALERT_HISTORY_COLUMNS = (
+    'gpu_index', 'metric_value', 'threshold_value', 'severity', 'created_at'
+)
+# Last replayed position of each local spool (migrations/006_create_spool_positions.sql)
+SPOOL_POSITIONS_TABLE = 'spool_positions'
+# Columns holding JSON documents; serialized once for COPY or wrapped in Json for INSERT
+JSON_COLUMNS = frozenset(('gpus', 'processes'))
+
+DEFAULT_BULK = {
+    'method': 'copy',    # copy or insert
+    'chunk_size': 5000   # rows per COPY / INSERT statement and transaction
+}
+
+DEFAULT_GPU_SAMPLES = {
+    'enabled': True,         # write per-GPU rows to gpu_samples
+    'keep_gpus_blob': True   # also keep filling gpu_metrics.gpus (migration period)
+}
+GPUS_FIELD = GPU_METRICS_COLUMNS.index('gpus')
+
+# COPY text format escapes, see https://www.postgresql.org/docs/current/sql-copy.html
+_COPY_ESCAPES = str.maketrans({'\\': '\\\\', '\t': '\\t', '\n': '\\n', '\r': '\\r'})
+
+
+def metrics_row(data: Dict[str, Any]) -> tuple:
+    """
+    gpu_metrics row from a GpuMetricsRecord.model_dump() or an exported
+    gpu_metrics row (flat columns)
+    """
+    if 'gpu_burn_metrics' in data:
+        burn, info = data['gpu_burn_metrics'], data['nvidia_info']
+        data = {
+            'timestamp': data['timestamp'],
+            'duration': burn['duration'],
+            'errors': burn['errors'],
+            'running': burn['running'],
+            'cuda_version': info['cuda_version'],
+            'driver_version': info['driver_version'],
+            'gpus': data['gpus'],
+            'processes': data['processes'],
+            'success': data['success']
+        }
+    return tuple(data.get(column) for column in GPU_METRICS_COLUMNS)
+
+
+def sample_rows(data: Dict[str, Any], gpu_indices: Optional[Set[int]] = None) -> List[tuple]:
+    """
+    gpu_samples rows, one per GPU (or per GPU in gpu_indices), from the same
+    inputs as metrics_row
+    """
+    timestamp = data['timestamp']
+    rows = []
+    for gpu in data['gpus']:
+        if gpu_indices is not None and gpu['index'] not in gpu_indices:
+            continue
+        rows.append((timestamp, gpu['index']) + tuple(
+            None if column in NULLABLE_READINGS and gpu.get(column) == MISSING else gpu.get(column)
+            for column in GPU_SAMPLES_COLUMNS[2:]
+        ))
+    return rows
+
+
+def alert_row(alert: Dict[str, Any]) -> tuple:
+    """alert_history row from an alert dict built by the alert checkers"""
+    return (
+        alert['gpu_index'],
+        alert['value'],
+        alert['threshold'],
+        alert['severity'],
+        alert['timestamp']
+    )
+
+
+def _copy_value(value: Any, is_json: bool) -> str:
+    if value is None:
+        return '\\N'
+    if is_json:
+        value = json.dumps(value)
+    elif isinstance(value, bool):
+        return 't' if value else 'f'
+    elif isinstance(value, datetime):
+        value = value.isoformat()
+    else:
+        value = str(value)
+    return value.translate(_COPY_ESCAPES)
+
+
+class _CopyStream:
+    """File-like reader that encodes rows into COPY text format as COPY pulls them"""
+
+    def __init__(self, rows: Iterable[Sequence], columns: Sequence[str]):
+        self._rows = iter(rows)
+        self._json = [column in JSON_COLUMNS for column in columns]
+        self._buffer = b''
+        self.rows = 0
+
+    def read(self, size: int = -1) -> bytes:
+        while size < 0 or len(self._buffer) < size:
+            row = next(self._rows, None)
+            if row is None:
+                break
+            line = '\t'.join(_copy_value(value, is_json) for value, is_json in zip(row, self._json))
+            self._buffer += (line + '\n').encode('utf-8')
+            self.rows += 1
+        if size < 0:
+            size = len(self._buffer)
+        chunk, self._buffer = self._buffer[:size], self._buffer[size:]
+        return chunk
+
+
+def copy_rows(cur, table: str, columns: Sequence[str], rows: Iterable[Sequence]) -> int:
+    """Stream rows into table with COPY FROM STDIN; returns the row count"""
+    stream = _CopyStream(rows, columns)
+    cur.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN", stream)
+    return stream.rows
+
+
+def insert_rows(cur, table: str, columns: Sequence[str], rows: Sequence[Sequence]) -> int:
+    """Insert rows with one multi-row INSERT; returns the row count"""
+    json_columns = [column in JSON_COLUMNS for column in columns]
+    values = [
+        tuple(Json(value) if is_json and value is not None else value
+              for value, is_json in zip(row, json_columns))
+        for row in rows
+    ]
+    if not values:
+        return 0
+    execute_values(cur, f"INSERT INTO {table} ({', '.join(columns)}) VALUES %s",
+                   values, page_size=len(values))
+    return len(values)
+
+
+def store_replay_position(cur, spool_id: str, position: Tuple[int, int]):
+    """Record (segment, offset) as the last position of spool_id written to the database"""
+    cur.execute(f"""
+        INSERT INTO {SPOOL_POSITIONS_TABLE} (spool_id, segment, segment_offset, updated_at)
+        VALUES (%s, %s, %s, NOW())
+        ON CONFLICT (spool_id) DO UPDATE
+        SET segment = excluded.segment, segment_offset = excluded.segment_offset, updated_at = NOW()
+    """, (spool_id,) + tuple(position))
+
+
+def _chunks(rows: Iterable[Sequence], size: int) -> Iterator[list]:
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+class BulkIngest:
+    """
+    Bulk loader for gpu_metrics and alert_history. Rows are written in
+    chunks, one transaction each, with COPY FROM STDIN; if the server or a
+    pooler in front of it rejects COPY the chunk is retried as a multi-row
+    INSERT and INSERT is used from then on.
+    """
+
+    def __init__(self, get_connection, options: Optional[Dict] = None,
+                 samples: Optional[Dict] = None, rollups: bool = True):
+        self._get_connection = get_connection
+        self.options = dict(DEFAULT_BULK)
+        self.options.update(options or {})
+        self.copy_supported = self.options['method'] == 'copy'
+        self.samples = dict(DEFAULT_GPU_SAMPLES)
+        self.samples.update(samples or {})
+        # Merge each chunk into the 10s/1m/1h rollup tables in the same transaction
+        self.rollups = rollups
+
+        self.rows = {'copy': 0, 'insert': 0}
+        self.replay_skipped = 0
+        self.copy_failures = 0
+        self.last_error: Optional[str] = None
+
+    def ingest(self, table: str, columns: Sequence[str], rows: Iterable[Sequence]) -> int:
+        """Write rows to table and return how many were written"""
+        total = 0
+        for chunk in _chunks(rows, self.options['chunk_size']):
+            total += self._write_chunk([(table, columns, chunk)])
+        return total
+
+    def _write_chunk(self, parts: List[Tuple[str, Sequence[str], list]],
+                     after: Optional[Callable] = None) -> int:
+        """
+        Write each (table, columns, rows) part in one transaction, then call
+        after(cursor) in the same transaction; returns rows in the first part
+        """
+        # Parts left empty by the deadband filter are skipped
+        parts = [part for part in parts if part[2]]
+        if not parts and not after:
+            return 0
+        written = len(parts[0][2]) if parts else 0
+        if self.copy_supported:
+            try:
+                with self._get_connection() as conn:
+                    with conn.cursor() as cur:
+                        for table, columns, rows in parts:
+                            copy_rows(cur, table, columns, rows)
+                        if after:
+                            after(cur)
+                self.rows['copy'] += sum(len(rows) for _, _, rows in parts)
+                return written
+            except (psycopg2.NotSupportedError, errors.ProtocolViolation) as e:
+                # Transaction poolers and some proxies do not speak the COPY protocol
+                self.copy_supported = False
+                self.copy_failures += 1
+                self.last_error = str(e)
+                table = parts[0][0] if parts else 'rollups'
+                logger.warning(f"COPY into {table} failed, using INSERT from now on: {e}")
+
+        with self._get_connection() as conn:
+            with conn.cursor() as cur:
+                for table, columns, rows in parts:
+                    insert_rows(cur, table, columns, rows)
+                if after:
+                    after(cur)
+        self.rows['insert'] += sum(len(rows) for _, _, rows in parts)
+        return written
+
+    def replay_position(self, spool_id: str) -> Optional[Tuple[int, int]]:
+        """(segment, offset) of the last record of spool_id written, or None"""
+        with self._get_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(f"""
+                    SELECT segment, segment_offset FROM {SPOOL_POSITIONS_TABLE} WHERE spool_id = %s
+                """, (spool_id,))
+                row = cur.fetchone()
+        return tuple(row) if row else None
+
+    def gpu_metrics(self, records: Iterable[Dict[str, Any]], deadband=None,
+                    replay: Optional[Tuple[str, Sequence[Tuple[int, int]]]] = None) -> int:
+        """
+        Ingest metrics records (model_dump() dicts or exported rows). With
+        persistence.gpu_samples enabled each chunk also writes one
+        gpu_samples row per GPU in the same transaction, and the gpus blob
+        is left empty once keep_gpus_blob is turned off. Rollups are updated
+        in that transaction too. With a DeadbandFilter only the records and
+        GPU samples it selects are written; rollups still see every sample.
+
+        replay is (spool id, position of each record) for records replayed
+        from a MetricsSpool. Records at or before the position already
+        stored for that spool are skipped, and the rest are written in one
+        transaction that also stores the last position, so a batch replayed
+        again after a crash is not written twice.
+        """
+        chunk_size = self.options['chunk_size']
+        store_position = None
+        if replay is not None:
+            spool_id, positions = replay
+            records = list(records)
+            stored = self.replay_position(spool_id)
+            if stored is not None:
+                fresh = [i for i, position in enumerate(positions) if tuple(position) > stored]
+                self.replay_skipped += len(records) - len(fresh)
+                if len(fresh) < len(records):
+                    logger.info(f"Skipping {len(records) - len(fresh)} spooled records "
+                                f"already written")
+                records = [records[i] for i in fresh]
+            if not records:
+                return 0
+            chunk_size = len(records)
+            last = tuple(positions[-1])
+            store_position = lambda cur: store_replay_position(cur, spool_id, last)
+
+        total = 0
+        for chunk in _chunks(records, chunk_size):
+            for record in chunk:
+                if not record.get('timestamp'):
+                    record['timestamp'] = datetime.utcnow().isoformat()
+            if deadband is None:
+                total += self._write_selected(chunk, None, store_position)
+            else:
+                # A failed write leaves the filter as it was for the retry
+                with deadband.rollback_on_error():
+                    total += self._write_selected(chunk, deadband, store_position)
+        return total
+
+    def _write_selected(self, chunk: List[Dict[str, Any]], deadband, store_position) -> int:
+        """Write the records and samples of one chunk the deadband filter selects"""
+        selected = [(record, None) for record in chunk]
+        if deadband is not None:
+            selected = [(record, gpus) for record in chunk
+                        for gpus in [deadband.select(record)] if gpus is not None]
+        metrics = [metrics_row(record) for record, _ in selected]
+        parts = [('gpu_metrics', GPU_METRICS_COLUMNS, metrics)]
+        if self.samples['enabled']:
+            if not self.samples['keep_gpus_blob']:
+                metrics[:] = [row[:GPUS_FIELD] + ([],) + row[GPUS_FIELD + 1:] for row in metrics]
+            samples = [row for record, gpus in selected for row in sample_rows(record, gpus)]
+            parts.append(('gpu_samples', GPU_SAMPLES_COLUMNS, samples))
+        steps = []
+        if self.rollups:
+            groups = aggregate(chunk)
+            steps.append(lambda cur, groups=groups: upsert_rollups(cur, groups))
+        if store_position:
+            steps.append(store_position)
+        after = None
+        if steps:
+            after = lambda cur, steps=steps: [step(cur) for step in steps]
+        return self._write_chunk(parts, after)
+
+    def alerts(self, alerts: Iterable[Dict[str, Any]]) -> int:
+        """Ingest alert dicts into alert_history"""
+        return self.ingest('alert_history', ALERT_HISTORY_COLUMNS, map(alert_row, alerts))
+
+    def get_stats(self) -> Dict:
+        """Rows written per method for diagnostics"""
+        return {
+            'method': 'copy' if self.copy_supported else 'insert',
+            'rows': dict(self.rows),
+            'replay_skipped': self.replay_skipped,
+            'copy_failures': self.copy_failures,
+            'last_error': self.last_error
+        }
@@ -1,61 +1,126 @@
 import psycopg2
 from psycopg2.extras import Json
 from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence, Tuple
 from ..models.gpu_metrics import GpuMetricsRecord
+from ..service.settings import settings
+from ..service.smi_parser import MISSING
+from .bulk import BulkIngest, GPU_SAMPLES_COLUMNS, NULLABLE_READINGS, insert_rows, sample_rows
+from .deadband import DeadbandFilter
+from .frames import FRAME_METRICS, load_gpu_frame
+from .history import iter_history
+from .partitions import PartitionManager
+from .pool import ConnectionPool
+from .rollups import aggregate, fetch_rollups, upsert_rollups
 
 class DatabaseClient:
     def __init__(self):
+        db_config = settings.get('database', default={}) or {}
         self.conn_params = {
-            'dbname': 'postgres',
-            'user': 'postgres',
-            'password': 'postgres',
-            'host': 'localhost',
-            'port': 54432
+            'dbname': db_config.get('name', 'postgres'),
+            'user': db_config.get('user', 'postgres'),
+            'password': db_config.get('password', 'postgres'),
+            'host': db_config.get('host', 'localhost'),
+            'port': db_config.get('port', 54432),
+            # Bound how long a worker thread can block on an unreachable server
+            'connect_timeout': db_config.get('connect_timeout', 5)
         }
+        # One pool shared by every component that talks to the database
+        self.pool = ConnectionPool(
+            lambda: psycopg2.connect(**self.conn_params),
+            db_config.get('pool')
+        )
+        # COPY-based batch writes for the write-behind buffer, alerts and import tools
+        self.bulk = BulkIngest(
+            self.get_connection,
+            settings.get('persistence', 'bulk'),
+            settings.get('persistence', 'gpu_samples'),
+            settings.get('persistence', 'rollups', 'enabled', default=True)
+        )
+
+        # Change detection: skip samples that stay within their deadbands
+        self.deadband = DeadbandFilter(settings.get('persistence', 'deadband'))
+
+        # Daily partition upkeep and partition-drop retention
+        self.partitions = PartitionManager(self.get_connection)
 
     def get_connection(self):
-        return psycopg2.connect(**self.conn_params)
+        """
+        Borrow a pooled connection: `with db.get_connection() as conn`
+        commits on success, rolls back on error and returns it to the pool
+        """
+        return self.pool.connection()
 
     def insert_gpu_metrics(self, metrics: GpuMetricsRecord) -> dict:
         """
         Insert GPU metrics into PostgreSQL
-        Returns the inserted record
+        Returns the inserted record; its id is None when the deadband
+        filter skipped it (rollups are still updated)
         """
         if not metrics.timestamp:
             metrics.timestamp = datetime.utcnow().isoformat()
 
         data = metrics.model_dump()
-        
-        with self.get_connection() as conn:
-            with conn.cursor() as cur:
-                cur.execute("""
-                    INSERT INTO gpu_metrics (
-                        timestamp,
-                        duration,
-                        errors,
-                        running,
-                        cuda_version,
-                        driver_version,
-                        gpus,
-                        processes,
-                        success,
-                        created_at
-                    ) VALUES (
-                        %s, %s, %s, %s, %s, %s, %s, %s, %s, NOW()
-                    ) RETURNING id
-                """, (
-                    data['timestamp'],
-                    data['gpu_burn_metrics']['duration'],
-                    data['gpu_burn_metrics']['errors'],
-                    data['gpu_burn_metrics']['running'],
-                    data['nvidia_info']['cuda_version'],
-                    data['nvidia_info']['driver_version'],
-                    Json(data['gpus']),
-                    Json(data['processes']),
-                    data['success']
-                ))
-                record_id = cur.fetchone()[0]
-                return {"id": record_id}
+        # A failed insert leaves the filter as it was for the retry
+        with self.deadband.rollback_on_error():
+            gpus = self.deadband.select(data)
+
+            with self.get_connection() as conn:
+                with conn.cursor() as cur:
+                    if gpus is None:
+                        if self.bulk.rollups:
+                            upsert_rollups(cur, aggregate([data]))
+                        return {"id": None}
+                    cur.execute("""
+                        INSERT INTO gpu_metrics (
+                            timestamp,
+                            duration,
+                            errors,
+                            running,
+                            cuda_version,
+                            driver_version,
+                            gpus,
+                            processes,
+                            success,
+                            created_at
+                        ) VALUES (
+                            %s, %s, %s, %s, %s, %s, %s, %s, %s, NOW()
+                        ) RETURNING id
+                    """, (
+                        data['timestamp'],
+                        data['gpu_burn_metrics']['duration'],
+                        data['gpu_burn_metrics']['errors'],
+                        data['gpu_burn_metrics']['running'],
+                        data['nvidia_info']['cuda_version'],
+                        data['nvidia_info']['driver_version'],
+                        Json(data['gpus'] if self.bulk.samples['keep_gpus_blob'] else []),
+                        Json(data['processes']),
+                        data['success']
+                    ))
+                    record_id = cur.fetchone()[0]
+                    if self.bulk.samples['enabled']:
+                        insert_rows(cur, 'gpu_samples', GPU_SAMPLES_COLUMNS,
+                                    sample_rows(data, gpus))
+                    if self.bulk.rollups:
+                        upsert_rollups(cur, aggregate([data]))
+                    return {"id": record_id}
+
+    def insert_gpu_metrics_batch(self, records: List[GpuMetricsRecord],
+                                 replay: Optional[Tuple[str, List[Tuple[int, int]]]] = None) -> int:
+        """
+        Insert several GPU metrics records through the bulk ingest path;
+        replay carries the spool positions of replayed records (see
+        BulkIngest.gpu_metrics). Returns the number of rows inserted
+        """
+        return self.bulk.gpu_metrics((record.model_dump() for record in records),
+                                     self.deadband, replay)
+
+    def insert_alerts_batch(self, alerts: List[Dict[str, Any]]) -> int:
+        """
+        Insert alerts into alert_history through the bulk ingest path
+        Returns the number of rows inserted
+        """
+        return self.bulk.alerts(alerts)
 
     def get_metrics_in_timerange(self, start_time: str, end_time: str):
         """
@@ -66,7 +131,7 @@ class DatabaseClient:
                 cur.execute("""
                     SELECT *
                     FROM gpu_metrics
-                    WHERE timestamp >= %s AND timestamp <= %s
+                    WHERE timestamp >= %s::timestamptz AND timestamp <= %s::timestamptz
                     ORDER BY timestamp DESC
                 """, (start_time, end_time))
                 
@@ -76,8 +141,138 @@ class DatabaseClient:
                 for row in cur.fetchall():
                     result = dict(zip(columns, row))
                     results.append(result)
-                
+
+                if not self.bulk.samples['keep_gpus_blob']:
+                    # gpus blobs are no longer written; rebuild them from gpu_samples
+                    hold = self.deadband.hold_seconds
+                    samples = self._fetch_gpu_samples(cur, start_time, end_time, hold_seconds=hold)
+                    if hold is None:
+                        gpus_by_time = {}
+                        for sample in samples:
+                            gpus_by_time.setdefault(sample.pop('timestamp'), []).append(sample)
+                        for result in results:
+                            result['gpus'] = (result['gpus']
+                                              or gpus_by_time.get(result['timestamp'], []))
+                    else:
+                        self._hold_samples(reversed(results), samples, hold)
+
                 return results
 
+    @staticmethod
+    def _hold_samples(results, samples: List[Dict[str, Any]], hold_seconds: float):
+        """
+        Fill empty gpus of results (oldest first) with each GPU's latest
+        sample at or before the result, as written by the deadband filter
+        """
+        held = {}
+        position = 0
+        for result in results:
+            timestamp = result['timestamp']
+            while position < len(samples) and samples[position]['timestamp'] <= timestamp:
+                held[samples[position]['index']] = samples[position]
+                position += 1
+            if not result['gpus']:
+                result['gpus'] = [
+                    {key: value for key, value in sample.items() if key != 'timestamp'}
+                    for _, sample in sorted(held.items())
+                    if (timestamp - sample['timestamp']).total_seconds() < hold_seconds
+                ]
+
+    def iter_metrics_in_timerange(self, start_time, end_time, after=None,
+                                  limit: Optional[int] = None, batch_size: int = 1000,
+                                  fields: Optional[Sequence[str]] = None,
+                                  gpus: Optional[Sequence[int]] = None,
+                                  descending: bool = False):
+        """
+        Stream metrics within a time range in (timestamp, id) order as
+        (row JSON, keyset cursor) pairs from a server-side cursor, optionally
+        projected to the given per-GPU fields and GPUs
+        """
+        return iter_history(
+            self.get_connection, start_time, end_time, after, limit,
+            rebuild_gpus=not self.bulk.samples['keep_gpus_blob'],
+            batch_size=batch_size, fields=fields, gpus=gpus, descending=descending,
+            hold_seconds=self.deadband.hold_seconds
+        )
+
+    def get_gpu_samples(self, start_time: str, end_time: str,
+                        gpus: Optional[Sequence[int]] = None,
+                        fields: Optional[Sequence[str]] = None):
+        """
+        Retrieve per-GPU samples within a time range from gpu_samples,
+        optionally only for the given GPUs (index range scans) and fields.
+        With the deadband filter on each GPU's series is step-wise and
+        starts with the value held at start_time.
+        """
+        with self.get_connection() as conn:
+            with conn.cursor() as cur:
+                return self._fetch_gpu_samples(cur, start_time, end_time, gpus, fields,
+                                               self.deadband.hold_seconds)
+
+    def get_gpu_frame(self, start_time, end_time, metrics: Sequence[str] = FRAME_METRICS,
+                      gpus: Optional[Sequence[int]] = None):
+        """
+        Per-GPU samples within a time range as a DataFrame with typed
+        numeric columns, from gpu_samples or, while it is not written,
+        extracted from the gpus blobs in SQL. With the deadband filter on,
+        rows carry the sampling intervals they stand for in 'weight'.
+        """
+        source = 'samples' if self.bulk.samples['enabled'] else 'blob'
+        return load_gpu_frame(self.get_connection, start_time, end_time, metrics, gpus, source,
+                              hold_seconds=self.deadband.hold_seconds,
+                              interval=settings.get('polling', 'base_interval', default=0.25))
+
+    def get_rollups(self, resolution: str, start_time: str, end_time: str,
+                    gpus: Optional[Sequence[int]] = None,
+                    fields: Optional[Sequence[str]] = None):
+        """
+        Retrieve min/max/avg/last per metric per GPU from the 10s, 1m or 1h
+        rollup table within a time range
+        """
+        with self.get_connection() as conn:
+            with conn.cursor() as cur:
+                return fetch_rollups(cur, resolution, start_time, end_time, gpus, fields)
+
+    @staticmethod
+    def _fetch_gpu_samples(cur, start_time: str, end_time: str,
+                           gpus: Optional[Sequence[int]] = None,
+                           fields: Optional[Sequence[str]] = None,
+                           hold_seconds: Optional[float] = None):
+        # Column names match GpuMetrics; NULL readings map back to MISSING
+        columns = GPU_SAMPLES_COLUMNS if fields is None else GPU_SAMPLES_COLUMNS[:2] + tuple(fields)
+        gpu_filter = " AND gpu_index = ANY(%s)" if gpus is not None else ""
+        gpu_params = [list(gpus)] if gpus is not None else []
+        query = f"""
+            SELECT {', '.join(columns)}
+            FROM gpu_samples
+            WHERE timestamp >= %s::timestamptz AND timestamp <= %s::timestamptz{gpu_filter}
+        """
+        params = [start_time, end_time] + gpu_params
+        if hold_seconds:
+            # Samples are only stored on change: start each GPU with its held value
+            query = f"""
+                (SELECT DISTINCT ON (gpu_index) {', '.join(columns)}
+                 FROM gpu_samples
+                 WHERE timestamp < %s::timestamptz
+                   AND timestamp > %s::timestamptz
+                                   - interval '{float(hold_seconds)} seconds'{gpu_filter}
+                 ORDER BY gpu_index, timestamp DESC)
+                UNION ALL
+                ({query})
+            """
+            params = [start_time, start_time] + gpu_params + params
+        cur.execute(query + " ORDER BY timestamp, gpu_index", params)
+
+        nullable = [column for column in columns if column in NULLABLE_READINGS]
+        samples = []
+        for row in cur.fetchall():
+            sample = dict(zip(columns, row))
+            sample['index'] = sample.pop('gpu_index')
+            for column in nullable:
+                if sample[column] is None:
+                    sample[column] = MISSING
+            samples.append(sample)
+        return samples
+
 # Create a singleton instance
 db = DatabaseClient()
@@ -0,0 +1,147 @@
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Optional, Set
+
+from ..service.smi_parser import MISSING
+from .bulk import GPU_SAMPLES_COLUMNS
+from .rollups import epoch_seconds
+
+logger = logging.getLogger(__name__)
+
+# Per-GPU fields compared between samples
+DEADBAND_FIELDS = GPU_SAMPLES_COLUMNS[2:]
+
+DEFAULT_DEADBAND = {
+    'enabled': False,
+    'max_interval': 60.0,   # heartbeat: store each GPU at least this often (seconds)
+    # Change a reading must exceed, relative to the last stored value, to be
+    # stored; fields not listed are stored on any change
+    'deadbands': {
+        'temperature': 1,
+        'gpu_utilization': 2,
+        'power_draw': 5,
+        'memory_used': 64,
+        'fan_speed': 2,
+        'temp_change_rate': 0.5,
+        'power_change_rate': 5,
+        'utilization_change_rate': 2
+    }
+}
+
+
+class DeadbandFilter:
+    """
+    Change detection in front of storage. A GPU's sample is stored only when
+    a reading moves beyond its deadband from the last stored value, or when
+    max_interval has passed since that GPU was last stored (the heartbeat).
+    A record is stored when any of its GPUs is, or when its GPU set,
+    processes or success flag changed. Readers hold each value until the
+    next stored sample.
+    """
+
+    def __init__(self, options: Optional[Dict] = None):
+        self.options = dict(DEFAULT_DEADBAND)
+        self.options.update(options or {})
+        self.deadbands = dict(DEFAULT_DEADBAND['deadbands'])
+        self.deadbands.update((options or {}).get('deadbands') or {})
+        self.enabled = bool(self.options['enabled'])
+        self.max_interval = float(self.options['max_interval'])
+
+        self._lock = threading.Lock()
+        # gpu index -> (time, GPU dict) of its last stored sample
+        self._stored: Dict[int, tuple] = {}
+        self._record_state: Optional[tuple] = None
+
+        self.records_seen = 0
+        self.records_stored = 0
+        self.samples_seen = 0
+        self.samples_stored = 0
+
+    @property
+    def hold_seconds(self) -> Optional[float]:
+        """
+        How far back readers look for a GPU's held value, or None when every
+        sample is stored. Twice the heartbeat covers sampling jitter.
+        """
+        return 2 * self.max_interval if self.enabled else None
+
+    def _changed(self, last: Dict[str, Any], gpu: Dict[str, Any]) -> bool:
+        for field in DEADBAND_FIELDS:
+            old, new = last.get(field), gpu.get(field)
+            if old == new:
+                continue
+            band = self.deadbands.get(field)
+            if not band or old is None or new is None or MISSING in (old, new):
+                return True
+            if abs(new - old) > band:
+                return True
+        return False
+
+    def select(self, record: Dict[str, Any]) -> Optional[Set[int]]:
+        """
+        Indices of the GPUs in record to store, or None to drop the record.
+        Call once per record in time order; accepted samples become the
+        reference for the following ones.
+        """
+        gpus = record['gpus']
+        if not self.enabled:
+            return {gpu['index'] for gpu in gpus}
+
+        t = epoch_seconds(record['timestamp'])
+        record_state = (tuple(gpu['index'] for gpu in gpus), record.get('processes'),
+                        record.get('success'))
+        with self._lock:
+            self.records_seen += 1
+            self.samples_seen += len(gpus)
+            keep = set()
+            for gpu in gpus:
+                last = self._stored.get(gpu['index'])
+                # Samples older than the reference (imports, clock steps) are always stored
+                if (last is None or t < last[0] or t - last[0] >= self.max_interval
+                        or self._changed(last[1], gpu)):
+                    keep.add(gpu['index'])
+                    self._stored[gpu['index']] = (t, gpu)
+
+            if not keep and record_state == self._record_state:
+                return None
+            if record_state[0] != (self._record_state or ((),))[0]:
+                # Forget GPUs that disappeared so a returning GPU is stored at once
+                for index in set(self._stored) - set(record_state[0]):
+                    del self._stored[index]
+            self._record_state = record_state
+            self.records_stored += 1
+            self.samples_stored += len(keep)
+            return keep
+
+    @contextmanager
+    def rollback_on_error(self):
+        """
+        Undo the selections made inside the block if it raises, so records
+        whose write failed are selected again when they are retried rather
+        than measured against samples that never reached the database
+        """
+        with self._lock:
+            state = (dict(self._stored), self._record_state, self.records_seen,
+                     self.records_stored, self.samples_seen, self.samples_stored)
+        try:
+            yield
+        except BaseException:
+            with self._lock:
+                (self._stored, self._record_state, self.records_seen,
+                 self.records_stored, self.samples_seen, self.samples_stored) = state
+            raise
+
+    def get_stats(self) -> Dict:
+        """Stored versus seen records and GPU samples for diagnostics"""
+        with self._lock:
+            return {
+                'enabled': self.enabled,
+                'max_interval': self.max_interval,
+                'records_seen': self.records_seen,
+                'records_stored': self.records_stored,
+                'samples_seen': self.samples_seen,
+                'samples_stored': self.samples_stored,
+                'stored_ratio': (round(self.samples_stored / self.samples_seen, 4)
+                                 if self.samples_seen else None)
+            }
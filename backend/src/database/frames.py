@@ -0,0 +1,168 @@
+import io
+import logging
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+import psycopg2
+from psycopg2 import errors
+
+from .bulk import NULLABLE_READINGS
+from .rollups import epoch_seconds
+
+logger = logging.getLogger(__name__)
+
+# Numeric per-GPU columns available to analytics, all float32 so missing
+# readings (NULL in gpu_samples, -1 in the gpus blob) become NaN
+FRAME_METRICS = (
+    'fan_speed', 'power_draw', 'power_limit', 'memory_total', 'memory_used',
+    'gpu_utilization', 'temperature', 'peak_temperature', 'temp_change_rate',
+    'power_change_rate', 'utilization_change_rate'
+)
+FRAME_DTYPES = {
+    'epoch': 'float64', 'gpu_index': 'int16',
+    **{metric: 'float32' for metric in FRAME_METRICS}
+}
+
+_EPOCH = pd.Timestamp(0, tz='UTC')
+
+
+def _blob_metric(metric: str) -> str:
+    # Typed value of one key of a gpus blob element
+    value = f"(g->>'{metric}')::real"
+    return f"nullif({value}, -1)" if metric in NULLABLE_READINGS else value
+
+
+def frame_query(start_time: Any, end_time: Any, metrics: Sequence[str] = FRAME_METRICS,
+                gpus: Optional[Sequence[int]] = None, source: str = 'samples',
+                hold_seconds: Optional[float] = None) -> Tuple[str, list]:
+    """
+    SQL returning epoch seconds, gpu_index and the given metrics per GPU
+    sample in [start_time, end_time], read from the typed gpu_samples
+    columns or, with source='blob', extracted from gpu_metrics.gpus in SQL.
+    With hold_seconds (deadband storage) each GPU's gpu_samples series
+    starts with the value it held at start_time, stamped start_time.
+    """
+    unknown = [metric for metric in metrics if metric not in FRAME_METRICS]
+    if unknown:
+        raise ValueError(f"Unknown metrics: {', '.join(unknown)}")
+    params = [start_time, end_time]
+    if source == 'samples':
+        select = [f"{metric}::real" for metric in metrics]
+        gpu_filter = " AND gpu_index = ANY(%s)" if gpus is not None else ""
+        gpu_params = [list(gpus)] if gpus is not None else []
+        query = f"""
+            SELECT extract(epoch FROM timestamp)::float8, gpu_index, {', '.join(select)}
+            FROM gpu_samples
+            WHERE timestamp >= %s::timestamptz AND timestamp <= %s::timestamptz{gpu_filter}
+        """
+        params += gpu_params
+        if not hold_seconds:
+            return query + " ORDER BY timestamp, gpu_index", params
+        held = f"""
+            SELECT DISTINCT ON (gpu_index) extract(epoch FROM %s::timestamptz)::float8, gpu_index,
+                   {', '.join(select)}
+            FROM gpu_samples
+            WHERE timestamp < %s::timestamptz
+              AND timestamp > %s::timestamptz - interval '{float(hold_seconds)} seconds'{gpu_filter}
+            ORDER BY gpu_index, timestamp DESC
+        """
+        return (f"({held}) UNION ALL ({query}) ORDER BY 1, 2",
+                [start_time, start_time, start_time] + gpu_params + params)
+    if source == 'blob':
+        select = [_blob_metric(metric) for metric in metrics]
+        query = f"""
+            SELECT extract(epoch FROM m.timestamp)::float8, (g->>'index')::smallint,
+                   {', '.join(select)}
+            FROM gpu_metrics m CROSS JOIN LATERAL jsonb_array_elements(m.gpus) g
+            WHERE m.timestamp >= %s::timestamptz AND m.timestamp <= %s::timestamptz
+        """
+        if gpus is not None:
+            query += " AND (g->>'index')::smallint = ANY(%s)"
+            params.append(list(gpus))
+        return query + " ORDER BY m.timestamp, 2", params
+    raise ValueError(f"Unknown frame source: {source}")
+
+
+def hold_weights(epoch: np.ndarray, gpu_index: np.ndarray, end: float,
+                 hold_seconds: float, interval: float) -> np.ndarray:
+    """
+    Sampling intervals each row stands for when samples are stored only on
+    change: the time until the GPU's next row, or until end for its last
+    row, capped at hold_seconds, in whole intervals and at least one.
+    Weighting every statistic by it gives the same result as forward
+    filling each GPU to the sampling grid.
+    """
+    if not len(epoch):
+        return np.empty(0, dtype=np.int32)
+    order = np.lexsort((epoch, gpu_index))
+    times, gpus = epoch[order], gpu_index[order]
+    following = np.r_[times[1:], end]
+    following[np.r_[gpus[1:] != gpus[:-1], True]] = end
+    held = np.clip(following - times, 0, hold_seconds)
+    weights = np.empty(len(epoch), dtype=np.int32)
+    weights[order] = np.maximum(np.rint(held / interval), 1)
+    return weights
+
+
+def _frame(columns: Dict[str, np.ndarray]) -> pd.DataFrame:
+    # Timestamps as timezone-aware UTC datetimes in place of epoch seconds
+    epoch = columns.pop('epoch')
+    frame = pd.DataFrame(columns, copy=False)
+    microseconds = np.round(epoch * 1e6).astype('int64')
+    frame.insert(0, 'timestamp', pd.to_datetime(microseconds, unit='us', utc=True))
+    return frame
+
+
+def parse_frame_csv(data: bytes, metrics: Sequence[str]) -> pd.DataFrame:
+    """DataFrame from the CSV output of a frame_query COPY"""
+    names = ['epoch', 'gpu_index'] + list(metrics)
+    if not data:
+        return _frame({name: np.empty(0, dtype=FRAME_DTYPES[name]) for name in names})
+    parsed = pd.read_csv(io.BytesIO(data), header=None, names=names,
+                         dtype={name: FRAME_DTYPES[name] for name in names}, engine='c')
+    return _frame({name: parsed[name].to_numpy() for name in names})
+
+
+def load_gpu_frame(get_connection, start_time: Any, end_time: Any,
+                   metrics: Sequence[str] = FRAME_METRICS, gpus: Optional[Sequence[int]] = None,
+                   source: str = 'samples', hold_seconds: Optional[float] = None,
+                   interval: Optional[float] = None) -> pd.DataFrame:
+    """
+    One row per GPU sample with a UTC timestamp, gpu_index (int16) and
+    float32 metric columns (NaN where missing), ordered by time and GPU.
+    Rows are streamed with COPY ... TO STDOUT as CSV and parsed straight
+    into typed NumPy columns; servers or poolers that reject COPY get a
+    plain query instead. With hold_seconds and the sampling interval
+    (deadband storage) a 'weight' column gives the intervals each row
+    stands for (see hold_weights).
+    """
+    query, params = frame_query(start_time, end_time, metrics, gpus, source, hold_seconds)
+    frame = None
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            statement = cur.mogrify(query, params).decode('utf-8')
+            buffer = io.BytesIO()
+            try:
+                cur.copy_expert(f"COPY ({statement}) TO STDOUT WITH (FORMAT csv)", buffer)
+                frame = parse_frame_csv(buffer.getvalue(), metrics)
+            except (psycopg2.NotSupportedError, errors.ProtocolViolation) as e:
+                logger.warning(f"COPY TO STDOUT failed, loading frame with a query: {e}")
+                conn.rollback()
+
+            if frame is None:
+                cur.execute(query, params)
+                rows = cur.fetchall()
+    if frame is None:
+        names = ['epoch', 'gpu_index'] + list(metrics)
+        values = np.array(rows, dtype=np.float64).reshape(len(rows), len(names)) if rows else None
+        frame = _frame({
+            name: (values[:, position] if values is not None else np.empty(0))
+                  .astype(FRAME_DTYPES[name])
+            for position, name in enumerate(names)
+        })
+    if hold_seconds and interval:
+        epoch = (frame['timestamp'] - _EPOCH).dt.total_seconds().to_numpy(dtype=np.float64)
+        frame['weight'] = hold_weights(epoch, frame['gpu_index'].to_numpy(),
+                                       epoch_seconds(end_time), hold_seconds, interval)
+    return frame
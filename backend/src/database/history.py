@@ -0,0 +1,188 @@
+import json
+import uuid
+from datetime import datetime, timezone
+from typing import Callable, Iterator, Optional, Sequence, Tuple
+
+from .bulk import GPU_SAMPLES_COLUMNS, NULLABLE_READINGS
+
+# gpu_metrics columns in history output; JSONB columns are read as text and
+# spliced into the output unchanged instead of being decoded and re-encoded
+HISTORY_COLUMNS = (
+    'id', 'timestamp', 'duration', 'errors', 'running', 'cuda_version',
+    'driver_version', 'gpus', 'processes', 'success', 'created_at'
+)
+_RAW_JSON = frozenset(('gpus', 'processes'))
+# Columns of projected rows (fields= or gpu=): everything else is dropped
+PROJECTED_COLUMNS = ('id', 'timestamp', 'gpus')
+
+# Per-GPU fields that can be selected with fields=
+GPU_FIELDS = GPU_SAMPLES_COLUMNS[2:]
+
+
+def _gpus_from_samples(fields: Sequence[str] = GPU_FIELDS, filter_gpus: bool = False,
+                       hold_seconds: Optional[float] = None) -> str:
+    # gpus array rebuilt from gpu_samples, reading only the given fields,
+    # with NULL readings mapped back to -1 like the collector reports them
+    values = ["'index', s.gpu_index"]
+    for column in fields:
+        value = f"coalesce(s.{column}, -1)" if column in NULLABLE_READINGS else f"s.{column}"
+        values.append(f"'{column}', {value}")
+    gpu_filter = " AND gpu_index = ANY(%s)" if filter_gpus else ""
+    if hold_seconds:
+        # Deadband storage: each GPU's latest sample at or before the row
+        samples = f"""(
+            SELECT DISTINCT ON (gpu_index) * FROM gpu_samples
+            WHERE timestamp <= m.timestamp
+              AND timestamp > m.timestamp - interval '{float(hold_seconds)} seconds'{gpu_filter}
+            ORDER BY gpu_index, timestamp DESC
+        ) s"""
+    else:
+        samples = f"(SELECT * FROM gpu_samples WHERE timestamp = m.timestamp{gpu_filter}) s"
+    return f"""(
+        SELECT coalesce(
+            jsonb_agg(jsonb_build_object({', '.join(values)}) ORDER BY s.gpu_index), '[]'::jsonb
+        )
+        FROM {samples}
+    )"""
+
+
+def parse_fields(value: str) -> Tuple[str, ...]:
+    """
+    Parse a comma-separated list of per-GPU fields, e.g. "temperature,power_draw".
+    Raises ValueError for unknown fields.
+    """
+    fields = tuple(dict.fromkeys(field.strip() for field in value.split(',') if field.strip()))
+    unknown = [field for field in fields if field not in GPU_FIELDS]
+    if unknown or not fields:
+        raise ValueError(f"Unknown fields: {', '.join(unknown) or 'none given'}. "
+                         f"Valid fields: {', '.join(GPU_FIELDS)}")
+    return fields
+
+
+def parse_gpus(value: str) -> Tuple[int, ...]:
+    """
+    Parse a comma-separated list of GPU indices, e.g. "0,3".
+    Raises ValueError if an index is not a non-negative integer.
+    """
+    try:
+        gpus = tuple(dict.fromkeys(int(index) for index in value.split(',')))
+    except ValueError:
+        raise ValueError(f"gpu must be a comma-separated list of GPU indices, not {value!r}")
+    if any(index < 0 for index in gpus):
+        raise ValueError(f"GPU indices must not be negative: {value!r}")
+    return gpus
+
+
+def parse_after(value: str) -> Tuple[datetime, str]:
+    """
+    Parse a keyset cursor "<timestamp>,<id>" as returned in X-Next-After.
+    Raises ValueError if it is malformed.
+    """
+    timestamp, _, record_id = value.rpartition(',')
+    if not timestamp:
+        raise ValueError("after must be '<timestamp>,<id>'")
+    parsed = datetime.fromisoformat(timestamp.strip().replace('Z', '+00:00').replace(' ', '+'))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed, str(uuid.UUID(record_id.strip()))
+
+
+def format_after(timestamp: datetime, record_id) -> str:
+    """Keyset cursor for the row after which the next page starts"""
+    return f"{timestamp.isoformat()},{record_id}"
+
+
+def history_query(start_time, end_time, after: Optional[Tuple[datetime, str]] = None,
+                  limit: Optional[int] = None, rebuild_gpus: bool = False,
+                  fields: Optional[Sequence[str]] = None, gpus: Optional[Sequence[int]] = None,
+                  descending: bool = False,
+                  hold_seconds: Optional[float] = None) -> Tuple[str, list, Tuple[str, ...]]:
+    """
+    SQL, parameters and output columns for gpu_metrics rows in
+    [start_time, end_time] in (timestamp, id) order, starting after the
+    keyset cursor and returning at most limit rows. With fields or gpus the
+    rows hold only id, timestamp and the selected fields of the selected
+    GPUs, read from the typed gpu_samples columns. With hold_seconds each
+    GPU's value is held from its latest sample up to that far back.
+    """
+    params = []
+    if fields is not None or gpus is not None:
+        columns = PROJECTED_COLUMNS
+        gpus_sql = _gpus_from_samples(fields or GPU_FIELDS, gpus is not None, hold_seconds)
+        if gpus is not None:
+            params.append(list(gpus))
+    else:
+        columns = HISTORY_COLUMNS
+        gpus_sql = "m.gpus"
+        if rebuild_gpus:
+            rebuilt = _gpus_from_samples(hold_seconds=hold_seconds)
+            gpus_sql = f"(CASE WHEN m.gpus = '[]'::jsonb THEN {rebuilt} ELSE m.gpus END)"
+
+    select = []
+    for column in columns:
+        if column == 'gpus':
+            select.append(f"{gpus_sql}::text")
+        elif column in _RAW_JSON:
+            select.append(f"m.{column}::text")
+        else:
+            select.append(f"m.{column}")
+
+    query = f"""
+        SELECT {', '.join(select)}
+        FROM gpu_metrics m
+        WHERE m.timestamp >= %s::timestamptz AND m.timestamp <= %s::timestamptz
+    """
+    params.extend([start_time, end_time])
+    if after:
+        query += f" AND (m.timestamp, m.id) {'<' if descending else '>'} (%s, %s::uuid)"
+        params.extend(after)
+    if descending:
+        query += " ORDER BY m.timestamp DESC, m.id DESC"
+    else:
+        query += " ORDER BY m.timestamp, m.id"
+    if limit:
+        query += " LIMIT %s"
+        params.append(limit)
+    return query, params, columns
+
+
+def _encode(value) -> str:
+    if isinstance(value, datetime):
+        return f'"{value.isoformat()}"'
+    if isinstance(value, uuid.UUID):
+        return f'"{value}"'
+    return json.dumps(value)
+
+
+def row_json(row: tuple, columns: Sequence[str] = HISTORY_COLUMNS) -> str:
+    """One history row as a JSON object, JSONB columns passed through as-is"""
+    parts = []
+    for column, value in zip(columns, row):
+        if column in _RAW_JSON:
+            encoded = value if value is not None else 'null'
+        else:
+            encoded = _encode(value)
+        parts.append(f'"{column}":{encoded}')
+    return '{' + ','.join(parts) + '}'
+
+
+def iter_history(get_connection: Callable, start_time, end_time,
+                 after: Optional[Tuple[datetime, str]] = None, limit: Optional[int] = None,
+                 rebuild_gpus: bool = False, batch_size: int = 1000,
+                 fields: Optional[Sequence[str]] = None, gpus: Optional[Sequence[int]] = None,
+                 descending: bool = False,
+                 hold_seconds: Optional[float] = None) -> Iterator[Tuple[str, str]]:
+    """
+    Yield (row JSON, keyset cursor) pairs from a named server-side cursor
+    that fetches batch_size rows per round trip, so memory stays flat
+    however large the range. The pooled connection is held until the
+    iterator is exhausted or closed.
+    """
+    query, params, columns = history_query(
+        start_time, end_time, after, limit, rebuild_gpus, fields, gpus, descending, hold_seconds)
+    with get_connection() as conn:
+        with conn.cursor(name=f"history_{uuid.uuid4().hex}") as cur:
+            cur.itersize = batch_size
+            cur.execute(query, params)
+            for row in cur:
+                yield row_json(row, columns), format_after(row[1], row[0])
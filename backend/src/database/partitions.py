@@ -0,0 +1,123 @@
+import logging
+import time
+from typing import Dict, Optional
+
+from ..service.settings import settings
+
+logger = logging.getLogger(__name__)
+
+# Daily-partitioned tables (migrations/004_partition_by_day.sql) and the
+# retention setting that applies to each
+PARTITIONED_TABLES = {
+    'gpu_metrics': 'days_to_keep',
+    'gpu_samples': 'days_to_keep',
+    'alert_history': 'alerts_days_to_keep',
+    'gpu_rollup_10s': 'rollup_10s_days_to_keep',
+    'gpu_rollup_1m': 'rollup_1m_days_to_keep'
+}
+
+DEFAULT_RETENTION = {
+    'days_to_keep': 30,
+    'alerts_days_to_keep': 90,
+    'rollup_10s_days_to_keep': 14,
+    'rollup_1m_days_to_keep': 90,
+    'rollup_1h_days_to_keep': 730,
+    'partitions_ahead': 7
+}
+
+
+class PartitionManager:
+    """
+    Keeps daily partitions created ahead of time and enforces retention by
+    dropping partitions whose whole day has expired. Both are metadata
+    operations on the server; no rows are scanned or deleted.
+    """
+
+    def __init__(self, get_connection, options: Optional[Dict] = None):
+        self._get_connection = get_connection
+        self.options = dict(DEFAULT_RETENTION)
+        self.options.update(options or settings.get('retention', default={}))
+
+        self.created = 0
+        self.dropped = 0
+        self.last_run: Optional[float] = None
+        self.last_duration: Optional[float] = None
+        self.last_error: Optional[str] = None
+
+    def _call(self, function: str, table: str, days: int) -> int:
+        with self._get_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(f"SELECT {function}(%s, %s)", (table, days))
+                return cur.fetchone()[0]
+
+    def create_partitions(self) -> Dict[str, int]:
+        """Create missing daily partitions for the next partitions_ahead days"""
+        created = {
+            table: self._call('create_daily_partitions', table, self.options['partitions_ahead'])
+            for table in PARTITIONED_TABLES
+        }
+        self.created += sum(created.values())
+        return created
+
+    def drop_expired(self, retention: Optional[Dict[str, int]] = None) -> Dict[str, int]:
+        """
+        Drop partitions whose whole day is older than the retention period.
+        retention maps table names to days; by default every partitioned
+        table uses its configured retention.
+        """
+        if retention is None:
+            retention = {
+                table: self.options[setting] for table, setting in PARTITIONED_TABLES.items()
+            }
+        dropped = {}
+        for table, days in retention.items():
+            dropped[table] = self._call('drop_expired_partitions', table, days)
+            if dropped[table]:
+                logger.info(f"Dropped {dropped[table]} {table} partitions older than {days} days")
+        self.dropped += sum(dropped.values())
+        return dropped
+
+    def delete_expired_hourly(self) -> int:
+        """
+        gpu_rollup_1h holds one row per GPU per hour and is not partitioned;
+        its retention is a small indexed DELETE
+        """
+        with self._get_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(
+                    "DELETE FROM gpu_rollup_1h WHERE bucket < NOW() - make_interval(days => %s)",
+                    (self.options['rollup_1h_days_to_keep'],)
+                )
+                return cur.rowcount
+
+    def maintain(self) -> Dict[str, Dict[str, int]]:
+        """Create upcoming partitions and enforce retention on every table"""
+        started = time.monotonic()
+        try:
+            result = {
+                'created': self.create_partitions(),
+                'dropped': self.drop_expired(),
+                'deleted': {'gpu_rollup_1h': self.delete_expired_hourly()}
+            }
+            self.last_error = None
+            return result
+        except Exception as e:
+            self.last_error = str(e)
+            raise
+        finally:
+            self.last_run = time.time()
+            self.last_duration = time.monotonic() - started
+
+    def get_stats(self) -> Dict:
+        """Partition maintenance counters for diagnostics"""
+        return {
+            'retention_days': {
+                table: self.options[setting] for table, setting in PARTITIONED_TABLES.items()
+            },
+            'partitions_ahead': self.options['partitions_ahead'],
+            'created': self.created,
+            'dropped': self.dropped,
+            'last_run': self.last_run,
+            'last_duration': self.last_duration,
+            'last_error': self.last_error
+        }
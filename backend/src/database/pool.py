@@ -0,0 +1,248 @@
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable, Dict, Optional
+
+from psycopg2 import extensions
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_POOL = {
+    'min_size': 1,
+    'max_size': 10,
+    'max_lifetime': 1800.0,         # seconds before a connection is replaced
+    'health_check_interval': 30.0,  # ping connections idle longer than this
+    'acquire_timeout': 5.0          # seconds to wait for a free connection
+}
+
+
+class PoolTimeout(Exception):
+    """No connection became available within acquire_timeout"""
+
+
+class _PooledConnection:
+    __slots__ = ('conn', 'created_at', 'last_used')
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.created_at = self.last_used = time.monotonic()
+
+
+class ConnectionPool:
+    """
+    Thread-safe pool of database connections shared by every component
+    that talks to PostgreSQL. Connections are opened on demand up to
+    max_size, pinged before reuse when they have been idle longer than
+    health_check_interval, and replaced once older than max_lifetime.
+    Time spent waiting for a connection is recorded for diagnostics.
+    """
+
+    def __init__(self, connect: Callable, options: Optional[Dict] = None):
+        self._connect = connect
+        self.options = dict(DEFAULT_POOL)
+        self.options.update(options or {})
+        self.min_size = self.options['min_size']
+        self.max_size = self.options['max_size']
+        self.max_lifetime = self.options['max_lifetime']
+        self.health_check_interval = self.options['health_check_interval']
+        self.acquire_timeout = self.options['acquire_timeout']
+
+        self._idle = deque()
+        self._size = 0  # open connections, idle or checked out
+        self._condition = threading.Condition()
+        self._closed = False
+
+        self.acquired = 0
+        self.created = 0
+        self.recycled = 0
+        self.failed_health_checks = 0
+        self.connect_errors = 0
+        self.timeouts = 0
+        self.last_wait = 0.0
+        self.max_wait = 0.0
+        self._total_wait = 0.0
+        self.last_error: Optional[str] = None
+
+    def open(self):
+        """Open min_size connections up front; failures are logged, not raised"""
+        with self._condition:
+            self._closed = False
+            missing = self.min_size - self._size
+            self._size += max(missing, 0)
+        for _ in range(max(missing, 0)):
+            try:
+                pooled = self._create()
+            except Exception as e:
+                logger.error(f"Failed to open database connection: {e}")
+                with self._condition:
+                    self._size -= missing
+                    self._condition.notify_all()
+                return
+            with self._condition:
+                self._idle.append(pooled)
+                missing -= 1
+                self._condition.notify()
+
+    def close(self):
+        """Close idle connections; checked out ones are closed when returned"""
+        with self._condition:
+            self._closed = True
+            idle, self._idle = list(self._idle), deque()
+            self._size -= len(idle)
+            self._condition.notify_all()
+        for pooled in idle:
+            self._discard_conn(pooled)
+
+    def _create(self) -> _PooledConnection:
+        try:
+            conn = self._connect()
+        except Exception as e:
+            self.connect_errors += 1
+            self.last_error = str(e)
+            raise
+        self.created += 1
+        return _PooledConnection(conn)
+
+    @staticmethod
+    def _discard_conn(pooled: _PooledConnection):
+        try:
+            pooled.conn.close()
+        except Exception:
+            pass
+
+    def _expired(self, pooled: _PooledConnection, now: float) -> bool:
+        return now - pooled.created_at >= self.max_lifetime
+
+    def _healthy(self, pooled: _PooledConnection, now: float) -> bool:
+        if pooled.conn.closed:
+            return False
+        if now - pooled.last_used < self.health_check_interval:
+            return True
+        try:
+            with pooled.conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            pooled.conn.rollback()
+            return True
+        except Exception as e:
+            self.failed_health_checks += 1
+            logger.warning(f"Discarding unhealthy database connection: {e}")
+            return False
+
+    def acquire(self, timeout: Optional[float] = None) -> _PooledConnection:
+        """Check out a connection, waiting up to timeout seconds for one to free up"""
+        timeout = self.acquire_timeout if timeout is None else timeout
+        started = time.monotonic()
+        deadline = started + timeout
+
+        while True:
+            pooled = None
+            with self._condition:
+                while True:
+                    if self._closed:
+                        raise RuntimeError("Connection pool is closed")
+                    if self._idle:
+                        # Most recently used first keeps a warm working set
+                        pooled = self._idle.pop()
+                        break
+                    if self._size < self.max_size:
+                        self._size += 1
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.timeouts += 1
+                        raise PoolTimeout(
+                            f"No database connection available after {timeout}s "
+                            f"({self.max_size} in use)")
+                    self._condition.wait(remaining)
+
+            now = time.monotonic()
+            if pooled is None:
+                try:
+                    pooled = self._create()
+                except Exception:
+                    with self._condition:
+                        self._size -= 1
+                        self._condition.notify()
+                    raise
+            elif self._expired(pooled, now) or not self._healthy(pooled, now):
+                if self._expired(pooled, now):
+                    self.recycled += 1
+                self._discard_conn(pooled)
+                with self._condition:
+                    self._size -= 1
+                continue
+
+            waited = time.monotonic() - started
+            self.acquired += 1
+            self.last_wait = waited
+            self.max_wait = max(self.max_wait, waited)
+            self._total_wait += waited
+            return pooled
+
+    def release(self, pooled: _PooledConnection, discard: bool = False):
+        """Return a connection to the pool, closing it if it is broken or too old"""
+        now = time.monotonic()
+        conn = pooled.conn
+        if not discard and not conn.closed:
+            try:
+                if conn.get_transaction_status() != extensions.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+            except Exception:
+                discard = True
+        if discard or conn.closed or self._closed or self._expired(pooled, now):
+            if not discard and not conn.closed and self._expired(pooled, now):
+                self.recycled += 1
+            self._discard_conn(pooled)
+            with self._condition:
+                self._size -= 1
+                self._condition.notify()
+            return
+
+        pooled.last_used = now
+        with self._condition:
+            self._idle.append(pooled)
+            self._condition.notify()
+
+    @contextmanager
+    def connection(self, timeout: Optional[float] = None):
+        """
+        Borrow a connection for a block. Like `with psycopg2.connect() as conn`
+        the transaction is committed on success and rolled back on error.
+        """
+        pooled = self.acquire(timeout)
+        discard = False
+        try:
+            yield pooled.conn
+            pooled.conn.commit()
+        except BaseException:
+            try:
+                pooled.conn.rollback()
+            except Exception:
+                discard = True
+            raise
+        finally:
+            self.release(pooled, discard=discard or bool(pooled.conn.closed))
+
+    def get_stats(self) -> Dict:
+        """Pool occupancy and checkout wait times for diagnostics"""
+        with self._condition:
+            size, idle = self._size, len(self._idle)
+        return {
+            'size': size,
+            'idle': idle,
+            'in_use': size - idle,
+            'min_size': self.min_size,
+            'max_size': self.max_size,
+            'acquired': self.acquired,
+            'created': self.created,
+            'recycled': self.recycled,
+            'failed_health_checks': self.failed_health_checks,
+            'connect_errors': self.connect_errors,
+            'timeouts': self.timeouts,
+            'last_wait': self.last_wait,
+            'avg_wait': self._total_wait / self.acquired if self.acquired else None,
+            'max_wait': self.max_wait,
+            'last_error': self.last_error
+        }
@@ -0,0 +1,182 @@
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from psycopg2.extras import execute_values
+
+from ..service.smi_parser import MISSING
+
+# Rollup resolutions from finest to coarsest: (name, bucket width in seconds)
+RESOLUTIONS = (('10s', 10), ('1m', 60), ('1h', 3600))
+RESOLUTION_SECONDS = dict(RESOLUTIONS)
+
+# GpuMetrics fields aggregated in every rollup table
+ROLLUP_METRICS = ('temperature', 'gpu_utilization', 'power_draw', 'memory_used', 'fan_speed')
+_STATS = ('min', 'max', 'sum', 'count', 'last')
+
+ROLLUP_COLUMNS = ('bucket', 'gpu_index', 'samples', 'last_at') + tuple(
+    f"{metric}_{stat}" for metric in ROLLUP_METRICS for stat in _STATS
+)
+
+
+def rollup_table(resolution: str) -> str:
+    return f"gpu_rollup_{resolution}"
+
+
+def epoch_seconds(value: Any) -> float:
+    """Seconds since the epoch for an ISO string or datetime; naive values are UTC"""
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+
+class _Bucket:
+    """Partial aggregate of one GPU over one bucket"""
+
+    __slots__ = ('samples', 'last_at', 'stats')
+
+    def __init__(self):
+        self.samples = 0
+        self.last_at = float('-inf')
+        # Per metric: [min, max, sum, count, last]
+        self.stats = [[None, None, 0.0, 0, None] for _ in ROLLUP_METRICS]
+
+    def add(self, t: float, gpu: Dict[str, Any]):
+        self.samples += 1
+        newest = t >= self.last_at
+        if newest:
+            self.last_at = t
+        for stats, metric in zip(self.stats, ROLLUP_METRICS):
+            value = gpu.get(metric)
+            if value is None or value == MISSING:
+                continue
+            if stats[3] == 0:
+                stats[0] = stats[1] = value
+            elif value < stats[0]:
+                stats[0] = value
+            elif value > stats[1]:
+                stats[1] = value
+            stats[2] += value
+            stats[3] += 1
+            if newest or stats[4] is None:
+                stats[4] = value
+
+    def row(self, gpu_index: int, bucket: int) -> tuple:
+        values = [datetime.fromtimestamp(bucket, timezone.utc), gpu_index, self.samples,
+                  datetime.fromtimestamp(self.last_at, timezone.utc)]
+        for stats in self.stats:
+            values.extend(stats)
+        return tuple(values)
+
+
+def aggregate(records: Iterable[Dict[str, Any]]) -> Dict[str, Dict[Tuple[int, int], _Bucket]]:
+    """Partial aggregates per resolution, keyed by (gpu_index, bucket start)"""
+    groups = {name: {} for name, _ in RESOLUTIONS}
+    for record in records:
+        t = epoch_seconds(record['timestamp'])
+        for gpu in record['gpus']:
+            gpu_index = gpu['index']
+            for name, width in RESOLUTIONS:
+                key = (gpu_index, int(t // width) * width)
+                bucket = groups[name].get(key)
+                if bucket is None:
+                    bucket = groups[name][key] = _Bucket()
+                bucket.add(t, gpu)
+    return groups
+
+
+def _merge_clause() -> str:
+    # Combine an incoming partial aggregate with the stored one
+    assignments = [
+        "samples = t.samples + excluded.samples",
+        "last_at = greatest(t.last_at, excluded.last_at)"
+    ]
+    for metric in ROLLUP_METRICS:
+        assignments.extend([
+            f"{metric}_min = least(t.{metric}_min, excluded.{metric}_min)",
+            f"{metric}_max = greatest(t.{metric}_max, excluded.{metric}_max)",
+            f"{metric}_sum = t.{metric}_sum + excluded.{metric}_sum",
+            f"{metric}_count = t.{metric}_count + excluded.{metric}_count",
+            f"{metric}_last = case when excluded.last_at >= t.last_at "
+            f"and excluded.{metric}_last is not null "
+            f"then excluded.{metric}_last else t.{metric}_last end"
+        ])
+    return ", ".join(assignments)
+
+
+_MERGE = _merge_clause()
+
+
+def upsert_rollups(cur, groups: Dict[str, Dict[Tuple[int, int], _Bucket]]) -> int:
+    """Merge partial aggregates into the rollup tables; returns rows written"""
+    written = 0
+    for name, buckets in groups.items():
+        if not buckets:
+            continue
+        rows = [bucket.row(gpu_index, start) for (gpu_index, start), bucket in buckets.items()]
+        execute_values(cur, f"""
+            INSERT INTO {rollup_table(name)} AS t ({', '.join(ROLLUP_COLUMNS)})
+            VALUES %s
+            ON CONFLICT (gpu_index, bucket) DO UPDATE SET {_MERGE}
+        """, rows, page_size=len(rows))
+        written += len(rows)
+    return written
+
+
+def choose_resolution(range_seconds: float, max_points: int, raw_interval: float) -> str:
+    """
+    Finest resolution whose points per GPU over range_seconds fit in
+    max_points: 'raw' (one point per sample every raw_interval seconds),
+    then each rollup in turn, falling back to the coarsest rollup.
+    """
+    if range_seconds / raw_interval <= max_points:
+        return 'raw'
+    for name, width in RESOLUTIONS:
+        if range_seconds / width <= max_points:
+            return name
+    return RESOLUTIONS[-1][0]
+
+
+def rollup_point(row: Dict[str, Any], metrics: Sequence[str] = ROLLUP_METRICS) -> Dict[str, Any]:
+    """API shape of one rollup row: min/max/avg/last per metric"""
+    point = {
+        'bucket': row['bucket'],
+        'gpu_index': row['gpu_index'],
+        'samples': row['samples']
+    }
+    for metric in metrics:
+        count = row[f"{metric}_count"]
+        point[metric] = {
+            'min': row[f"{metric}_min"],
+            'max': row[f"{metric}_max"],
+            'avg': row[f"{metric}_sum"] / count if count else None,
+            'last': row[f"{metric}_last"]
+        }
+    return point
+
+
+def fetch_rollups(cur, resolution: str, start_time: Any, end_time: Any,
+                  gpus: Optional[Sequence[int]] = None,
+                  fields: Optional[Sequence[str]] = None) -> List[Dict[str, Any]]:
+    """
+    Rollup points with bucket in [start_time, end_time], ordered by bucket,
+    optionally only for the given GPUs and the rolled-up metrics in fields
+    """
+    if resolution not in RESOLUTION_SECONDS:
+        raise ValueError(f"Unknown rollup resolution: {resolution}")
+    metrics = [metric for metric in ROLLUP_METRICS if fields is None or metric in fields]
+    columns = ROLLUP_COLUMNS[:4] + tuple(
+        f"{metric}_{stat}" for metric in metrics for stat in _STATS
+    )
+    query = f"""
+        SELECT {', '.join(columns)}
+        FROM {rollup_table(resolution)}
+        WHERE bucket >= %s::timestamptz AND bucket <= %s::timestamptz
+    """
+    params = [start_time, end_time]
+    if gpus is not None:
+        query += " AND gpu_index = ANY(%s)"
+        params.append(list(gpus))
+    cur.execute(query + " ORDER BY bucket, gpu_index", params)
+    return [rollup_point(dict(zip(columns, row)), metrics) for row in cur.fetchall()]
@@ -13,6 +13,19 @@ class NvidiaInfo(BaseModel):
     driver_version: str
 
 
+class GpuInventoryEntry(BaseModel):
+    index: int
+    name: str
+    bus_id: str
+    memory_total: int
+
+
+class GpuInventory(BaseModel):
+    cuda_version: str
+    driver_version: str
+    gpus: List[GpuInventoryEntry]
+
+
 class GpuMetrics(BaseModel):
     compute_mode: str
     fan_speed: int
@@ -24,8 +37,10 @@ class GpuMetrics(BaseModel):
     peak_temperature: int
     power_draw: float
     power_limit: int
-    temp_change_rate: int
+    temp_change_rate: float  # degrees C per minute
     temperature: int
+    power_change_rate: float = 0.0  # watts per minute
+    utilization_change_rate: float = 0.0  # percentage points per minute
 
 
 class GpuMetricsRecord(BaseModel):
@@ -44,28 +44,30 @@ class AlertManager:
             ))
 
             # Memory usage checks
-            memory_usage_percent = (gpu.memory_used / gpu.memory_total) * 100
-            alerts.extend(self._check_metric(
-                metric_name='memory_usage',
-                metric_value=memory_usage_percent,
-                gpu_index=gpu.index,
-                warning=self.thresholds['memory_usage']['warning'],
-                critical=self.thresholds['memory_usage']['critical'],
-                duration=self.thresholds['memory_usage']['duration'],
-                current_time=current_time
-            ))
+            if gpu.memory_total > 0 and gpu.memory_used >= 0:
+                memory_usage_percent = (gpu.memory_used / gpu.memory_total) * 100
+                alerts.extend(self._check_metric(
+                    metric_name='memory_usage',
+                    metric_value=memory_usage_percent,
+                    gpu_index=gpu.index,
+                    warning=self.thresholds['memory_usage']['warning'],
+                    critical=self.thresholds['memory_usage']['critical'],
+                    duration=self.thresholds['memory_usage']['duration'],
+                    current_time=current_time
+                ))
 
             # Power usage checks
-            power_usage_percent = (gpu.power_draw / gpu.power_limit) * 100
-            alerts.extend(self._check_metric(
-                metric_name='power_draw',
-                metric_value=power_usage_percent,
-                gpu_index=gpu.index,
-                warning=self.thresholds['power_draw']['warning'],
-                critical=self.thresholds['power_draw']['critical'],
-                duration=self.thresholds['power_draw']['duration'],
-                current_time=current_time
-            ))
+            if gpu.power_limit > 0 and gpu.power_draw >= 0:
+                power_usage_percent = (gpu.power_draw / gpu.power_limit) * 100
+                alerts.extend(self._check_metric(
+                    metric_name='power_draw',
+                    metric_value=power_usage_percent,
+                    gpu_index=gpu.index,
+                    warning=self.thresholds['power_draw']['warning'],
+                    critical=self.thresholds['power_draw']['critical'],
+                    duration=self.thresholds['power_draw']['duration'],
+                    current_time=current_time
+                ))
 
         if alerts:
             self._store_alerts(alerts)
@@ -115,31 +117,16 @@ class AlertManager:
     def _store_alerts(self, alerts):
         """Store alerts in the database"""
         try:
-            with db.get_connection() as conn:
-                with conn.cursor() as cur:
-                    for alert in alerts:
-                        cur.execute("""
-                            INSERT INTO alert_history (
-                                gpu_index, metric_value, threshold_value, 
-                                severity, created_at
-                            ) VALUES (%s, %s, %s, %s, %s)
-                        """, (
-                            alert['gpu_index'],
-                            alert['value'],
-                            alert['threshold'],
-                            alert['severity'],
-                            alert['timestamp']
-                        ))
+            db.insert_alerts_batch(alerts)
         except Exception as e:
             logger.error(f"Failed to store alerts: {e}")
 
     def cleanup_old_alerts(self):
         """Clean up old alerts based on retention config"""
         try:
-            retention_days = config.get('retention', 'days_to_keep')
-            with db.get_connection() as conn:
-                with conn.cursor() as cur:
-                    cur.execute("SELECT cleanup_old_alerts(%s)", (retention_days,))
+            retention_days = config.get('retention', 'alerts_days_to_keep')
+            # Drops whole expired daily partitions instead of deleting rows
+            db.partitions.drop_expired({'alert_history': retention_days})
             logger.info(f"Cleaned up alerts older than {retention_days} days")
         except Exception as e:
             logger.error(f"Failed to cleanup old alerts: {e}")
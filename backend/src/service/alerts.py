@@ -89,7 +89,9 @@ class AlertSystem:
                         fan_level, current_time
                     ))
 
-            # Memory usage check
+            # Memory usage check (skipped when the driver reports no totals)
+            if gpu.memory_total <= 0 or gpu.memory_used < 0:
+                continue
             memory_percent = (gpu.memory_used / gpu.memory_total) * 100
             mem_level = self.get_metric_level('memory_usage', memory_percent)
             if mem_level in [AlertLevel.CRITICAL, AlertLevel.WARNING]:
@@ -121,21 +123,7 @@ class AlertSystem:
     def _store_alerts(self, alerts: List[Dict[str, Any]]):
         """Store alerts in database"""
         try:
-            with db.get_connection() as conn:
-                with conn.cursor() as cur:
-                    for alert in alerts:
-                        cur.execute("""
-                            INSERT INTO alert_history (
-                                gpu_index, metric_value, threshold_value, 
-                                severity, created_at
-                            ) VALUES (%s, %s, %s, %s, %s)
-                        """, (
-                            alert['gpu_index'],
-                            alert['value'],
-                            alert['threshold'],
-                            alert['severity'],
-                            alert['timestamp']
-                        ))
+            db.insert_alerts_batch(alerts)
         except Exception as e:
             logger.error(f"Failed to store alerts: {e}")
 
@@ -0,0 +1,437 @@
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from src.service.settings import settings
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ANALYTICS_CACHE = {
+    'enabled': True,
+    'bucket_seconds': 3600,     # must divide an hour so hour-of-day groups stay exact
+    'settle_seconds': 300,      # a bucket is closed once its end is this far in the past
+    'ttl': 86400,               # seconds a closed bucket's partials are reused
+    'max_buckets': 2160,        # 90 days of hourly buckets
+    'max_bytes': 64 * 1024 * 1024
+}
+
+# Per-GPU series kept in the partials: the analysed metrics plus the two
+# ratios behind the efficiency metrics
+PARTIAL_METRICS = (
+    'gpu_utilization', 'temperature', 'memory_used', 'power_draw',
+    'power_efficiency', 'memory_utilization'
+)
+_METRIC_COLUMN = {metric: column for column, metric in enumerate(PARTIAL_METRICS)}
+# Right-closed utilization bins, as pd.cut with these edges
+UTILIZATION_BINS = np.array([0, 20, 40, 60, 80, 100], dtype=np.float64)
+_STATS = ('n', 'mean', 'm2', 'minimum', 'maximum', 'peak_time', 'x_mean', 'x_m2', 'c_xy')
+
+_EPOCH = pd.Timestamp(0, tz='UTC')
+
+
+class BucketPartials:
+    """
+    Aggregates of one time bucket of a history frame. Per GPU and metric:
+    count, mean and centered sum of squares of the readings, min/max and
+    the time of the first max, plus the mean and sum of squares of each
+    reading's sample number (its position among the GPU's rows in the
+    bucket) and their co-moment with the readings, which is what a linear
+    trend per sample needs. Each array is shaped (GPUs, PARTIAL_METRICS).
+    """
+
+    def __init__(self, start: float, gpus: np.ndarray, rows: np.ndarray,
+                 stats: Dict[str, np.ndarray], histogram: np.ndarray):
+        self.start = start
+        self.gpus = gpus
+        self.rows = rows            # (GPUs,) samples per GPU
+        self.stats = stats
+        self.histogram = histogram  # (GPUs, utilization bins) counts
+
+    @classmethod
+    def empty(cls, start: float) -> 'BucketPartials':
+        shape = (0, len(PARTIAL_METRICS))
+        return cls(start, np.empty(0, dtype=np.int16), np.empty(0, dtype=np.int64),
+                   {name: np.empty(shape) for name in _STATS},
+                   np.empty((0, len(UTILIZATION_BINS) - 1), dtype=np.int64))
+
+    @property
+    def nbytes(self) -> int:
+        return (self.gpus.nbytes + self.rows.nbytes + self.histogram.nbytes
+                + sum(array.nbytes for array in self.stats.values()))
+
+
+def epoch_column(frame: pd.DataFrame) -> np.ndarray:
+    """Timestamps of a history frame as float epoch seconds"""
+    return (frame['timestamp'] - _EPOCH).dt.total_seconds().to_numpy(dtype=np.float64)
+
+
+def _series(frame: pd.DataFrame) -> np.ndarray:
+    # (rows, PARTIAL_METRICS) readings, NaN where missing or not finite
+    columns = [frame[metric].to_numpy(dtype=np.float64) for metric in PARTIAL_METRICS[:4]]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        columns.append(columns[0] / columns[3])
+        columns.append(frame['memory_used'].to_numpy(dtype=np.float64)
+                       / frame['memory_total'].to_numpy(dtype=np.float64))
+    values = np.column_stack(columns)
+    values[~np.isfinite(values)] = np.nan
+    return values
+
+
+def build_partials(frame: pd.DataFrame, bucket_seconds: int) -> List[BucketPartials]:
+    """
+    Partials of every bucket holding rows of a time-ordered history frame.
+    A 'weight' column (deadband storage, see frames.hold_weights) counts a
+    row as that many consecutive samples of its value, as if each GPU were
+    forward filled to the sampling grid; otherwise every row counts once.
+    """
+    if frame.empty:
+        return []
+    times = epoch_column(frame)
+    weights = (frame['weight'].to_numpy(dtype=np.float64) if 'weight' in frame
+               else np.ones(len(times)))
+    buckets = np.floor(times / bucket_seconds) * bucket_seconds
+    starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+    counts = np.diff(np.r_[starts, len(times)])
+    bucket_number = np.repeat(np.arange(len(starts)), counts)
+
+    # One group per bucket and GPU; order lists each group's rows in time order
+    gpu_values, gpu_rank = np.unique(frame['gpu_index'].to_numpy(), return_inverse=True)
+    keys, group = np.unique(bucket_number * len(gpu_values) + gpu_rank, return_inverse=True)
+    groups = len(keys)
+    order = np.argsort(group, kind='stable')
+    group_starts = np.flatnonzero(np.r_[True, np.diff(group[order]) != 0])
+    group_sizes = np.diff(np.r_[group_starts, len(times)])
+    # A row's samples take the sample numbers following its group's earlier
+    # rows; x is their center, and spread their sum of squares around it
+    ordered = weights[order]
+    before = np.cumsum(ordered) - ordered
+    first = np.empty(len(times))
+    first[order] = before - np.repeat(before[group_starts], group_sizes)
+    positions = first + (weights - 1) / 2
+    spread = weights * (weights * weights - 1) / 12
+    group_rows = np.rint(np.add.reduceat(ordered, group_starts)).astype(np.int64)
+
+    values = _series(frame)
+    stats = {name: np.empty((groups, len(PARTIAL_METRICS))) for name in _STATS}
+    for column in range(len(PARTIAL_METRICS)):
+        y = values[:, column]
+        valid = ~np.isnan(y)
+        w = np.where(valid, weights, 0)
+        n = np.bincount(group, weights=w, minlength=groups)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            mean = np.bincount(group, weights=np.where(valid, w * y, 0), minlength=groups) / n
+            x_mean = np.bincount(group, weights=w * positions, minlength=groups) / n
+        dy = np.where(valid, y - mean[group], 0)
+        dx = np.where(valid, positions - x_mean[group], 0)
+        highs = np.maximum.reduceat(np.where(valid, y, -np.inf)[order], group_starts)
+        # First row (in time order) of each group holding its max
+        is_peak = valid & (y == highs[group])
+        peak_row = np.minimum.reduceat(np.where(is_peak, np.arange(len(y)), len(y))[order],
+                                       group_starts)
+        stats['n'][:, column] = n
+        stats['mean'][:, column] = np.where(n > 0, mean, 0)
+        stats['m2'][:, column] = np.bincount(group, weights=w * dy * dy, minlength=groups)
+        stats['minimum'][:, column] = np.minimum.reduceat(np.where(valid, y, np.inf)[order],
+                                                          group_starts)
+        stats['maximum'][:, column] = highs
+        stats['peak_time'][:, column] = times[np.minimum(peak_row, len(y) - 1)]
+        stats['x_mean'][:, column] = np.where(n > 0, x_mean, 0)
+        stats['x_m2'][:, column] = np.bincount(
+            group, weights=w * dx * dx + np.where(valid, spread, 0), minlength=groups
+        )
+        stats['c_xy'][:, column] = np.bincount(group, weights=w * dx * dy, minlength=groups)
+
+    utilization = values[:, _METRIC_COLUMN['gpu_utilization']]
+    bins = np.searchsorted(UTILIZATION_BINS, utilization, side='left') - 1
+    binned = (bins >= 0) & (bins < len(UTILIZATION_BINS) - 1)
+    histogram = np.bincount(group[binned] * (len(UTILIZATION_BINS) - 1) + bins[binned],
+                            weights=weights[binned], minlength=groups * (len(UTILIZATION_BINS) - 1))
+    histogram = np.rint(histogram).astype(np.int64).reshape(groups, len(UTILIZATION_BINS) - 1)
+
+    key_bucket = keys // len(gpu_values)
+    partials = []
+    for number, bucket_start in enumerate(buckets[starts].tolist()):
+        cells = slice(*np.searchsorted(key_bucket, [number, number + 1]))
+        partials.append(BucketPartials(
+            bucket_start,
+            gpu_values[keys[cells] % len(gpu_values)].astype(np.int16),
+            group_rows[cells].copy(),
+            {name: array[cells].copy() for name, array in stats.items()},
+            histogram[cells].copy()
+        ))
+    return partials
+
+
+def _cells(partials: List[BucketPartials]):
+    # Per-GPU cells of consecutive partials grouped by GPU, each GPU's in time
+    # order: GPU indices, sort order, group starts and group sizes
+    gpus = np.concatenate([part.gpus for part in partials]).astype(np.int64)
+    gpu_values, inverse = np.unique(gpus, return_inverse=True)
+    order = np.argsort(inverse, kind='stable')
+    starts = np.flatnonzero(np.r_[True, np.diff(inverse[order]) != 0])
+    return gpu_values, order, starts, np.diff(np.r_[starts, len(gpus)])
+
+
+def combine_partials(partials: List[BucketPartials]) -> Dict[str, np.ndarray]:
+    """
+    Statistics per GPU and metric over consecutive partials, as if computed
+    over each GPU's concatenated rows: sample numbers continue from one
+    bucket to the next and the centered moments are merged exactly (Chan
+    et al.). 'gpus' holds the GPU of each row of the (GPUs, metrics) arrays.
+    """
+    partials = [part for part in partials if len(part.gpus)]
+    if not partials:
+        shape = (0, len(PARTIAL_METRICS))
+        return {'gpus': np.empty(0, dtype=np.int64), 'rows': np.empty(0, dtype=np.int64),
+                **{name: np.empty(shape) for name in _STATS if name != 'x_mean'},
+                'histogram': np.empty((0, len(UTILIZATION_BINS) - 1), dtype=np.int64)}
+    gpus, order, starts, sizes = _cells(partials)
+    cells = {
+        name: np.concatenate([part.stats[name] for part in partials])[order] for name in _STATS
+    }
+    rows = np.concatenate([part.rows for part in partials])[order]
+    # Sample numbers of a GPU's later buckets follow on from its earlier ones
+    before = np.cumsum(rows) - rows
+    cells['x_mean'] = cells['x_mean'] + (before - np.repeat(before[starts], sizes))[:, None]
+
+    def total(values):
+        return np.add.reduceat(values, starts, axis=0)
+
+    n = total(cells['n'])
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean = total(cells['n'] * cells['mean']) / n
+        x_mean = total(cells['n'] * cells['x_mean']) / n
+    has_readings = cells['n'] > 0
+    dy = np.where(has_readings, cells['mean'] - np.repeat(mean, sizes, axis=0), 0)
+    dx = np.where(has_readings, cells['x_mean'] - np.repeat(x_mean, sizes, axis=0), 0)
+
+    maximum = np.maximum.reduceat(cells['maximum'], starts, axis=0)
+    # Earliest time at which each GPU's max was reached
+    at_maximum = cells['maximum'] == np.repeat(maximum, sizes, axis=0)
+    peak_time = np.minimum.reduceat(np.where(at_maximum, cells['peak_time'], np.inf), starts,
+                                    axis=0)
+    return {
+        'gpus': gpus,
+        'rows': total(rows),
+        'n': n,
+        'mean': mean,
+        'm2': total(cells['m2'] + cells['n'] * dy * dy),
+        'minimum': np.minimum.reduceat(cells['minimum'], starts, axis=0),
+        'maximum': maximum,
+        'peak_time': peak_time,
+        'x_m2': total(cells['x_m2'] + cells['n'] * dx * dx),
+        'c_xy': total(cells['c_xy'] + cells['n'] * dx * dy),
+        'histogram': total(np.concatenate([part.histogram for part in partials])[order])
+    }
+
+
+def period_means(partials: List[BucketPartials],
+                 periods: List[int]) -> Dict[int, Dict[int, np.ndarray]]:
+    """
+    Mean of each metric per GPU and period, where periods[i] is the period
+    (e.g. hour of day) of partials[i]. Returns {gpu: {period: means}}, with
+    NaN where a GPU had samples but no reading of a metric in the period.
+    """
+    partials = [(part, period) for part, period in zip(partials, periods) if len(part.gpus)]
+    if not partials:
+        return {}
+    gpus = np.concatenate([part.gpus for part, _ in partials]).astype(np.int64)
+    period_of = np.repeat([period for _, period in partials],
+                          [len(part.gpus) for part, _ in partials])
+    keys, group = np.unique(np.column_stack([gpus, period_of]), axis=0, return_inverse=True)
+    group = group.reshape(-1)
+    n = np.concatenate([part.stats['n'] for part, _ in partials])
+    sums = n * np.concatenate([part.stats['mean'] for part, _ in partials])
+    totals = np.zeros((len(keys), len(PARTIAL_METRICS)))
+    counts = np.zeros((len(keys), len(PARTIAL_METRICS)))
+    np.add.at(totals, group, sums)
+    np.add.at(counts, group, n)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        means = totals / counts
+    result = {}
+    for (gpu, period), values in zip(keys.tolist(), means):
+        result.setdefault(gpu, {})[period] = values
+    return result
+
+
+def metric_column(metric: str) -> int:
+    """Column of a metric in the partials arrays"""
+    return _METRIC_COLUMN[metric]
+
+
+class AnalyticsCache:
+    """
+    Partials of closed time buckets of history, so an analysis over days
+    only loads the buckets it has not seen plus the still-open tail. Entries
+    expire after ttl and are evicted least recently used first once there
+    are more than max_buckets or they take more than max_bytes. Writers of
+    late rows (spool replay, retried batches) drop the buckets they wrote
+    into with invalidate().
+    """
+
+    def __init__(self, options: Optional[Dict] = None):
+        self.options = dict(DEFAULT_ANALYTICS_CACHE)
+        self.options.update(options or settings.get('analytics', 'cache', default={}) or {})
+        self.enabled = bool(self.options['enabled'])
+        self.bucket_seconds = int(self.options['bucket_seconds'])
+        if self.bucket_seconds <= 0 or 3600 % self.bucket_seconds:
+            raise ValueError(f"analytics.cache.bucket_seconds must divide 3600, "
+                             f"not {self.bucket_seconds}")
+        self.settle_seconds = float(self.options['settle_seconds'])
+        self.ttl = float(self.options['ttl'])
+        self.max_buckets = int(self.options['max_buckets'])
+        self.max_bytes = int(self.options['max_bytes'])
+
+        self._lock = threading.Lock()
+        # bucket start -> (partials, time cached), least recently used first
+        self._entries: 'OrderedDict[float, tuple]' = OrderedDict()
+        self._bytes = 0
+        # Bumped by invalidate() so partials loaded before it are not cached
+        self._generation = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evicted = 0
+        self.invalidated = 0
+        self.loads = 0
+
+    def closed_before(self, end: float) -> float:
+        """Start of the first bucket that is not closed yet as of end (epoch seconds)"""
+        closed = min(end, time.time() - self.settle_seconds)
+        return math.floor(closed / self.bucket_seconds) * self.bucket_seconds
+
+    def _get(self, start: float) -> Optional[BucketPartials]:
+        entry = self._entries.get(start)
+        if entry is None:
+            return None
+        if time.monotonic() - entry[1] > self.ttl:
+            self._remove(start)
+            self.expired += 1
+            return None
+        self._entries.move_to_end(start)
+        return entry[0]
+
+    def _remove(self, start: float):
+        partials, _ = self._entries.pop(start)
+        self._bytes -= partials.nbytes
+
+    def _put(self, partials: BucketPartials, generation: Optional[int] = None):
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                # Rows were written into some bucket while these were loaded
+                return
+            if partials.start in self._entries:
+                self._remove(partials.start)
+            self._entries[partials.start] = (partials, time.monotonic())
+            self._bytes += partials.nbytes
+            while self._entries and (len(self._entries) > self.max_buckets
+                                     or self._bytes > self.max_bytes):
+                self._remove(next(iter(self._entries)))
+                self.evicted += 1
+
+    def invalidate(self, start: float, end: float) -> int:
+        """
+        Drop cached buckets holding any time in [start, end] (epoch seconds)
+        so the next analysis reloads them; returns how many were dropped
+        """
+        first = math.floor(start / self.bucket_seconds) * self.bucket_seconds
+        with self._lock:
+            self._generation += 1
+            count = int((end - first) // self.bucket_seconds) + 1
+            if count < len(self._entries):
+                buckets = [float(first + i * self.bucket_seconds) for i in range(count)]
+            else:
+                buckets = [bucket for bucket in self._entries if first <= bucket <= end]
+            dropped = 0
+            for bucket in buckets:
+                if bucket in self._entries:
+                    self._remove(bucket)
+                    dropped += 1
+            self.invalidated += dropped
+        return dropped
+
+    def _load(self, load: Callable, start: float, end: float,
+              include_end: bool = False) -> List[BucketPartials]:
+        # Partials of [start, end), or [start, end] with include_end
+        self.loads += 1
+        frame = load(datetime.fromtimestamp(start, timezone.utc),
+                     datetime.fromtimestamp(end, timezone.utc))
+        if not include_end and not frame.empty:
+            frame = frame[epoch_column(frame) < end]
+        return build_partials(frame, self.bucket_seconds)
+
+    def partials(self, load: Callable[[datetime, datetime], pd.DataFrame],
+                 start_time: datetime, end_time: datetime) -> List[BucketPartials]:
+        """
+        Partials covering [start_time, end_time] in time order. Closed
+        buckets come from the cache or, for runs of missing ones, a single
+        load each; the partial head bucket and the open tail are always
+        loaded with load(start, end), which returns the rows in that
+        inclusive range.
+        """
+        start, end = start_time.timestamp(), end_time.timestamp()
+        first = math.ceil(start / self.bucket_seconds) * self.bucket_seconds
+        closed = self.closed_before(end)
+        if not self.enabled or first >= closed:
+            return self._load(load, start, end, include_end=True)
+
+        parts = self._load(load, start, first) if start < first else []
+        missing = []
+        bucket_starts = np.arange(first, closed, self.bucket_seconds, dtype=np.float64).tolist()
+        cached = {}
+        with self._lock:
+            generation = self._generation
+            for bucket in bucket_starts:
+                partials = self._get(bucket)
+                if partials is None:
+                    missing.append(bucket)
+                else:
+                    cached[bucket] = partials
+            self.hits += len(cached)
+            self.misses += len(missing)
+
+        # Consecutive missing buckets are loaded together
+        run_start = 0
+        for i in range(1, len(missing) + 1):
+            if i == len(missing) or missing[i] != missing[i - 1] + self.bucket_seconds:
+                built = {part.start: part for part in self._load(
+                    load, missing[run_start], missing[i - 1] + self.bucket_seconds)}
+                for bucket in missing[run_start:i]:
+                    partials = built.get(bucket) or BucketPartials.empty(bucket)
+                    self._put(partials, generation)
+                    cached[bucket] = partials
+                run_start = i
+
+        parts.extend(cached[bucket] for bucket in bucket_starts if len(cached[bucket].gpus))
+        parts.extend(self._load(load, closed, end, include_end=True))
+        return parts
+
+    def get_stats(self) -> Dict:
+        """Size, memory use and hit ratio for diagnostics"""
+        with self._lock:
+            buckets = len(self._entries)
+            memory_bytes = self._bytes
+        lookups = self.hits + self.misses
+        return {
+            'enabled': self.enabled,
+            'bucket_seconds': self.bucket_seconds,
+            'buckets': buckets,
+            'max_buckets': self.max_buckets,
+            'memory_bytes': memory_bytes,
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': self.hits / lookups if lookups else None,
+            'expired': self.expired,
+            'evicted': self.evicted,
+            'invalidated': self.invalidated,
+            'loads': self.loads
+        }
@@ -1,77 +1,260 @@
 import logging
-from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Tuple
+import math
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
 import pandas as pd
 import numpy as np
-from scipy import stats
 from .config import config
 from src.database.client import db
+from src.service.anomaly_detector import AnomalyDetector, anomaly_detector
+from src.service.analytics_cache import (
+    AnalyticsCache, BucketPartials, build_partials, combine_partials, metric_column, period_means
+)
 
 logger = logging.getLogger(__name__)
 
+# Report sections and the history window each one covers by default
+REPORT_WINDOWS = {
+    'usage_patterns': timedelta(days=7),
+    'anomalies': timedelta(hours=24),
+    'trends': timedelta(days=30),
+    'efficiency': timedelta(days=7)
+}
+
+
+def parse_analyses(value: str) -> Tuple[str, ...]:
+    """
+    Parse a comma-separated list of report sections, e.g. "anomalies,trends".
+    Raises ValueError for unknown sections.
+    """
+    analyses = tuple(dict.fromkeys(name.strip() for name in value.split(',') if name.strip()))
+    unknown = [name for name in analyses if name not in REPORT_WINDOWS]
+    if unknown or not analyses:
+        raise ValueError(f"Unknown analyses: {', '.join(unknown) or 'none given'}. "
+                         f"Valid analyses: {', '.join(REPORT_WINDOWS)}")
+    return analyses
+
+
+def json_safe(value: Any) -> Any:
+    """NumPy scalars, timestamps and NaN in analysis results as plain JSON values"""
+    if isinstance(value, dict):
+        return {str(key): json_safe(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [json_safe(item) for item in value]
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def _beta_fraction(a: float, b: float, x: float) -> float:
+    """Continued fraction of the regularized incomplete beta function (modified Lentz)"""
+    tiny = 1.0e-300
+    c, d = 1.0, 1.0 - (a + b) * x / (a + 1.0)
+    d = 1.0 / (d if abs(d) > tiny else tiny)
+    result = d
+    for m in range(1, 100000):
+        for numerator in (m * (b - m) * x / ((a + 2 * m - 1) * (a + 2 * m)),
+                          -(a + m) * (a + b + m) * x / ((a + 2 * m) * (a + 2 * m + 1))):
+            d = 1.0 + numerator * d
+            d = 1.0 / (d if abs(d) > tiny else tiny)
+            c = 1.0 + numerator / c
+            c = c if abs(c) > tiny else tiny
+            result *= c * d
+        if abs(c * d - 1.0) < 1.0e-15:
+            break
+    return result
+
+
+def _incomplete_beta(a: float, b: float, x: float) -> float:
+    """Regularized incomplete beta function I_x(a, b)"""
+    if x <= 0.0:
+        return 0.0
+    if x >= 1.0:
+        return 1.0
+    log_front = (math.lgamma(a + b) - math.lgamma(a) - math.lgamma(b)
+                 + a * math.log(x) + b * math.log1p(-x))
+    # The fraction converges quickly below the mean; use the symmetry above it
+    if x < (a + 1.0) / (a + b + 2.0):
+        return math.exp(log_front) * _beta_fraction(a, b, x) / a
+    return 1.0 - math.exp(log_front) * _beta_fraction(b, a, 1.0 - x) / b
+
+
+def student_t_sf(t: float, df: float) -> float:
+    """Survival function P(T > t) of Student's t distribution with df degrees of freedom"""
+    if math.isnan(t):
+        return math.nan
+    tail = 0.5 * _incomplete_beta(df / 2.0, 0.5, df / (df + t * t)) if math.isfinite(t) else 0.0
+    return tail if t >= 0 else 1.0 - tail
+
+
 class AnalyticsService:
-    def __init__(self):
-        self.anomaly_threshold = 2.0  # Standard deviations for anomaly detection
+    def __init__(self, cache: Optional[AnalyticsCache] = None,
+                 detector: Optional[AnomalyDetector] = None):
+        self.anomaly_threshold = 2.0  # Standard deviations for batch anomaly detection
+        self.cache = cache or AnalyticsCache()
+        # Streaming detector serving anomalies without a history scan
+        self.detector = detector
+
+    def load_frame(self, start_time: datetime, end_time: datetime) -> pd.DataFrame:
+        """
+        GPU metrics within the specified time range: one row per GPU sample
+        with timestamp, gpu_index and float32 metric columns (NaN where a
+        reading is missing). Raises on database errors.
+        """
+        return db.get_gpu_frame(start_time, end_time)
 
     def get_historical_metrics(self, start_time: datetime, 
                              end_time: datetime) -> pd.DataFrame:
-        """Fetch historical GPU metrics within the specified time range."""
+        """Fetch historical GPU metrics, or an empty frame on errors."""
         try:
-            with db.get_connection() as conn:
-                query = """
-                    SELECT 
-                        timestamp,
-                        jsonb_array_elements(gpus) as gpu_data
-                    FROM gpu_metrics
-                    WHERE timestamp BETWEEN %s AND %s
-                    ORDER BY timestamp
-                """
-                df = pd.read_sql_query(query, conn, params=(start_time, end_time))
-                
-                # Parse GPU data from JSONB
-                df['gpu_data'] = df['gpu_data'].apply(eval)
-                metrics_df = pd.json_normalize(df['gpu_data'])
-                
-                # Combine with timestamp
-                metrics_df['timestamp'] = df['timestamp']
-                
-                return metrics_df
+            return self.load_frame(start_time, end_time)
         except Exception as e:
             logger.error(f"Error fetching historical metrics: {e}")
             return pd.DataFrame()
 
+    def generate_report(self, windows: Optional[Dict[str, timedelta]] = None,
+                        end_time: Optional[datetime] = None) -> Dict:
+        """
+        Compute several analyses from one pass over history. Usage patterns,
+        trends and efficiency are folded from cached partials of closed
+        buckets plus the open tail; anomalies come from the streaming
+        detector, or else need the individual samples of their window. Rows
+        are fetched in a single load that every section slices. Returns the
+        sections, where each came from and per-stage timings. A section whose
+        history could not be loaded is None, with the reason in 'errors'.
+        """
+        windows = dict(windows or REPORT_WINDOWS)
+        end_time = end_time or datetime.now(timezone.utc)
+        if end_time.tzinfo is None:
+            end_time = end_time.astimezone(timezone.utc)
+        start_time = end_time - max(windows.values(), default=timedelta(0))
+        sources = {}
+        for name in windows:
+            if name == 'anomalies' and self.detector is not None and self.detector.enabled:
+                sources[name] = 'detector'
+            elif self.cache.enabled and name in self._PARTIAL_ANALYSES:
+                sources[name] = 'partials'
+            else:
+                sources[name] = 'samples'
+        raw_starts = [end_time - windows[name]
+                      for name, source in sources.items() if source == 'samples']
+        if 'partials' in sources.values():
+            closed = self.cache.closed_before(end_time.timestamp())
+            raw_starts.append(datetime.fromtimestamp(closed, timezone.utc))
+        raw_start = max(min(raw_starts, default=end_time), start_time)
+        timings = {}
+
+        errors = {}
+        started = time.perf_counter()
+        df = pd.DataFrame()
+        try:
+            if raw_starts:
+                df = self.load_frame(raw_start, end_time)
+        except Exception as e:
+            # An empty result would pass the outage off as idle GPUs
+            logger.error(f"Error fetching historical metrics: {e}")
+            errors.update((name, str(e))
+                          for name, source in sources.items() if source != 'detector')
+        timings['load'] = round((time.perf_counter() - started) * 1000, 3)
+        load = self._frame_loader(df, raw_start, end_time)
+
+        sections = {}
+        for name, window in windows.items():
+            started = time.perf_counter()
+            if name in errors:
+                sections[name] = None
+            elif sources[name] == 'detector':
+                sections[name] = self.detector.recent_events(end_time - window, end_time)
+            elif sources[name] == 'partials':
+                try:
+                    parts = self.cache.partials(load, end_time - window, end_time)
+                    sections[name] = self._PARTIAL_ANALYSES[name](self, parts)
+                except Exception as e:
+                    logger.error(f"Error computing {name} from partials: {e}")
+                    sections[name] = None
+                    errors[name] = str(e)
+            else:
+                sections[name] = self._ANALYSES[name](self, self._trailing(df, end_time - window))
+            timings[name] = round((time.perf_counter() - started) * 1000, 3)
+
+        return json_safe({
+            'start_time': start_time,
+            'end_time': end_time,
+            'rows': len(df),
+            'windows': {name: window.total_seconds() for name, window in windows.items()},
+            'sources': sources,
+            'analyses': sections,
+            'errors': errors,
+            'timings_ms': timings
+        })
+
     def calculate_usage_patterns(self, days: int = 7) -> Dict:
         """Calculate GPU usage patterns over time."""
-        end_time = datetime.now()
-        start_time = end_time - timedelta(days=days)
-        
-        df = self.get_historical_metrics(start_time, end_time)
-        if df.empty:
-            return {}
-
-        patterns = {
-            'hourly_avg': self._calculate_hourly_averages(df),
-            'daily_avg': self._calculate_daily_averages(df),
-            'peak_usage_times': self._find_peak_usage_times(df),
-            'utilization_distribution': self._calculate_utilization_distribution(df)
-        }
-        
-        return patterns
+        return self._usage_patterns(self._recent(timedelta(days=days)))
 
     def detect_anomalies(self, hours: int = 24) -> List[Dict]:
         """Detect anomalies in GPU metrics."""
+        if self.detector is not None and self.detector.enabled:
+            return self.detector.recent_events(datetime.now(timezone.utc) - timedelta(hours=hours))
+        return self._anomalies(self._recent(timedelta(hours=hours)))
+
+    def analyze_performance_trends(self, days: int = 30) -> Dict:
+        """Analyze long-term performance trends."""
+        return self._trends(self._recent(timedelta(days=days)))
+
+    def calculate_efficiency_metrics(self, days: int = 7) -> Dict:
+        """Calculate GPU efficiency metrics."""
+        return self._efficiency(self._recent(timedelta(days=days)))
+
+    def _recent(self, window: timedelta) -> pd.DataFrame:
         end_time = datetime.now()
-        start_time = end_time - timedelta(hours=hours)
-        
-        df = self.get_historical_metrics(start_time, end_time)
+        return self.get_historical_metrics(end_time - window, end_time)
+
+    def _frame_loader(self, df: pd.DataFrame, start_time: datetime, end_time: datetime):
+        """Loader for the cache that slices df inside [start_time, end_time], else queries"""
+        def load(range_start: datetime, range_end: datetime) -> pd.DataFrame:
+            if start_time <= range_start and range_end <= end_time:
+                if df.empty:
+                    return df
+                lo = df['timestamp'].searchsorted(pd.Timestamp(range_start), 'left')
+                hi = df['timestamp'].searchsorted(pd.Timestamp(range_end), 'right')
+                return df.iloc[lo:hi]
+            return self.load_frame(range_start, range_end)
+        return load
+
+    @staticmethod
+    def _trailing(df: pd.DataFrame, start_time: datetime) -> pd.DataFrame:
+        """Rows of a time-ordered frame at or after start_time"""
+        if df.empty:
+            return df
+        return df.iloc[df['timestamp'].searchsorted(pd.Timestamp(start_time)):]
+
+    def _partials(self, df: pd.DataFrame) -> List[BucketPartials]:
+        """Bucket partials of a history frame, the per-GPU aggregates every section uses"""
+        return build_partials(df, self.cache.bucket_seconds)
+
+    def _usage_patterns(self, df: pd.DataFrame) -> Dict:
+        return self._usage_patterns_from(self._partials(df))
+
+    def _trends(self, df: pd.DataFrame) -> Dict:
+        return self._trends_from(self._partials(df))
+
+    def _efficiency(self, df: pd.DataFrame) -> Dict:
+        return self._efficiency_from(self._partials(df))
+
+    def _anomalies(self, df: pd.DataFrame) -> List[Dict]:
         if df.empty:
             return []
 
         anomalies = []
         
         # Check for anomalies in different metrics
-        metrics = ['utilization', 'temperature', 'memory_used', 'power_draw']
-        for metric in metrics:
+        for metric in self._PATTERN_METRICS:
             if metric in df.columns:
                 anomalies.extend(
                     self._detect_metric_anomalies(df, metric)
@@ -79,130 +262,160 @@ class AnalyticsService:
         
         return anomalies
 
-    def analyze_performance_trends(self, days: int = 30) -> Dict:
-        """Analyze long-term performance trends."""
-        end_time = datetime.now()
-        start_time = end_time - timedelta(days=days)
-        
-        df = self.get_historical_metrics(start_time, end_time)
-        if df.empty:
+    def _usage_patterns_from(self, parts: List[BucketPartials]) -> Dict:
+        """Usage patterns per GPU from bucket partials"""
+        combined = combine_partials(parts)
+        if not len(combined['gpus']):
             return {}
 
-        trends = {
-            'utilization_trend': self._calculate_trend(df, 'utilization'),
-            'temperature_trend': self._calculate_trend(df, 'temperature'),
-            'memory_trend': self._calculate_trend(df, 'memory_used'),
-            'power_trend': self._calculate_trend(df, 'power_draw')
+        hourly = self._calculate_hourly_averages(parts)
+        daily = self._calculate_daily_averages(parts)
+        peaks = self._find_peak_usage_times(combined)
+        distribution = self._calculate_utilization_distribution(combined)
+        return {
+            gpu: {
+                'hourly_avg': hourly[gpu],
+                'daily_avg': daily[gpu],
+                'peak_usage_times': peaks[gpu],
+                'utilization_distribution': distribution[gpu]
+            }
+            for gpu in combined['gpus'].tolist()
         }
-        
-        return trends
 
-    def calculate_efficiency_metrics(self, days: int = 7) -> Dict:
-        """Calculate GPU efficiency metrics."""
-        end_time = datetime.now()
-        start_time = end_time - timedelta(days=days)
-        
-        df = self.get_historical_metrics(start_time, end_time)
-        if df.empty:
-            return {}
+    def _trends_from(self, parts: List[BucketPartials]) -> Dict:
+        """Performance trends per GPU from bucket partials"""
+        combined = combine_partials(parts)
+        return {
+            gpu: {
+                f'{name}_trend': self._calculate_trend(combined, row, metric)
+                for name, metric in (('utilization', 'gpu_utilization'),
+                                     ('temperature', 'temperature'),
+                                     ('memory', 'memory_used'), ('power', 'power_draw'))
+            }
+            for row, gpu in enumerate(combined['gpus'].tolist())
+        }
 
-        metrics = {}
-        
-        # Calculate power efficiency (GFLOPS/Watt if available)
-        if all(col in df.columns for col in ['power_draw', 'utilization']):
-            metrics['power_efficiency'] = self._calculate_power_efficiency(df)
-        
-        # Calculate memory efficiency
-        if all(col in df.columns for col in ['memory_used', 'memory_total']):
-            metrics['memory_efficiency'] = self._calculate_memory_efficiency(df)
-        
-        return metrics
-
-    def _calculate_hourly_averages(self, df: pd.DataFrame) -> Dict:
-        """Calculate average metrics by hour of day."""
-        df['hour'] = df['timestamp'].dt.hour
-        hourly_avg = df.groupby('hour').agg({
-            'utilization': 'mean',
-            'temperature': 'mean',
-            'memory_used': 'mean',
-            'power_draw': 'mean'
-        }).to_dict()
-        
-        return hourly_avg
-
-    def _calculate_daily_averages(self, df: pd.DataFrame) -> Dict:
-        """Calculate average metrics by day of week."""
-        df['day'] = df['timestamp'].dt.dayofweek
-        daily_avg = df.groupby('day').agg({
-            'utilization': 'mean',
-            'temperature': 'mean',
-            'memory_used': 'mean',
-            'power_draw': 'mean'
-        }).to_dict()
-        
-        return daily_avg
+    def _efficiency_from(self, parts: List[BucketPartials]) -> Dict:
+        """Efficiency metrics per GPU from bucket partials"""
+        combined = combine_partials(parts)
+        power = self._calculate_power_efficiency(combined)
+        memory = self._calculate_memory_efficiency(combined)
+        return {
+            gpu: {'power_efficiency': power[row], 'memory_efficiency': memory[row]}
+            for row, gpu in enumerate(combined['gpus'].tolist())
+        }
 
-    def _find_peak_usage_times(self, df: pd.DataFrame) -> List[Dict]:
-        """Find times of peak GPU usage."""
-        peaks = []
-        metrics = ['utilization', 'temperature', 'memory_used', 'power_draw']
-        
-        for metric in metrics:
-            if metric in df.columns:
-                peak_idx = df[metric].idxmax()
-                peaks.append({
+    def _calculate_period_averages(self, parts: List[BucketPartials], periods: List[int]) -> Dict:
+        """Average metrics per GPU by period: {gpu: {metric: {period: mean}}}"""
+        columns = [metric_column(metric) for metric in self._PATTERN_METRICS]
+        return {
+            gpu: {
+                metric: {period: float(values[column]) for period, values in sorted(means.items())}
+                for metric, column in zip(self._PATTERN_METRICS, columns)
+            }
+            for gpu, means in period_means(parts, periods).items()
+        }
+
+    def _calculate_hourly_averages(self, parts: List[BucketPartials]) -> Dict:
+        """Calculate average metrics by hour of day, per GPU."""
+        return self._calculate_period_averages(
+            parts, [datetime.fromtimestamp(part.start, timezone.utc).hour for part in parts])
+
+    def _calculate_daily_averages(self, parts: List[BucketPartials]) -> Dict:
+        """Calculate average metrics by day of week, per GPU."""
+        return self._calculate_period_averages(
+            parts, [datetime.fromtimestamp(part.start, timezone.utc).weekday() for part in parts])
+
+    def _find_peak_usage_times(self, combined: Dict[str, np.ndarray]) -> Dict[int, List[Dict]]:
+        """Find times of peak usage, per GPU."""
+        peaks = {}
+        for row, gpu in enumerate(combined['gpus'].tolist()):
+            peaks[gpu] = [
+                {
                     'metric': metric,
-                    'value': df.loc[peak_idx, metric],
-                    'timestamp': df.loc[peak_idx, 'timestamp']
-                })
-        
+                    'value': float(combined['maximum'][row, column]),
+                    'timestamp': datetime.fromtimestamp(combined['peak_time'][row, column],
+                                                        timezone.utc)
+                }
+                for metric, column in ((metric, metric_column(metric))
+                                       for metric in self._PATTERN_METRICS)
+                if combined['n'][row, column]
+            ]
         return peaks
 
-    def _calculate_utilization_distribution(self, df: pd.DataFrame) -> Dict:
-        """Calculate distribution of GPU utilization."""
-        if 'utilization' not in df.columns:
-            return {}
-
-        bins = [0, 20, 40, 60, 80, 100]
+    def _calculate_utilization_distribution(self,
+                                            combined: Dict[str, np.ndarray]) -> Dict[int, Dict]:
+        """Calculate distribution of GPU utilization, per GPU."""
         labels = ['0-20%', '21-40%', '41-60%', '61-80%', '81-100%']
-        df['util_bin'] = pd.cut(df['utilization'], bins=bins, labels=labels)
-        
-        distribution = df['util_bin'].value_counts().to_dict()
-        return {str(k): v for k, v in distribution.items()}
+        return {
+            gpu: dict(zip(labels, counts))
+            for gpu, counts in zip(combined['gpus'].tolist(), combined['histogram'].tolist())
+        }
 
     def _detect_metric_anomalies(self, df: pd.DataFrame, 
                                metric: str) -> List[Dict]:
-        """Detect anomalies in a specific metric."""
+        """Detect anomalies in a specific metric, against each GPU's own mean and spread."""
         if metric not in df.columns:
             return []
 
-        mean = df[metric].mean()
-        std = df[metric].std()
-        threshold = self.anomaly_threshold * std
+        if 'weight' in df.columns:
+            # Deadband storage: each row counts for the samples it stands for
+            weight = df['weight'].where(df[metric].notna(), 0)
+            by_gpu = df['gpu_index']
+            total = weight.groupby(by_gpu).transform('sum')
+            mean = (weight * df[metric]).groupby(by_gpu).transform('sum') / total
+            squares = (weight * (df[metric] - mean) ** 2).groupby(by_gpu).transform('sum')
+            variance = squares / (total - 1)
+            std = np.sqrt(variance)
+        else:
+            by_gpu = df.groupby('gpu_index')[metric]
+            mean = by_gpu.transform('mean')
+            std = by_gpu.transform('std')
+        deviation = (df[metric] - mean).abs() / std
+        outliers = deviation > self.anomaly_threshold
         
-        anomalies = []
-        anomaly_points = df[abs(df[metric] - mean) > threshold]
-        
-        for idx, row in anomaly_points.iterrows():
-            anomalies.append({
+        return [
+            {
                 'metric': metric,
-                'value': row[metric],
-                'timestamp': row['timestamp'],
-                'deviation': abs(row[metric] - mean) / std
-            })
-        
-        return anomalies
+                'gpu_index': gpu,
+                'value': value,
+                'timestamp': timestamp,
+                'deviation': score
+            }
+            for gpu, value, timestamp, score in zip(
+                df['gpu_index'][outliers].tolist(),
+                df[metric][outliers].tolist(),
+                df['timestamp'][outliers],
+                deviation[outliers].tolist()
+            )
+        ]
 
-    def _calculate_trend(self, df: pd.DataFrame, metric: str) -> Dict:
-        """Calculate trend for a specific metric."""
-        if metric not in df.columns:
+    @staticmethod
+    def _calculate_trend(combined: Dict[str, np.ndarray], row: int, metric: str) -> Dict:
+        """
+        Linear trend of a metric per sample of one GPU, from the merged
+        moments: the same slope, r and two-sided p-value as scipy's
+        linregress over the GPU's readings
+        """
+        column = metric_column(metric)
+        n = combined['n'][row, column]
+        if n < 2:
             return {}
+        x_m2 = combined['x_m2'][row, column]
+        y_m2 = combined['m2'][row, column]
+        c_xy = combined['c_xy'][row, column]
+        if x_m2 == 0 or y_m2 == 0:
+            r_value = np.nan if c_xy == 0 else 0.0
+        else:
+            r_value = min(max(c_xy / np.sqrt(x_m2 * y_m2), -1.0), 1.0)
+        slope = c_xy / x_m2
+        if n == 2:
+            p_value = 1.0 if y_m2 == 0 else 0.0
+        else:
+            tiny = 1.0e-20
+            t = r_value * np.sqrt((n - 2) / ((1.0 - r_value + tiny) * (1.0 + r_value + tiny)))
+            p_value = 2 * student_t_sf(abs(t), n - 2)
 
-        # Calculate linear regression
-        x = np.arange(len(df))
-        y = df[metric].values
-        slope, intercept, r_value, p_value, std_err = stats.linregress(x, y)
-        
         return {
             'slope': slope,
             'r_squared': r_value**2,
@@ -211,21 +424,38 @@ class AnalyticsService:
             'significance': p_value < 0.05
         }
 
-    def _calculate_power_efficiency(self, df: pd.DataFrame) -> Dict:
-        """Calculate power efficiency metrics."""
-        efficiency = (df['utilization'] / df['power_draw']).mean()
-        return {
-            'avg_efficiency': efficiency,
-            'peak_efficiency': (df['utilization'] / df['power_draw']).max()
-        }
+    def _calculate_power_efficiency(self, combined: Dict[str, np.ndarray]) -> List[Dict]:
+        """Calculate power efficiency (utilization per watt), per GPU."""
+        column = metric_column('power_efficiency')
+        peaks = np.where(combined['n'][:, column] > 0, combined['maximum'][:, column], np.nan)
+        return [
+            {'avg_efficiency': average, 'peak_efficiency': peak}
+            for average, peak in zip(combined['mean'][:, column].tolist(), peaks.tolist())
+        ]
 
-    def _calculate_memory_efficiency(self, df: pd.DataFrame) -> Dict:
-        """Calculate memory efficiency metrics."""
-        memory_util = (df['memory_used'] / df['memory_total']).mean() * 100
-        return {
-            'avg_memory_utilization': memory_util,
-            'peak_memory_utilization': (df['memory_used'] / df['memory_total']).max() * 100
-        }
+    def _calculate_memory_efficiency(self, combined: Dict[str, np.ndarray]) -> List[Dict]:
+        """Calculate memory utilization in percent, per GPU."""
+        column = metric_column('memory_utilization')
+        peaks = np.where(combined['n'][:, column] > 0, combined['maximum'][:, column], np.nan)
+        return [
+            {'avg_memory_utilization': average * 100, 'peak_memory_utilization': peak * 100}
+            for average, peak in zip(combined['mean'][:, column].tolist(), peaks.tolist())
+        ]
+
+    # Report section name -> computation on a history frame
+    _ANALYSES = {
+        'usage_patterns': _usage_patterns,
+        'anomalies': _anomalies,
+        'trends': _trends,
+        'efficiency': _efficiency
+    }
+    # Sections that can also be computed from cached bucket partials
+    _PARTIAL_ANALYSES = {
+        'usage_patterns': _usage_patterns_from,
+        'trends': _trends_from,
+        'efficiency': _efficiency_from
+    }
+    _PATTERN_METRICS = ('gpu_utilization', 'temperature', 'memory_used', 'power_draw')
 
 # Create singleton instance
-analytics_service = AnalyticsService()
+analytics_service = AnalyticsService(detector=anomaly_detector)
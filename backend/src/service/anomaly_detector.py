@@ -0,0 +1,253 @@
+import json
+import logging
+import math
+import os
+import threading
+from collections import deque
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from src.database.rollups import epoch_seconds
+from src.models.gpu_metrics import GpuMetricsRecord
+from src.service.settings import settings
+from src.service.smi_parser import MISSING
+from src.service.spool import BACKEND_DIR
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ANOMALY = {
+    'enabled': True,
+    'metrics': ['gpu_utilization', 'temperature', 'memory_used', 'power_draw'],
+    'half_life': 300.0,     # seconds for a sample's weight in the mean and variance to halve
+    'threshold': 4.0,       # |z-score| at which a reading is anomalous
+    'warmup': 30,           # samples per GPU before events are emitted
+    'reset_after': 3600.0,  # a gap this long starts the warmup again
+    'min_std': {            # floor of the standard deviation, so flat series do not alarm on noise
+        'gpu_utilization': 5.0,
+        'temperature': 1.0,
+        'memory_used': 256.0,
+        'power_draw': 10.0
+    },
+    'cooldown': 300.0,      # seconds between events for the same GPU and metric
+    'max_events': 1000,     # recent events kept in memory and in the state file
+    'state_file': 'data/anomaly_state.json',  # relative to the backend directory
+    'save_interval': 60.0
+}
+
+_STATE_VERSION = 1
+
+
+def _reading(gpu, metric: str) -> float:
+    value = getattr(gpu, metric, None)
+    return math.nan if value is None or value == MISSING else value
+
+
+class AnomalyDetector:
+    """
+    Online anomaly detection per GPU and metric, fed by the sampler. Each
+    series keeps an exponentially weighted mean and variance whose decay
+    follows the time between samples (half_life), so every sample costs
+    O(1) and no history is queried. A reading more than threshold standard
+    deviations from the mean so far is reported as an event. The state
+    (a few floats per series) and the recent events are saved to a file
+    and loaded again on start.
+    """
+
+    def __init__(self, options: Optional[Dict] = None):
+        self.options = dict(DEFAULT_ANOMALY)
+        self.options.update(options or settings.get('anomalies', default={}) or {})
+        self.enabled = bool(self.options['enabled'])
+        self.metrics = tuple(self.options['metrics'])
+        self.half_life = float(self.options['half_life'])
+        self.threshold = float(self.options['threshold'])
+        self.warmup = int(self.options['warmup'])
+        self.reset_after = float(self.options['reset_after'])
+        self.cooldown = float(self.options['cooldown'])
+        min_std = {**DEFAULT_ANOMALY['min_std'], **(self.options.get('min_std') or {})}
+        self.min_var = np.array([min_std.get(metric, 0.0) ** 2 for metric in self.metrics])
+        state_file = Path(self.options['state_file'])
+        self.state_file = state_file if state_file.is_absolute() else BACKEND_DIR / state_file
+
+        self._lock = threading.Lock()
+        # gpu index -> (mean, variance, samples, last event time) per metric,
+        # and time of last sample
+        self._series: Dict[int, Dict[str, Any]] = {}
+        self._events = deque(maxlen=int(self.options['max_events']))
+
+        self.samples = 0
+        self.events = 0
+        self.saves = 0
+        self.last_error: Optional[str] = None
+
+    def _new_series(self, values: np.ndarray, t: float) -> Dict[str, Any]:
+        return {
+            'mean': np.where(np.isnan(values), 0.0, values),
+            'var': np.zeros(len(self.metrics)),
+            'count': (~np.isnan(values)).astype(np.int64),
+            'last_event': np.full(len(self.metrics), -math.inf),
+            'time': t
+        }
+
+    def update(self, record: GpuMetricsRecord) -> List[Dict[str, Any]]:
+        """Score one sample against each GPU's state, then fold it in; returns new events"""
+        if not self.enabled:
+            return []
+        t = epoch_seconds(record.timestamp)
+        events = []
+        with self._lock:
+            self.samples += 1
+            for gpu in record.gpus:
+                values = np.array([_reading(gpu, metric) for metric in self.metrics],
+                                  dtype=np.float64)
+                series = self._series.get(gpu.index)
+                if series is None:
+                    self._series[gpu.index] = self._new_series(values, t)
+                    continue
+                dt = t - series['time']
+                if dt <= 0:
+                    continue
+                if dt > self.reset_after:
+                    self._series[gpu.index] = self._new_series(values, t)
+                    continue
+                series['time'] = t
+                valid = ~np.isnan(values)
+                # A metric's first reading starts its mean
+                series['mean'] = np.where(valid & (series['count'] == 0), values, series['mean'])
+                deviation = np.where(valid, values - series['mean'], 0.0)
+                std = np.sqrt(np.maximum(series['var'], self.min_var))
+                with np.errstate(divide='ignore', invalid='ignore'):
+                    z = np.where(std > 0, deviation / std, 0.0)
+                flagged = (valid & (series['count'] >= self.warmup) & (np.abs(z) >= self.threshold)
+                           & (t - series['last_event'] >= self.cooldown))
+                for column in np.flatnonzero(flagged).tolist():
+                    series['last_event'][column] = t
+                    events.append({
+                        'metric': self.metrics[column],
+                        'gpu_index': gpu.index,
+                        'value': float(values[column]),
+                        'expected': round(float(series['mean'][column]), 3),
+                        'std': round(float(std[column]), 3),
+                        'z_score': round(float(z[column]), 2),
+                        'deviation': round(float(abs(z[column])), 2),
+                        'timestamp': datetime.fromtimestamp(t, timezone.utc)
+                    })
+
+                # EWMA mean and variance with a weight for the time since the last sample
+                alpha = np.where(valid, -math.expm1(-dt * math.log(2) / self.half_life), 0.0)
+                series['mean'] += alpha * deviation
+                series['var'] = (1 - alpha) * (series['var'] + alpha * deviation * deviation)
+                series['count'] += valid
+            self._events.extend(events)
+            self.events += len(events)
+
+        for event in events:
+            logger.warning(
+                f"Anomaly on GPU {event['gpu_index']}: {event['metric']}={event['value']} "
+                f"(expected {event['expected']} ± {event['std']}, z={event['z_score']})"
+            )
+        return events
+
+    def recent_events(self, start_time: Optional[datetime] = None,
+                      end_time: Optional[datetime] = None,
+                      gpus: Optional[Sequence[int]] = None) -> List[Dict[str, Any]]:
+        """Kept events in [start_time, end_time], oldest first"""
+        with self._lock:
+            events = list(self._events)
+        return [
+            event for event in events
+            if (start_time is None or event['timestamp'] >= start_time)
+            and (end_time is None or event['timestamp'] <= end_time)
+            and (gpus is None or event['gpu_index'] in gpus)
+        ]
+
+    def start(self):
+        """Load the state saved by an earlier run, if it matches the configured metrics"""
+        if not self.enabled:
+            return
+        try:
+            state = json.loads(self.state_file.read_text())
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            logger.error(f"Failed to read anomaly detector state: {e}")
+            return
+        if (state.get('version') != _STATE_VERSION
+                or tuple(state.get('metrics', ())) != self.metrics):
+            logger.info("Anomaly detector state is for other metrics; starting fresh")
+            return
+        with self._lock:
+            for index, series in state['gpus'].items():
+                self._series[int(index)] = {
+                    'mean': np.array(series['mean'], dtype=np.float64),
+                    'var': np.array(series['var'], dtype=np.float64),
+                    'count': np.array(series['count'], dtype=np.int64),
+                    'last_event': np.array([-math.inf if value is None else value
+                                            for value in series['last_event']]),
+                    'time': series['time']
+                }
+            for event in state.get('events', []):
+                self._events.append({**event,
+                                     'timestamp': datetime.fromisoformat(event['timestamp'])})
+        logger.info(f"Loaded anomaly detector state for {len(self._series)} GPUs")
+
+    def save(self) -> int:
+        """Write the state and recent events to the state file; returns the number of GPUs saved"""
+        if not self.enabled:
+            return 0
+        with self._lock:
+            state = {
+                'version': _STATE_VERSION,
+                'metrics': list(self.metrics),
+                'gpus': {
+                    str(index): {
+                        'mean': series['mean'].tolist(),
+                        'var': series['var'].tolist(),
+                        'count': series['count'].tolist(),
+                        'last_event': [None if math.isinf(value) else value
+                                       for value in series['last_event'].tolist()],
+                        'time': series['time']
+                    }
+                    for index, series in self._series.items()
+                },
+                'events': [
+                    {**event, 'timestamp': event['timestamp'].isoformat()}
+                    for event in self._events
+                ]
+            }
+        try:
+            self.state_file.parent.mkdir(parents=True, exist_ok=True)
+            temporary = self.state_file.with_suffix('.tmp')
+            temporary.write_text(json.dumps(state))
+            os.replace(temporary, self.state_file)
+        except OSError as e:
+            self.last_error = str(e)
+            raise
+        self.saves += 1
+        return len(state['gpus'])
+
+    def get_stats(self) -> Dict:
+        """Tracked series, samples scored and events emitted for diagnostics"""
+        with self._lock:
+            gpus = len(self._series)
+            warming_up = sum(
+                1 for series in self._series.values() if series['count'].min() < self.warmup
+            )
+            kept = len(self._events)
+        return {
+            'enabled': self.enabled,
+            'metrics': list(self.metrics),
+            'gpus': gpus,
+            'warming_up': warming_up,
+            'samples': self.samples,
+            'events': self.events,
+            'kept_events': kept,
+            'saves': self.saves,
+            'last_error': self.last_error
+        }
+
+
+# Create singleton instance
+anomaly_detector = AnomalyDetector()
@@ -7,22 +7,40 @@ if backend_dir not in sys.path:
 from fastapi import FastAPI, HTTPException, Query
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.openapi.docs import get_swagger_ui_html, get_redoc_html
-from fastapi.responses import JSONResponse
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from contextlib import asynccontextmanager
 import subprocess
+import itertools
 import json
 import re
-from collections import deque
-from datetime import datetime, timedelta
-from typing import Optional, List, Dict
+from datetime import datetime, timedelta, timezone
+from typing import Optional, List, Dict, Union
 import logging
 import os
 import shutil
+import time
 
 # Import our components
 from src.database.client import db
-from src.models.gpu_metrics import GpuMetricsRecord, GpuBurnMetrics, NvidiaInfo, GpuMetrics
+from src.database.history import format_after, parse_after, parse_fields, parse_gpus
+from src.database.rollups import RESOLUTION_SECONDS, choose_resolution, epoch_seconds
+from src.models.gpu_metrics import GpuMetricsRecord, GpuMetrics, GpuInventory
 from src.service.alerts import alert_system
+from src.service.anomaly_detector import anomaly_detector
+from src.service.analytics_service import REPORT_WINDOWS, analytics_service, parse_analyses
 from src.service.system_health import SystemHealthCheck
+from src.service.metrics_source import create_metrics_source
+from src.service.hot_tier import HotTier
+from src.service.inventory import InventoryCache
+from src.service.maintenance import PeriodicTask
+from src.service.pipeline import CollectionPipeline
+from src.service.sampler import MetricsSampler
+from src.service.scheduler import AdaptiveScheduler
+from src.service.settings import settings
+from src.service.singleflight import SingleFlight, make_key
+from src.service.spool import MetricsSpool
+from src.service.write_behind import WriteBehindBuffer
 
 logging.basicConfig(
     level=logging.INFO,
@@ -33,6 +51,47 @@ logger = logging.getLogger(__name__)
 # Initialize system health checker for nvidia-smi operations
 system_health = SystemHealthCheck()
 
+# Backend that reads GPU counters, selected by collection.source
+metrics_source = create_metrics_source(health_check=system_health)
+
+# Driver/CUDA versions and GPU hardware details, read once and cached
+inventory = InventoryCache(metrics_source.read_inventory)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    try:
+        metrics_source.start()
+    except Exception as e:
+        logger.error(f"Failed to start {metrics_source.name} metrics source: {e}")
+    # Warm the shared connection pool; failures are logged and retried on demand
+    await run_in_threadpool(db.pool.open)
+    # Today's partitions must exist before the spool replays or the sampler
+    # writes, or rows land in the default partitions
+    if settings.get('retention', 'cleanup_on_startup', default=True):
+        await partition_maintenance.run_once()
+    else:
+        try:
+            await run_in_threadpool(db.partitions.create_partitions)
+        except Exception as e:
+            logger.error(f"Failed to create partitions: {e}")
+    if metrics_writer:
+        metrics_writer.start()
+    await run_in_threadpool(anomaly_detector.start)
+    sampler.start()
+    partition_maintenance.start()
+    anomaly_state.start()
+    yield
+    await sampler.stop()
+    await anomaly_state.stop()
+    await anomaly_state.run_once()
+    metrics_source.stop()
+    if metrics_writer:
+        await run_in_threadpool(metrics_writer.stop)
+    await partition_maintenance.stop()
+    if settings.get('retention', 'cleanup_on_shutdown', default=False):
+        await partition_maintenance.run_once()
+    await run_in_threadpool(db.pool.close)
+
 app = FastAPI(
     title="GPU Sentinel Pro API",
     description="""
@@ -53,7 +112,8 @@ app = FastAPI(
     """,
     version="1.0.0",
     docs_url=None,  # Disable default docs to use custom endpoint
-    redoc_url=None  # Disable default redoc to use custom endpoint
+    redoc_url=None,  # Disable default redoc to use custom endpoint
+    lifespan=lifespan
 )
 
 app.add_middleware(
@@ -64,9 +124,10 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Shares one in-flight query among concurrent identical requests
+coalescer = SingleFlight()
+
 # In-memory state
-temperature_history = {}
-peak_temperatures = {}
 logging_enabled = True
 
 # Custom documentation endpoints
@@ -87,105 +148,60 @@ async def redoc_html():
         redoc_js_url="https://cdn.jsdelivr.net/npm/redoc@next/bundles/redoc.standalone.js",
     )
 
-def get_nvidia_info() -> NvidiaInfo:
-    try:
-        result = system_health._run_nvidia_command([system_health.nvidia_smi_path])
-        cuda_version = "Unknown"
-        driver_version = "Unknown"
-        
-        if result.stdout:
-            cuda_match = re.search(r'CUDA Version: ([\d\.]+)', result.stdout)
-            if cuda_match:
-                cuda_version = cuda_match.group(1)
-            
-            driver_match = re.search(r'Driver Version: ([\d\.]+)', result.stdout)
-            if driver_match:
-                driver_version = driver_match.group(1)
-
-        return NvidiaInfo(
-            driver_version=driver_version,
-            cuda_version=cuda_version
-        )
-    except Exception as e:
-        logger.error(f"Error getting NVIDIA info: {str(e)}")
-        return NvidiaInfo(
-            driver_version="Unknown",
-            cuda_version="Unknown"
-        )
+def store_metrics_batch(records: List[GpuMetricsRecord], replay=None) -> int:
+    """
+    Bulk insert for the metrics writers. Replayed and retried batches can
+    land in buckets the analytics cache already holds, so those are dropped.
+    """
+    written = db.insert_gpu_metrics_batch(records, replay)
+    times = [epoch_seconds(record.timestamp) for record in records if record.timestamp]
+    if times:
+        analytics_service.cache.invalidate(min(times), max(times))
+    return written
 
-def get_gpu_metrics() -> GpuMetricsRecord:
-    try:
-        nvidia_info = get_nvidia_info()
-        
-        gpu_info = system_health._run_nvidia_command([
-            system_health.nvidia_smi_path,
-            "--query-gpu=index,name,fan.speed,power.draw,memory.total,memory.used,utilization.gpu,temperature.gpu,compute_mode,power.limit",
-            "--format=csv,noheader,nounits"
-        ])
-
-        gpus = []
-        current_time = datetime.now().timestamp()
-        
-        if gpu_info.stdout.strip():
-            for line in gpu_info.stdout.strip().split('\n'):
-                values = [v.strip() for v in line.split(',')]
-                if len(values) >= 10:
-                    gpu_index = int(values[0])
-                    temperature = float(values[7])
-                    
-                    if gpu_index not in temperature_history:
-                        temperature_history[gpu_index] = deque(maxlen=40)
-                    temperature_history[gpu_index].append((current_time, temperature))
-                    
-                    if gpu_index not in peak_temperatures or temperature > peak_temperatures[gpu_index]:
-                        peak_temperatures[gpu_index] = temperature
-
-                    gpu = GpuMetrics(
-                        index=gpu_index,
-                        name=values[1],
-                        fan_speed=int(float(values[2])),
-                        power_draw=float(values[3]),
-                        power_limit=int(float(values[9])),
-                        memory_total=int(float(values[4])),
-                        memory_used=int(float(values[5])),
-                        gpu_utilization=int(float(values[6])),
-                        temperature=int(temperature),
-                        peak_temperature=int(peak_temperatures[gpu_index]),
-                        temp_change_rate=0,
-                        compute_mode=values[8]
-                    )
-                    gpus.append(gpu)
-
-        metrics = GpuMetricsRecord(
-            nvidia_info=nvidia_info,
-            gpus=gpus,
-            processes=[],
-            gpu_burn_metrics=GpuBurnMetrics(
-                running=False,
-                duration=0,
-                errors=0
-            ),
-            success=True,
-            timestamp=datetime.utcnow().isoformat()
-        )
+# Batches sample inserts off the collection path; the spool also keeps
+# samples on local disk while the database is slow or down
+metrics_writer = None
+if settings.get('persistence', 'spool', 'enabled', default=False):
+    metrics_writer = MetricsSpool(store_metrics_batch)
+elif settings.get('persistence', 'write_behind', 'enabled', default=False):
+    metrics_writer = WriteBehindBuffer(store_metrics_batch)
 
-        # Check for alerts
-        alert_system.check_metrics(metrics)
+# Collection stages for each sample, driven by the background sampler
+pipeline = CollectionPipeline(
+    metrics_source, inventory, alert_system, db,
+    should_store=lambda: logging_enabled,
+    writer=metrics_writer
+)
+# With an adaptive interval a streaming source is re-paced to match, so
+# nvidia-smi itself polls less often while the GPUs are idle
+sampler = MetricsSampler(
+    pipeline.collect,
+    scheduler=AdaptiveScheduler() if settings.get('polling', 'adaptive', default=False) else None,
+    on_interval_change=metrics_source.set_interval
+)
 
-        # Store in database only if logging is enabled
-        if logging_enabled:
-            try:
-                db.insert_gpu_metrics(metrics)
-                logger.info("Metrics stored in database")
-            except Exception as e:
-                logger.error(f"Failed to store metrics: {e}")
-        else:
-            logger.debug("Metrics logging is disabled, skipping database insert")
+# Recent per-GPU history in memory, served by /api/gpu-stats/history
+hot_tier = HotTier()
+sampler.add_listener(lambda snapshot: hot_tier.add(snapshot.record))
 
-        return metrics
-    except Exception as e:
-        logger.error(f"Error getting GPU metrics: {str(e)}")
-        raise HTTPException(status_code=500, detail=str(e))
+# Per-GPU streaming anomaly detection on every sample; its state is saved
+# periodically and on shutdown so it survives restarts
+sampler.add_listener(lambda snapshot: anomaly_detector.update(snapshot.record))
+anomaly_state = PeriodicTask(
+    "anomaly state",
+    anomaly_detector.save,
+    interval=anomaly_detector.options['save_interval'],
+    run_at_start=False
+)
+
+# Daily partitions ahead of time and partition-drop retention
+partition_maintenance = PeriodicTask(
+    "partitions",
+    db.partitions.maintain,
+    interval=settings.get('retention', 'maintenance_interval', default=3600),
+    run_at_start=False  # the first run happens in lifespan, before any writes
+)
 
 @app.get("/api/gpu-stats", 
     response_model=List[GpuMetrics],
@@ -194,16 +210,108 @@ def get_gpu_metrics() -> GpuMetricsRecord:
     description="Returns real-time metrics for all available NVIDIA GPUs including temperature, utilization, memory usage, and power consumption."
 )
 async def get_gpu_stats():
-    """Service information and status"""
+    """Serve the latest snapshot published by the background sampler"""
+    snapshot = sampler.snapshot
+    if snapshot is None:
+        raise HTTPException(
+            status_code=503,
+            detail=sampler.last_error or "No GPU sample available yet"
+        )
+    age = time.time() - snapshot.collected_at
+    if sampler.is_stale():
+        # Collection keeps failing; do not pass the last sample off as live
+        raise HTTPException(
+            status_code=503,
+            detail=f"{sampler.last_error} (last sample {age:.1f}s old)",
+            headers={"X-Sample-Age": f"{age:.3f}"}
+        )
+    return Response(content=snapshot.gpus_json, media_type="application/json",
+                    headers={"X-Sample-Age": f"{age:.3f}"})
+
+HISTORY_MAX_PAGE_SIZE = settings.get('history', 'max_page_size', default=10000)
+HISTORY_STREAM_BATCH = settings.get('history', 'stream_batch_size', default=1000)
+# Bytes of encoded rows gathered before each write to the client
+HISTORY_STREAM_CHUNK = 64 * 1024
+
+def encode_history_stream(first, rows, fmt: str):
+    """Encode (row JSON, cursor) pairs as NDJSON lines or a JSON array in ~64KB chunks"""
     try:
-        metrics = get_gpu_metrics()
-        return metrics.gpus
-    except Exception as e:
-        logger.error(f"Error getting GPU stats: {str(e)}")
-        raise HTTPException(status_code=500, detail=str(e))
+        separator = '\n' if fmt == 'ndjson' else ','
+        buffer = [] if fmt == 'ndjson' else ['[']
+        size = 0
+        pending = itertools.chain([first] if first else [], rows)
+        for index, (row, _) in enumerate(pending):
+            if fmt == 'ndjson':
+                buffer.append(row + separator)
+            else:
+                buffer.append(row if index == 0 else separator + row)
+            size += len(row)
+            if size >= HISTORY_STREAM_CHUNK:
+                yield ''.join(buffer)
+                buffer, size = [], 0
+        if fmt != 'ndjson':
+            buffer.append(']')
+        if buffer:
+            yield ''.join(buffer)
+    finally:
+        rows.close()
+
+def history_points(resolution: str, bucket_seconds: Optional[int], range_start, range_end,
+                   gpus, fields):
+    """
+    Per-GPU points from the hot tier for the span it covers and from the
+    database before that; returns the source (memory, merged or database)
+    with the points
+    """
+    def from_database(end):
+        if resolution == 'raw':
+            return db.get_gpu_samples(range_start, end, gpus, fields)
+        return db.get_rollups(resolution, range_start, end, gpus, fields)
+
+    def from_memory(start):
+        if resolution == 'raw':
+            return hot_tier.samples_between(start, range_end, gpus, fields)
+        return hot_tier.rollups_between(bucket_seconds, start, range_end, gpus, fields)
+
+    covered_from = hot_tier.covered_from(bucket_seconds)
+    if covered_from is None or covered_from > range_end:
+        source, points = "database", from_database(range_end)
+    elif covered_from <= range_start:
+        source, points = "memory", from_memory(range_start)
+    else:
+        # Older part from the database, up to where the hot tier starts
+        older = from_database(covered_from - timedelta(microseconds=1))
+        source, points = "merged", older + from_memory(covered_from)
+    hot_tier.record_lookup(source)
+    return source, points
+
+async def stream_history(fmt: str, range_start, range_end, after_key, limit, fields, gpus):
+    """Stream history rows straight from a server-side cursor"""
+    rows = db.iter_metrics_in_timerange(
+        range_start, range_end, after_key, limit, batch_size=HISTORY_STREAM_BATCH,
+        fields=fields, gpus=gpus)
+    # Open the cursor before responding so database errors still become a 500
+    first = await run_in_threadpool(next, rows, None)
+    media_type = "application/x-ndjson" if fmt == 'ndjson' else "application/json"
+    return StreamingResponse(encode_history_stream(first, rows, fmt), media_type=media_type)
+
+async def history_page(key, range_start, range_end, after_key, limit: Optional[int],
+                       fields, gpus, descending: bool = False):
+    """One page of history rows as pre-encoded JSON, oldest first unless descending"""
+    def query():
+        return list(db.iter_metrics_in_timerange(
+            range_start, range_end, after_key, limit,
+            fields=fields, gpus=gpus, descending=descending))
+
+    page = await coalescer.do(key, lambda: run_in_threadpool(query))
+    headers = {}
+    if limit and len(page) == limit:
+        headers["X-Next-After"] = page[-1][1]
+    body = "[" + ",".join(row for row, _ in page) + "]"
+    return Response(content=body, media_type="application/json", headers=headers)
 
 @app.get("/api/gpu-stats/history",
-    response_model=List[GpuMetricsRecord],
+    response_model=Union[List[Dict], Dict],
     tags=["Metrics"],
     summary="Get historical GPU metrics",
     description="""
@@ -212,6 +320,14 @@ async def get_gpu_stats():
     - Use ISO format for dates (e.g., 2025-02-08T20:00:00Z)
     - Default lookback period is 24 hours
     - Maximum lookback period is 168 hours (1 week)
+    - With max_points, per-GPU points come from the finest of raw samples
+      and the 10s, 1m and 1h rollups that fits max_points per GPU
+    - stream=ndjson or stream=json sends rows as they are read from a
+      server-side cursor, oldest first, in constant memory
+    - after and limit page through rows oldest first; X-Next-After holds
+      the cursor for the next page
+    - fields and gpu limit rows to the given per-GPU fields and GPUs; only
+      those columns are read from the database
     """
 )
 async def get_gpu_history(
@@ -228,33 +344,157 @@ async def get_gpu_history(
         description="Number of hours to look back (used if start_time not provided)",
         ge=1,
         le=168  # 1 week max
+    ),
+    max_points: Optional[int] = Query(
+        None,
+        description="Maximum points per GPU; selects a rollup resolution that fits",
+        ge=1
+    ),
+    stream: Optional[str] = Query(
+        None,
+        description="Stream rows as ndjson (one object per line) or json (chunked array)",
+        pattern="^(ndjson|json)$"
+    ),
+    after: Optional[str] = Query(
+        None,
+        description="Keyset cursor '<timestamp>,<id>' from X-Next-After; returns rows after it"
+    ),
+    limit: Optional[int] = Query(
+        None,
+        description="Maximum rows per page",
+        ge=1,
+        le=HISTORY_MAX_PAGE_SIZE
+    ),
+    fields: Optional[str] = Query(
+        None,
+        description="Comma-separated per-GPU fields to return, e.g. temperature,power_draw"
+    ),
+    gpu: Optional[str] = Query(
+        None,
+        description="Comma-separated GPU indices to return, e.g. 0,3"
     )
 ):
     """Get historical GPU metrics"""
     try:
-        # If no start_time provided, use hours parameter
-        if not start_time:
-            start_time = (datetime.utcnow() - timedelta(hours=hours)).isoformat()
-        
-        # If no end_time provided, use current time
-        if not end_time:
-            end_time = datetime.utcnow().isoformat()
-
         # Validate and parse timestamps
         try:
-            datetime.fromisoformat(start_time.replace('Z', '+00:00'))
-            datetime.fromisoformat(end_time.replace('Z', '+00:00'))
+            start = (datetime.fromisoformat(start_time.replace('Z', '+00:00'))
+                     if start_time else None)
+            end = datetime.fromisoformat(end_time.replace('Z', '+00:00')) if end_time else None
+            after_key = parse_after(after) if after else None
         except ValueError:
             raise HTTPException(
                 status_code=400,
                 detail="Invalid timestamp format. Use ISO format (e.g., 2024-01-01T00:00:00Z)"
             )
+        try:
+            field_list = parse_fields(fields) if fields else None
+            gpu_list = parse_gpus(gpu) if gpu else None
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        projected = field_list is not None or gpu_list is not None
+
+        # Timestamps without an offset are UTC, like the stored samples
+        range_end = (end.replace(tzinfo=end.tzinfo or timezone.utc) if end
+                     else datetime.now(timezone.utc))
+        range_start = (start.replace(tzinfo=start.tzinfo or timezone.utc) if start
+                       else range_end - timedelta(hours=hours))
+
+        if stream or after or limit:
+            if stream:
+                return await stream_history(
+                    stream, range_start, range_end, after_key, limit, field_list, gpu_list)
+            limit = limit or HISTORY_MAX_PAGE_SIZE
+            key = make_key(
+                "gpu-stats/history/page",
+                start=range_start.isoformat(),
+                end=range_end.isoformat(),
+                after=format_after(*after_key) if after_key else None,
+                limit=limit,
+                fields=field_list,
+                gpu=gpu_list
+            )
+            return await history_page(key, range_start, range_end, after_key, limit,
+                                      field_list, gpu_list)
+
+        # Requests relying on the defaults share a key regardless of when they arrive
+        key = make_key(
+            "gpu-stats/history",
+            start=start.isoformat() if start else f"-{hours}h",
+            end=end.isoformat() if end else "now",
+            max_points=max_points,
+            fields=field_list,
+            gpu=gpu_list
+        )
+
+        if projected and not max_points:
+            # Same order as the full rows, newest first
+            return await history_page(
+                key, range_start, range_end, None, None, field_list, gpu_list, descending=True)
+
+        def query():
+            if max_points:
+                return query_resolution()
+            # If no start_time provided, use hours parameter
+            range_start = start_time or (datetime.utcnow() - timedelta(hours=hours)).isoformat()
+            # If no end_time provided, use current time
+            range_end = end_time or datetime.utcnow().isoformat()
+            return db.get_metrics_in_timerange(range_start, range_end)
+
+        def query_resolution():
+            resolution = choose_resolution(
+                (range_end - range_start).total_seconds(),
+                max_points,
+                settings.get('polling', 'base_interval', default=0.25)
+            )
+            bucket_seconds = RESOLUTION_SECONDS.get(resolution)
+            source, points = history_points(
+                resolution, bucket_seconds, range_start, range_end, gpu_list, field_list)
+            return {
+                "resolution": resolution,
+                "bucket_seconds": bucket_seconds,
+                "start_time": range_start,
+                "end_time": range_end,
+                "source": source,
+                "points": points
+            }
 
-        return db.get_metrics_in_timerange(start_time, end_time)
+        return await coalescer.do(key, lambda: run_in_threadpool(query))
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error getting historical data: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/api/inventory",
+    response_model=GpuInventory,
+    tags=["System"],
+    summary="Get GPU inventory",
+    description=("Driver and CUDA versions plus name, bus ID and total memory of each GPU. "
+                 "Served from a cache that is loaded once.")
+)
+async def get_inventory():
+    """Get cached GPU inventory"""
+    try:
+        return await run_in_threadpool(inventory.get)
+    except Exception as e:
+        logger.error(f"Error getting GPU inventory: {e}")
+        raise HTTPException(status_code=503, detail=str(e))
+
+@app.post("/api/inventory/refresh",
+    response_model=GpuInventory,
+    tags=["System"],
+    summary="Refresh GPU inventory",
+    description="Reload the cached GPU inventory, e.g. after a driver upgrade or GPU hot-plug."
+)
+async def refresh_inventory():
+    """Reload GPU inventory"""
+    try:
+        return await run_in_threadpool(inventory.refresh)
+    except Exception as e:
+        logger.error(f"Error refreshing GPU inventory: {e}")
+        raise HTTPException(status_code=503, detail=str(e))
+
 @app.get("/api/alerts",
     response_model=List[Dict],
     tags=["Alerts"],
@@ -270,7 +510,81 @@ async def get_alerts(
     )
 ):
     """Get recent alerts"""
-    return alert_system.get_recent_alerts(hours)
+    return await coalescer.do(
+        make_key("alerts", hours=hours),
+        lambda: run_in_threadpool(alert_system.get_recent_alerts, hours)
+    )
+
+@app.get("/api/analytics/report",
+    response_model=Dict,
+    tags=["Analytics"],
+    summary="Get analytics report",
+    description=("Usage patterns, anomalies, performance trends and efficiency computed "
+                 "together from a single history load, with per-stage timings in milliseconds. "
+                 "Answers 503 when history cannot be loaded.")
+)
+async def get_analytics_report(
+    analyses: Optional[str] = Query(
+        None,
+        description=(f"Comma-separated sections to compute ({', '.join(REPORT_WINDOWS)}); "
+                     f"all by default")
+    ),
+    usage_days: int = Query(7, description="Days covered by usage_patterns", ge=1, le=90),
+    anomaly_hours: int = Query(24, description="Hours covered by anomalies", ge=1, le=720),
+    trend_days: int = Query(30, description="Days covered by trends", ge=1, le=90),
+    efficiency_days: int = Query(7, description="Days covered by efficiency", ge=1, le=90)
+):
+    """Get analytics report"""
+    try:
+        sections = parse_analyses(analyses) if analyses is not None else tuple(REPORT_WINDOWS)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    requested = {
+        'usage_patterns': timedelta(days=usage_days),
+        'anomalies': timedelta(hours=anomaly_hours),
+        'trends': timedelta(days=trend_days),
+        'efficiency': timedelta(days=efficiency_days)
+    }
+    windows = {name: requested[name] for name in sections}
+    report = await coalescer.do(
+        make_key("analytics/report",
+                 **{name: window.total_seconds() for name, window in windows.items()}),
+        lambda: run_in_threadpool(analytics_service.generate_report, windows)
+    )
+    if report['errors']:
+        # History could not be loaded; empty sections would read as idle GPUs
+        raise HTTPException(
+            status_code=503,
+            detail="; ".join(f"{name}: {error}" for name, error in report['errors'].items())
+        )
+    return report
+
+@app.get("/api/anomalies",
+    response_model=List[Dict],
+    tags=["Analytics"],
+    summary="Get recent anomalies",
+    description=("Anomalies found by the streaming per-GPU detector as samples arrive, "
+                 "oldest first. Served from memory without a history query.")
+)
+async def get_anomalies(
+    minutes: int = Query(
+        60,
+        description="Number of minutes to look back",
+        ge=1,
+        le=10080
+    ),
+    gpu: Optional[str] = Query(
+        None,
+        description="Comma-separated GPU indices to include, e.g. 0,3; all GPUs by default"
+    )
+):
+    """Get recent anomalies"""
+    try:
+        gpu_list = parse_gpus(gpu) if gpu is not None else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    start = datetime.now(timezone.utc) - timedelta(minutes=minutes)
+    return anomaly_detector.recent_events(start, gpus=gpu_list)
 
 @app.post("/api/logging/toggle",
     response_model=Dict[str, bool],
@@ -295,6 +609,41 @@ async def get_logging_status():
     """Get logging status"""
     return {"logging_enabled": logging_enabled}
 
+@app.get("/api/diagnostics",
+    response_model=Dict,
+    tags=["System"],
+    summary="Get service diagnostics",
+    description=("Internal state of the sampler, collection pipeline, metrics source, "
+                 "inventory cache, request coalescing, write-behind buffer or spool, database "
+                 "connection pool, bulk ingest, change detection, hot tier, analytics cache, "
+                 "streaming anomaly detection and partition maintenance.")
+)
+async def get_diagnostics():
+    """Get service diagnostics"""
+    return {
+        "sampler": sampler.get_stats(),
+        "pipeline": pipeline.get_stats(),
+        "source": metrics_source.get_stats(),
+        "inventory": inventory.get_stats(),
+        "coalescing": coalescer.get_stats(),
+        "write_behind": (metrics_writer.get_stats()
+                         if isinstance(metrics_writer, WriteBehindBuffer) else None),
+        "spool": metrics_writer.get_stats() if isinstance(metrics_writer, MetricsSpool) else None,
+        "database_pool": db.pool.get_stats(),
+        "bulk_ingest": db.bulk.get_stats(),
+        "deadband": db.deadband.get_stats(),
+        "hot_tier": hot_tier.get_stats(),
+        "analytics_cache": analytics_service.cache.get_stats(),
+        "anomalies": {
+            **anomaly_detector.get_stats(),
+            "persistence": anomaly_state.get_stats()
+        },
+        "partitions": {
+            **db.partitions.get_stats(),
+            "maintenance": partition_maintenance.get_stats()
+        }
+    }
+
 @app.get("/")
 async def root():
     """Service information and status"""
@@ -306,6 +655,12 @@ async def root():
             "GET /api/gpu-stats": "Current GPU metrics",
             "GET /api/gpu-stats/history": "Historical GPU metrics (optional: start_time, end_time, hours=24)",
             "GET /api/alerts": "Recent alerts",
+            "GET /api/anomalies": "Anomalies from the streaming detector",
+            "GET /api/analytics/report":
+                "Usage patterns, anomalies, trends and efficiency from one history load",
+            "GET /api/inventory": "Cached GPU inventory",
+            "POST /api/inventory/refresh": "Reload GPU inventory",
+            "GET /api/diagnostics": "Service diagnostics",
             "GET /api/logging/status": "Get current logging status",
             "POST /api/logging/toggle": "Toggle metrics logging"
         }
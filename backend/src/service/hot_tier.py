@@ -0,0 +1,255 @@
+import logging
+import math
+import threading
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from src.database.bulk import GPU_SAMPLES_COLUMNS
+from src.database.rollups import ROLLUP_METRICS, epoch_seconds
+from src.models.gpu_metrics import GpuMetrics, GpuMetricsRecord
+from src.service.settings import settings
+from src.service.smi_parser import MISSING
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HOT_TIER = {
+    'enabled': True,
+    'horizon': 7200.0,  # seconds of samples kept per GPU
+    'max_gpus': 64      # GPUs beyond this are not kept
+}
+
+# Numeric per-GPU fields kept as columns; name and compute_mode keep their latest value
+HOT_METRICS = tuple(column for column in GPU_SAMPLES_COLUMNS[2:]
+                    if column not in ('name', 'compute_mode'))
+_LABELS = ('name', 'compute_mode')
+_METRIC_ROW = {metric: row for row, metric in enumerate(HOT_METRICS)}
+_INTEGER_METRICS = frozenset(
+    name for name, field in GpuMetrics.model_fields.items() if field.annotation is int
+)
+
+
+def _plain(metric: str, column: np.ndarray) -> np.ndarray:
+    # float32 columns back to the values the collector reported
+    if metric in _INTEGER_METRICS:
+        return np.rint(column).astype(np.int64)
+    return np.round(column.astype(np.float64), 3)
+
+
+class _GpuRing:
+    """Fixed-size columnar ring of one GPU's samples"""
+
+    def __init__(self, capacity: int):
+        self.times = np.zeros(capacity, dtype=np.float64)
+        self.values = np.full((len(HOT_METRICS), capacity), np.nan, dtype=np.float32)
+        self.labels = {label: None for label in _LABELS}
+        self.head = 0   # next slot to write
+        self.size = 0
+
+    @property
+    def nbytes(self) -> int:
+        return self.times.nbytes + self.values.nbytes
+
+    def append(self, t: float, gpu: Dict[str, Any]):
+        capacity = len(self.times)
+        self.times[self.head] = t
+        for row, metric in enumerate(HOT_METRICS):
+            value = gpu.get(metric)
+            self.values[row, self.head] = np.nan if value is None or value == MISSING else value
+        for label in _LABELS:
+            self.labels[label] = gpu.get(label)
+        self.head = (self.head + 1) % capacity
+        self.size = min(self.size + 1, capacity)
+
+    def oldest(self) -> Optional[float]:
+        if not self.size:
+            return None
+        return float(self.times[(self.head - self.size) % len(self.times)])
+
+    def window(self, start: float, end: float, rows: Sequence[int]):
+        """Copies of times and the given metric rows with start <= time <= end, oldest first"""
+        capacity = len(self.times)
+        first = (self.head - self.size) % capacity
+        order = np.arange(first, first + self.size) % capacity
+        times = self.times[order]
+        lo, hi = np.searchsorted(times, start, 'left'), np.searchsorted(times, end, 'right')
+        return times[lo:hi], self.values[np.ix_(list(rows), order[lo:hi])]
+
+
+class HotTier:
+    """
+    Recent history in memory: per GPU, a ring of NumPy columns (one per
+    metric) holding horizon seconds of samples at the base polling
+    interval, filled by the sampler. Requests for windows the rings fully
+    cover are answered without the database; memory is fixed at start-up
+    by horizon, the polling interval and max_gpus.
+    """
+
+    def __init__(self, options: Optional[Dict] = None, interval: Optional[float] = None):
+        self.options = dict(DEFAULT_HOT_TIER)
+        self.options.update(options or settings.get('hot_tier', default={}) or {})
+        self.enabled = bool(self.options['enabled'])
+        self.horizon = float(self.options['horizon'])
+        self.max_gpus = int(self.options['max_gpus'])
+        interval = interval or settings.get('polling', 'base_interval', default=0.25)
+        self.capacity = max(1, math.ceil(self.horizon / interval))
+
+        self._lock = threading.Lock()
+        self._rings: Dict[int, _GpuRing] = {}
+        self._latest: Optional[float] = None
+
+        self.samples = 0
+        self.out_of_order = 0
+        self.hits = 0
+        self.partial_hits = 0
+        self.misses = 0
+
+    def add(self, record: GpuMetricsRecord):
+        """Append one sample; samples older than the newest one kept are ignored"""
+        if not self.enabled:
+            return
+        t = epoch_seconds(record.timestamp)
+        with self._lock:
+            if self._latest is not None and t <= self._latest:
+                self.out_of_order += 1
+                return
+            self._latest = t
+            for gpu in record.gpus:
+                ring = self._rings.get(gpu.index)
+                if ring is None:
+                    if len(self._rings) >= self.max_gpus:
+                        continue
+                    ring = self._rings[gpu.index] = _GpuRing(self.capacity)
+                ring.append(t, gpu.model_dump())
+            self.samples += 1
+
+    def covered_from(self, bucket_seconds: Optional[int] = None) -> Optional[datetime]:
+        """
+        Start of the span held for every GPU (aligned up to bucket_seconds),
+        or None when nothing is held
+        """
+        with self._lock:
+            oldest = [ring.oldest() for ring in self._rings.values()]
+            if not oldest or None in oldest:
+                return None
+            start = max(max(oldest), self._latest - self.horizon)
+        if bucket_seconds:
+            start = math.ceil(start / bucket_seconds) * bucket_seconds
+        return datetime.fromtimestamp(start, timezone.utc)
+
+    def record_lookup(self, source: str):
+        """Count how a history request was served: memory, merged or database"""
+        if source == 'memory':
+            self.hits += 1
+        elif source == 'merged':
+            self.partial_hits += 1
+        else:
+            self.misses += 1
+
+    def _windows(self, start_time: datetime, end_time: datetime, gpus: Optional[Sequence[int]],
+                 metrics: Sequence[str]):
+        rows = [_METRIC_ROW[metric] for metric in metrics]
+        with self._lock:
+            return [
+                (index, ring.labels.copy())
+                + ring.window(start_time.timestamp(), end_time.timestamp(), rows)
+                for index, ring in sorted(self._rings.items())
+                if gpus is None or index in gpus
+            ]
+
+    def samples_between(self, start_time: datetime, end_time: datetime,
+                        gpus: Optional[Sequence[int]] = None,
+                        fields: Optional[Sequence[str]] = None) -> List[Dict[str, Any]]:
+        """Per-GPU samples shaped like DatabaseClient.get_gpu_samples, ordered by time and GPU"""
+        fields = GPU_SAMPLES_COLUMNS[2:] if fields is None else fields
+        metrics = [field for field in fields if field in _METRIC_ROW]
+        labels = [field for field in fields if field in _LABELS]
+        samples = []
+        for index, gpu_labels, times, values in self._windows(start_time, end_time, gpus, metrics):
+            columns = [
+                np.where(np.isnan(column), MISSING, _plain(metric, np.nan_to_num(column))).tolist()
+                for metric, column in zip(metrics, values)
+            ]
+            for position, t in enumerate(times.tolist()):
+                sample = {'timestamp': datetime.fromtimestamp(t, timezone.utc), 'index': index}
+                for metric, column in zip(metrics, columns):
+                    sample[metric] = column[position]
+                for label in labels:
+                    sample[label] = gpu_labels[label]
+                samples.append(sample)
+        samples.sort(key=lambda sample: (sample['timestamp'], sample['index']))
+        return samples
+
+    def rollups_between(self, bucket_seconds: int, start_time: datetime, end_time: datetime,
+                        gpus: Optional[Sequence[int]] = None,
+                        fields: Optional[Sequence[str]] = None) -> List[Dict[str, Any]]:
+        """
+        Buckets of bucket_seconds shaped like the rollup points of
+        DatabaseClient.get_rollups, computed from the rings
+        """
+        metrics = [metric for metric in ROLLUP_METRICS if fields is None or metric in fields]
+        points = []
+        for index, _, times, values in self._windows(start_time, end_time, gpus, metrics):
+            if not len(times):
+                continue
+            buckets = np.floor(times / bucket_seconds) * bucket_seconds
+            starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+            counts = np.diff(np.r_[starts, len(times)])
+            stats = {}
+            positions = np.arange(len(times))
+            for metric, column in zip(metrics, values):
+                valid = ~np.isnan(column)
+                readings = np.nan_to_num(column)
+                # Index of the last valid reading per bucket (-1 when none)
+                last = np.maximum.reduceat(np.where(valid, positions, -1), starts)
+                plain = _plain(metric, readings).tolist()
+                # Buckets without a valid reading come out as +-inf; zero them (count is 0)
+                lows = np.minimum.reduceat(np.where(valid, readings, np.inf), starts)
+                highs = np.maximum.reduceat(np.where(valid, readings, -np.inf), starts)
+                stats[metric] = (
+                    _plain(metric, np.where(np.isfinite(lows), lows, 0)).tolist(),
+                    _plain(metric, np.where(np.isfinite(highs), highs, 0)).tolist(),
+                    np.add.reduceat(readings.astype(np.float64) * valid, starts).tolist(),
+                    np.add.reduceat(valid.astype(np.int64), starts).tolist(),
+                    [plain[i] if i >= 0 else None for i in last.tolist()]
+                )
+            for b, bucket in enumerate(buckets[starts].tolist()):
+                point = {
+                    'bucket': datetime.fromtimestamp(bucket, timezone.utc),
+                    'gpu_index': index,
+                    'samples': int(counts[b])
+                }
+                for metric, (mins, maxs, sums, ns, lasts) in stats.items():
+                    point[metric] = {
+                        'min': mins[b] if ns[b] else None,
+                        'max': maxs[b] if ns[b] else None,
+                        'avg': sums[b] / ns[b] if ns[b] else None,
+                        'last': lasts[b]
+                    }
+                points.append(point)
+        points.sort(key=lambda point: (point['bucket'], point['gpu_index']))
+        return points
+
+    def get_stats(self) -> Dict:
+        """Fill level, bounded memory use and lookup counts for diagnostics"""
+        with self._lock:
+            gpus = len(self._rings)
+            memory_bytes = sum(ring.nbytes for ring in self._rings.values())
+            held = max((ring.size for ring in self._rings.values()), default=0)
+        covered = self.covered_from()
+        return {
+            'enabled': self.enabled,
+            'horizon': self.horizon,
+            'capacity': self.capacity,
+            'gpus': gpus,
+            'held_samples': held,
+            'covered_from': covered.isoformat() if covered else None,
+            'memory_bytes': memory_bytes,
+            'max_memory_bytes': self.max_gpus * self.capacity * (8 + 4 * len(HOT_METRICS)),
+            'samples': self.samples,
+            'out_of_order': self.out_of_order,
+            'hits': self.hits,
+            'partial_hits': self.partial_hits,
+            'misses': self.misses
+        }
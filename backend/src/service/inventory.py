@@ -0,0 +1,105 @@
+import logging
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+from src.models.gpu_metrics import GpuInventory
+from src.service.settings import settings
+
+logger = logging.getLogger(__name__)
+
+
+class InventoryCache:
+    """
+    Caches static GPU details (driver and CUDA versions, names, bus IDs,
+    memory totals) so they are read once instead of on every sample. The
+    cache reloads only after refresh() or invalidate(), which the sampler
+    calls when the number of GPUs changes or collection keeps failing.
+    Reloads after failures are spaced by reload_backoff seconds so a
+    failing driver does not cost an inventory query per sample.
+    """
+
+    def __init__(self, loader: Callable[[], GpuInventory],
+                 invalidate_after: Optional[int] = None,
+                 reload_backoff: Optional[float] = None):
+        self._loader = loader
+        self._lock = threading.Lock()
+        self._inventory: Optional[GpuInventory] = None
+        # Consecutive failed collections before the cache is dropped
+        self.invalidate_after = invalidate_after or settings.get(
+            'collection', 'inventory', 'invalidate_after', default=3)
+        self.reload_backoff = reload_backoff if reload_backoff is not None else settings.get(
+            'collection', 'inventory', 'reload_backoff', default=30.0)
+        self.failures = 0
+        self._failed_at = -float('inf')       # monotonic time of the last failed load
+        self._invalidated_at = -float('inf')  # ... and of the last invalidation after failures
+        self.loads = 0
+        self.loaded_at: Optional[float] = None
+        self.last_error: Optional[str] = None
+
+    def get(self) -> GpuInventory:
+        """Return the cached inventory, loading it on first use"""
+        inventory = self._inventory
+        if inventory is not None:
+            return inventory
+        with self._lock:
+            if self._inventory is None:
+                if time.monotonic() - self._failed_at < self.reload_backoff:
+                    raise RuntimeError(f"GPU inventory unavailable: {self.last_error}")
+                self._load()
+            return self._inventory
+
+    def refresh(self) -> GpuInventory:
+        """Reload the inventory now"""
+        with self._lock:
+            self._load()
+            return self._inventory
+
+    def invalidate(self, reason: str = ""):
+        """Drop the cached inventory so the next get() reloads it"""
+        if self._inventory is not None:
+            logger.info(f"GPU inventory invalidated{': ' + reason if reason else ''}")
+        self._inventory = None
+
+    def collection_failed(self, reason: str = ""):
+        """
+        Drop the cache after invalidate_after consecutive failures, at most
+        once per reload_backoff
+        """
+        self.failures += 1
+        now = time.monotonic()
+        if (self.failures >= self.invalidate_after
+                and now - self._invalidated_at >= self.reload_backoff):
+            self._invalidated_at = now
+            self.invalidate(reason)
+
+    def observe(self, gpu_count: int):
+        """Invalidate the cache when a sample reports a different GPU count"""
+        self.failures = 0
+        inventory = self._inventory
+        if inventory is not None and len(inventory.gpus) != gpu_count:
+            self.invalidate(f"GPU count changed from {len(inventory.gpus)} to {gpu_count}")
+
+    def _load(self):
+        try:
+            self._inventory = self._loader()
+        except Exception as e:
+            self.last_error = str(e)
+            self._failed_at = time.monotonic()
+            raise
+        self._failed_at = -float('inf')
+        self.loads += 1
+        self.loaded_at = time.time()
+        self.last_error = None
+        logger.info(f"GPU inventory loaded: {len(self._inventory.gpus)} GPUs, "
+                    f"driver {self._inventory.driver_version}, CUDA {self._inventory.cuda_version}")
+
+    def get_stats(self) -> Dict:
+        """Cache state for diagnostics"""
+        return {
+            'cached': self._inventory is not None,
+            'loads': self.loads,
+            'failures': self.failures,
+            'loaded_at': self.loaded_at,
+            'last_error': self.last_error
+        }
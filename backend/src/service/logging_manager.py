@@ -3,10 +3,10 @@ import json
 import os
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional
-import psycopg2
 from psycopg2.extras import Json
 from contextlib import contextmanager
 import yaml
+from src.database.client import db
 
 logger = logging.getLogger(__name__)
 
@@ -15,7 +15,6 @@ class LoggingManager:
         self.config_path = config_path
         self.config = self._load_config()
         self.is_logging_enabled = True
-        self._setup_db_connection()
 
     def _load_config(self) -> Dict:
         """Load configuration from YAML file."""
@@ -26,30 +25,15 @@ class LoggingManager:
             logger.error(f"Error loading config: {e}")
             return {}
 
-    def _setup_db_connection(self):
-        """Setup database connection parameters."""
-        db_config = self.config.get('database', {})
-        self.db_params = {
-            'dbname': db_config.get('name', 'gpu_sentinel'),
-            'user': db_config.get('user', 'postgres'),
-            'password': db_config.get('password', ''),
-            'host': db_config.get('host', 'localhost'),
-            'port': db_config.get('port', 5432)
-        }
-
     @contextmanager
     def get_db_connection(self):
-        """Context manager for database connections."""
-        conn = None
+        """Context manager for database connections from the shared pool."""
         try:
-            conn = psycopg2.connect(**self.db_params)
-            yield conn
+            with db.get_connection() as conn:
+                yield conn
         except Exception as e:
             logger.error(f"Database connection error: {e}")
             raise
-        finally:
-            if conn:
-                conn.close()
 
     def toggle_logging(self, enabled: bool) -> bool:
         """Enable or disable logging."""
@@ -108,30 +92,21 @@ class LoggingManager:
             return False
 
     def cleanup_old_data(self) -> Dict[str, int]:
-        """Clean up data based on retention policy."""
+        """
+        Clean up data based on retention policy.
+        Expired daily partitions are dropped, so the counts are partitions, not rows.
+        """
         retention = self.get_retention_policy()
         deleted_counts = {'metrics': 0, 'alerts': 0}
 
         try:
-            with self.get_db_connection() as conn:
-                with conn.cursor() as cur:
-                    # Clean up old metrics
-                    cur.execute("""
-                        DELETE FROM gpu_metrics
-                        WHERE timestamp < NOW() - INTERVAL '%s days'
-                        RETURNING COUNT(*)
-                    """, (retention['metrics_retention_days'],))
-                    deleted_counts['metrics'] = cur.fetchone()[0]
-
-                    # Clean up old alerts
-                    cur.execute("""
-                        DELETE FROM alert_history
-                        WHERE created_at < NOW() - INTERVAL '%s days'
-                        RETURNING COUNT(*)
-                    """, (retention['alerts_retention_days'],))
-                    deleted_counts['alerts'] = cur.fetchone()[0]
-
-                conn.commit()
+            dropped = db.partitions.drop_expired({
+                'gpu_metrics': retention['metrics_retention_days'],
+                'gpu_samples': retention['metrics_retention_days'],
+                'alert_history': retention['alerts_retention_days']
+            })
+            deleted_counts['metrics'] = dropped['gpu_metrics']
+            deleted_counts['alerts'] = dropped['alert_history']
             return deleted_counts
         except Exception as e:
             logger.error(f"Error cleaning up old data: {e}")
@@ -181,4 +156,4 @@ if __name__ == "__main__":
     
     # Example: Clean up old data
     deleted = manager.cleanup_old_data()
-    print(f"Cleaned up {deleted['metrics']} metrics and {deleted['alerts']} alerts")
+    print(f"Dropped {deleted['metrics']} metrics and {deleted['alerts']} alerts partitions")
@@ -0,0 +1,89 @@
+import asyncio
+import logging
+import time
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class PeriodicTask:
+    """
+    Runs a blocking maintenance job (partition upkeep, retention) in the
+    default thread pool every interval seconds. Failures are logged and
+    retried on the next run; the job never runs concurrently with itself.
+    """
+
+    def __init__(self, name: str, job: Callable[[], Any], interval: float,
+                 run_at_start: bool = True):
+        self.name = name
+        self._job = job
+        self.interval = interval
+        self.run_at_start = run_at_start
+        self._task: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+
+        self.runs = 0
+        self.errors = 0
+        self.last_result: Any = None
+        self.last_error: Optional[str] = None
+        self.last_run_at: Optional[float] = None
+        self.last_duration: Optional[float] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        """Start the task loop on the running event loop"""
+        if self.running:
+            return
+        self._task = asyncio.get_running_loop().create_task(self._run())
+        logger.info(f"{self.name} maintenance scheduled every {self.interval}s")
+
+    async def stop(self):
+        """Cancel the task loop and wait for it to finish"""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def run_once(self) -> Any:
+        """Run the job now in a worker thread; errors are logged, not raised"""
+        async with self._lock:
+            started = time.monotonic()
+            try:
+                self.last_result = await asyncio.to_thread(self._job)
+                self.last_error = None
+            except Exception as e:
+                self.errors += 1
+                self.last_error = str(e)
+                logger.error(f"{self.name} maintenance failed: {e}")
+            finally:
+                self.runs += 1
+                self.last_run_at = time.time()
+                self.last_duration = time.monotonic() - started
+            return self.last_result
+
+    async def _run(self):
+        if not self.run_at_start:
+            await asyncio.sleep(self.interval)
+        while True:
+            await self.run_once()
+            await asyncio.sleep(self.interval)
+
+    def get_stats(self) -> Dict:
+        """Run counters for diagnostics"""
+        return {
+            'running': self.running,
+            'interval': self.interval,
+            'runs': self.runs,
+            'errors': self.errors,
+            'last_result': self.last_result,
+            'last_error': self.last_error,
+            'last_run_at': self.last_run_at,
+            'last_duration': self.last_duration
+        }
@@ -0,0 +1,287 @@
+import asyncio
+import logging
+import math
+import os
+import re
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional
+
+from src.models.gpu_metrics import GpuInventory, GpuInventoryEntry
+from src.service.settings import settings
+from src.service.system_health import SystemHealthCheck, GPU_METRICS_QUERY, GPU_INVENTORY_QUERY
+from src.service.nvidia_stream import NvidiaSmiStream
+from src.service.smi_parser import GpuColumns, MISSING, parse_gpu_csv
+
+logger = logging.getLogger(__name__)
+
+
+class MetricsSource(ABC):
+    """Backend that reads raw GPU counters for the sampler"""
+
+    name = "base"
+
+    def start(self):
+        """Acquire any long-lived resources (processes, library handles)"""
+
+    def stop(self):
+        """Release resources acquired in start()"""
+
+    def set_interval(self, interval: float):
+        """Follow the sampler's interval; only sources that poll on their own need this"""
+
+    @abstractmethod
+    def read_inventory(self) -> GpuInventory:
+        """Return static driver, CUDA and per-GPU hardware details"""
+
+    @abstractmethod
+    def read_gpus(self) -> GpuColumns:
+        """Return the current readings, one row per GPU"""
+
+    async def read_gpus_async(self, timeout: float = 5) -> GpuColumns:
+        """Non-blocking read_gpus(); sources backed by processes override this"""
+        return await asyncio.wait_for(asyncio.to_thread(self.read_gpus), timeout)
+
+    def get_stats(self) -> Dict:
+        """Source state for diagnostics"""
+        return {'source': self.name}
+
+
+class NvidiaSmiSource(MetricsSource):
+    """Parses nvidia-smi output, either one fork per sample or streamed"""
+
+    name = "nvidia-smi"
+
+    def __init__(self, health_check: SystemHealthCheck, mode: str = "poll",
+                 interval: float = 0.25):
+        self.health_check = health_check
+        self.mode = mode
+        self.stream = NvidiaSmiStream(health_check, interval) if mode == "stream" else None
+
+    def start(self):
+        if self.stream:
+            self.stream.start()
+
+    def stop(self):
+        if self.stream:
+            self.stream.stop()
+
+    def set_interval(self, interval: float):
+        if self.stream:
+            self.stream.set_interval(interval)
+
+    def read_inventory(self) -> GpuInventory:
+        run = self.health_check._run_nvidia_command
+        nvidia_smi = self.health_check.nvidia_smi_path
+
+        # CUDA version is only reported in the banner
+        banner = run([nvidia_smi]).stdout
+        cuda_match = re.search(r'CUDA Version: ([\d\.]+)', banner or "")
+        cuda_version = cuda_match.group(1) if cuda_match else "Unknown"
+
+        result = run([nvidia_smi, GPU_INVENTORY_QUERY, "--format=csv,noheader,nounits"])
+        if result.returncode != 0:
+            raise RuntimeError(f"GPU inventory query failed: {result.stderr}")
+
+        driver_version = "Unknown"
+        gpus = []
+        for line in result.stdout.strip().split('\n'):
+            values = [v.strip() for v in line.split(',')]
+            if len(values) >= 5:
+                gpus.append(GpuInventoryEntry(
+                    index=int(values[0]),
+                    name=values[1],
+                    bus_id=values[2],
+                    memory_total=int(float(values[3]))
+                ))
+                driver_version = values[4]
+
+        return GpuInventory(driver_version=driver_version, cuda_version=cuda_version, gpus=gpus)
+
+    def _command(self) -> List[str]:
+        return [self.health_check.nvidia_smi_path, GPU_METRICS_QUERY,
+                "--format=csv,noheader,nounits"]
+
+    def read_gpus(self) -> GpuColumns:
+        if self.stream:
+            output = self.stream.read()
+        else:
+            output = self.health_check._run_nvidia_command(self._command()).stdout
+        return parse_gpu_csv(output)
+
+    async def read_gpus_async(self, timeout: float = 5) -> GpuColumns:
+        if self.stream:
+            # The stream keeps the latest block in memory, no I/O needed
+            return parse_gpu_csv(self.stream.read())
+        result = await self.health_check._run_nvidia_command_async(self._command(), timeout)
+        return parse_gpu_csv(result.stdout)
+
+    def get_stats(self) -> Dict:
+        stats = {'source': self.name, 'mode': self.mode}
+        if self.stream:
+            stats['stream'] = self.stream.get_stats()
+        return stats
+
+
+class NvmlSource(MetricsSource):
+    """Reads counters in-process through NVML (pynvml), without forking"""
+
+    name = "nvml"
+
+    COMPUTE_MODES = {
+        0: "Default",
+        1: "Exclusive_Thread",
+        2: "Prohibited",
+        3: "Exclusive_Process"
+    }
+
+    def __init__(self):
+        try:
+            import pynvml
+        except ImportError as e:
+            raise RuntimeError("The nvml metrics source requires the pynvml package") from e
+        self._nvml = pynvml
+        self._handles = []
+        self._names: List[str] = []
+
+    @staticmethod
+    def _text(value) -> str:
+        # Older pynvml releases return bytes
+        return value.decode() if isinstance(value, bytes) else value
+
+    def start(self):
+        nvml = self._nvml
+        nvml.nvmlInit()
+        count = nvml.nvmlDeviceGetCount()
+        self._handles = [nvml.nvmlDeviceGetHandleByIndex(i) for i in range(count)]
+        self._names = [self._text(nvml.nvmlDeviceGetName(h)) for h in self._handles]
+        logger.info(f"NVML initialized with {count} GPUs")
+
+    def stop(self):
+        if self._handles:
+            self._handles = []
+            self._nvml.nvmlShutdown()
+
+    def _optional(self, fn, *args, scale: float = 1):
+        # Counters such as fan speed are unsupported on some boards
+        try:
+            return fn(*args) / scale
+        except self._nvml.NVMLError:
+            return MISSING
+
+    def read_inventory(self) -> GpuInventory:
+        nvml = self._nvml
+        cuda = nvml.nvmlSystemGetCudaDriverVersion()
+        gpus = [
+            GpuInventoryEntry(
+                index=index,
+                name=self._names[index],
+                bus_id=self._text(nvml.nvmlDeviceGetPciInfo(handle).busId),
+                memory_total=nvml.nvmlDeviceGetMemoryInfo(handle).total // (1024 * 1024)
+            )
+            for index, handle in enumerate(self._handles)
+        ]
+        return GpuInventory(
+            driver_version=self._text(nvml.nvmlSystemGetDriverVersion()),
+            cuda_version=f"{cuda // 1000}.{(cuda % 1000) // 10}",
+            gpus=gpus
+        )
+
+    def read_gpus(self) -> GpuColumns:
+        nvml = self._nvml
+        readings = []
+        for index, handle in enumerate(self._handles):
+            memory = nvml.nvmlDeviceGetMemoryInfo(handle)
+            utilization = nvml.nvmlDeviceGetUtilizationRates(handle)
+            readings.append({
+                'index': index,
+                'name': self._names[index],
+                'fan_speed': self._optional(nvml.nvmlDeviceGetFanSpeed, handle),
+                'power_draw': self._optional(nvml.nvmlDeviceGetPowerUsage, handle, scale=1000),
+                'memory_total': memory.total / (1024 * 1024),
+                'memory_used': memory.used / (1024 * 1024),
+                'gpu_utilization': utilization.gpu,
+                'temperature': nvml.nvmlDeviceGetTemperature(handle, nvml.NVML_TEMPERATURE_GPU),
+                'compute_mode': self.COMPUTE_MODES.get(
+                    self._optional(nvml.nvmlDeviceGetComputeMode, handle), "Unknown"),
+                'power_limit': self._optional(
+                    nvml.nvmlDeviceGetEnforcedPowerLimit, handle, scale=1000)
+            })
+        return GpuColumns.from_rows(readings)
+
+
+class SyntheticSource(MetricsSource):
+    """
+    Deterministic fake GPUs for tests and benchmarks. Values depend only on
+    the GPU index and the number of samples taken, never on wall clock time.
+    """
+
+    name = "synthetic"
+
+    def __init__(self, gpu_count: int = 2, memory_total: int = 24576,
+                 power_limit: float = 300.0):
+        self.gpu_count = gpu_count
+        self.memory_total = memory_total
+        self.power_limit = power_limit
+        self.step = 0
+
+    @staticmethod
+    def _wave(index: int, step: int, period: int, low: float, high: float) -> float:
+        phase = (step / period + index * 0.37) * 2 * math.pi
+        return low + (high - low) * (math.sin(phase) + 1) / 2
+
+    def read_inventory(self) -> GpuInventory:
+        return GpuInventory(
+            driver_version="535.183.01",
+            cuda_version="12.2",
+            gpus=[
+                GpuInventoryEntry(
+                    index=i,
+                    name="NVIDIA Synthetic GPU",
+                    bus_id=f"00000000:{i + 1:02X}:00.0",
+                    memory_total=self.memory_total
+                )
+                for i in range(self.gpu_count)
+            ]
+        )
+
+    def read_gpus(self) -> GpuColumns:
+        step = self.step
+        self.step += 1
+        wave = self._wave
+        return GpuColumns.from_rows([
+            {
+                'index': i,
+                'name': "NVIDIA Synthetic GPU",
+                'fan_speed': round(wave(i, step, 240, 30, 70)),
+                'power_draw': round(wave(i, step, 80, 60, self.power_limit - 20), 2),
+                'memory_total': self.memory_total,
+                'memory_used': round(wave(i, step, 480, 500, self.memory_total - 500)),
+                'gpu_utilization': round(wave(i, step, 80, 0, 100)),
+                'temperature': round(wave(i, step, 360, 35, 82)),
+                'compute_mode': "Default",
+                'power_limit': self.power_limit
+            }
+            for i in range(self.gpu_count)
+        ])
+
+
+def create_metrics_source(name: Optional[str] = None,
+                          health_check: Optional[SystemHealthCheck] = None) -> MetricsSource:
+    """
+    Build the configured metrics source. The GPU_SENTINEL_METRICS_SOURCE
+    environment variable overrides collection.source in config.yaml.
+    """
+    name = name or os.environ.get('GPU_SENTINEL_METRICS_SOURCE') \
+        or settings.get('collection', 'source', default='nvidia-smi')
+
+    if name == NvidiaSmiSource.name:
+        return NvidiaSmiSource(
+            health_check or SystemHealthCheck(),
+            mode=settings.get('collection', 'nvidia_smi_mode', default='poll'),
+            interval=settings.get('polling', 'base_interval', default=0.25)
+        )
+    if name == NvmlSource.name:
+        return NvmlSource()
+    if name == SyntheticSource.name:
+        return SyntheticSource(gpu_count=settings.get('collection', 'synthetic_gpus', default=2))
+    raise ValueError(f"Unknown metrics source: {name}")
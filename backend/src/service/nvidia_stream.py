@@ -0,0 +1,213 @@
+import logging
+import subprocess
+import threading
+import time
+from typing import Dict, List, Optional
+
+from src.service.system_health import SystemHealthCheck, GPU_METRICS_QUERY
+
+logger = logging.getLogger(__name__)
+
+
+class NvidiaSmiStream:
+    """
+    Keeps a single `nvidia-smi --query-gpu=... -lms <interval>` process
+    running and parses its output line by line as records arrive, instead
+    of forking nvidia-smi for every sample. The child is restarted with
+    exponential backoff whenever it exits, and right away with the new
+    loop interval when set_interval() changes it.
+    """
+
+    def __init__(self, health_check: SystemHealthCheck, interval: float,
+                 max_staleness: Optional[float] = None,
+                 restart_delay: float = 1.0, max_restart_delay: float = 30.0):
+        self.health_check = health_check
+        self.interval_ms = max(int(interval * 1000), 1)
+        # Serving a block older than this means the child is wedged
+        self._fixed_staleness = max_staleness
+        self.max_staleness = max_staleness or max(interval * 5, 5.0)
+        self._next_staleness: Optional[float] = None
+        self.restart_delay = restart_delay
+        self.max_restart_delay = max_restart_delay
+
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._process: Optional[subprocess.Popen] = None
+        self._block: Optional[str] = None
+        self._block_time: Optional[float] = None
+        self._spawned_ms: Optional[int] = None  # loop interval of the running child
+        self.blocks = 0
+        self.restarts = 0
+        self.interval_changes = 0
+        self.last_error: Optional[str] = None
+
+    def _command(self) -> List[str]:
+        return [
+            self.health_check.nvidia_smi_path,
+            GPU_METRICS_QUERY,
+            "--format=csv,noheader,nounits",
+            "-lms", str(self._spawned_ms or self.interval_ms)
+        ]
+
+    def start(self):
+        """Start the reader thread"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="nvidia-smi-stream", daemon=True)
+        self._thread.start()
+        logger.info(f"nvidia-smi stream started with {self.interval_ms}ms interval")
+
+    def stop(self, timeout: float = 5.0):
+        """Stop the reader thread and terminate the child process"""
+        self._stop.set()
+        self._terminate()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+        logger.info("nvidia-smi stream stopped")
+
+    def set_interval(self, interval: float):
+        """Restart the child with a new loop interval; does not block"""
+        interval_ms = max(int(interval * 1000), 1)
+        if interval_ms == self.interval_ms:
+            return
+        staleness = self._fixed_staleness or max(interval * 5, 5.0)
+        with self._lock:
+            self.interval_ms = interval_ms
+            # The last block was paced by the old interval; keep its staleness
+            # limit until the new child publishes
+            self._next_staleness = staleness
+            self.max_staleness = max(self.max_staleness, staleness)
+        self.interval_changes += 1
+        process = self._process
+        if process is not None and process.poll() is None:
+            process.terminate()
+        logger.info(f"nvidia-smi stream interval set to {interval_ms}ms")
+
+    def read(self) -> str:
+        """Return the latest complete block of CSV lines, one per GPU"""
+        with self._lock:
+            block, block_time = self._block, self._block_time
+        if block is None:
+            raise RuntimeError(self.last_error or "No nvidia-smi output received yet")
+        age = time.monotonic() - block_time
+        if age > self.max_staleness:
+            raise RuntimeError(f"nvidia-smi stream is stale ({age:.1f}s since last record)")
+        return block
+
+    def _publish(self, lines: List[str]):
+        with self._lock:
+            self._block = "\n".join(lines)
+            self._block_time = time.monotonic()
+            self.blocks += 1
+            if self._next_staleness is not None:
+                self.max_staleness, self._next_staleness = self._next_staleness, None
+
+    def _spawn(self) -> subprocess.Popen:
+        args = self._command()
+        if not self.health_check.nvidia_smi_path:
+            raise RuntimeError("nvidia-smi not found or not executable")
+        if not self.health_check._validate_nvidia_command(args):
+            raise ValueError("Invalid nvidia-smi arguments")
+        return subprocess.Popen(
+            args,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True,
+            bufsize=1
+        )
+
+    def _terminate(self):
+        process = self._process
+        if process is None or process.poll() is not None:
+            return
+        process.terminate()
+        try:
+            process.wait(timeout=2)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+    def _consume(self, process: subprocess.Popen) -> bool:
+        """Read records until the child exits; returns True if any block arrived"""
+        pending: List[str] = []
+        last_index = -1
+        block_max = None  # highest GPU index of the previous record
+        flushed = False   # pending was already published early
+        received = False
+
+        for line in process.stdout:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                index = int(line.split(',', 1)[0])
+            except ValueError:
+                logger.debug(f"Ignoring unexpected nvidia-smi output: {line}")
+                continue
+
+            # GPU index wrapping around marks the start of the next record
+            if pending and index <= last_index:
+                if not flushed:
+                    self._publish(pending)
+                    received = True
+                block_max = last_index
+                pending = []
+                flushed = False
+
+            pending.append(line)
+            last_index = index
+
+            if flushed:
+                # More GPUs than the previous record (hot-plug, MIG change);
+                # publish the grown record in place of the early one
+                self._publish(pending)
+            elif index == block_max:
+                # Reached the previous record's last GPU; publish without
+                # waiting for the next record to start
+                self._publish(pending)
+                received = True
+                flushed = True
+
+        return received
+
+    def _run(self):
+        delay = self.restart_delay
+        while not self._stop.is_set():
+            try:
+                self._spawned_ms = self.interval_ms
+                self._process = self._spawn()
+                if self._consume(self._process):
+                    delay = self.restart_delay
+                returncode = self._process.wait()
+                if self._stop.is_set():
+                    break
+                if self._spawned_ms != self.interval_ms:
+                    # Terminated by set_interval(); start the new child now
+                    continue
+                self.last_error = f"nvidia-smi exited with code {returncode}"
+            except Exception as e:
+                self.last_error = str(e)
+
+            self.restarts += 1
+            logger.warning(f"{self.last_error}; restarting nvidia-smi stream in {delay:.1f}s")
+            if self._stop.wait(delay):
+                break
+            delay = min(delay * 2, self.max_restart_delay)
+
+    def get_stats(self) -> Dict:
+        """Stream state for diagnostics"""
+        with self._lock:
+            block_time = self._block_time
+        process = self._process
+        return {
+            'running': self._thread is not None and self._thread.is_alive(),
+            'pid': process.pid if process and process.poll() is None else None,
+            'interval_ms': self.interval_ms,
+            'interval_changes': self.interval_changes,
+            'blocks': self.blocks,
+            'restarts': self.restarts,
+            'last_error': self.last_error,
+            'last_block_age': time.monotonic() - block_time if block_time else None
+        }
@@ -0,0 +1,187 @@
+import asyncio
+import logging
+import time
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, List, Optional, Union
+
+from src.models.gpu_metrics import GpuMetricsRecord, GpuBurnMetrics, NvidiaInfo, GpuMetrics
+from src.service.inventory import InventoryCache
+from src.service.metrics_source import MetricsSource
+from src.service.rates import GpuRates
+from src.service.settings import settings
+from src.service.smi_parser import GpuColumns
+from src.service.spool import MetricsSpool
+from src.service.write_behind import WriteBehindBuffer
+
+logger = logging.getLogger(__name__)
+
+# Stages of one sample, in execution order
+STAGES = ('collect', 'inventory', 'alerts', 'store')
+
+DEFAULT_STAGE_TIMEOUTS = {
+    'collect': 5.0,
+    'inventory': 10.0,
+    'alerts': 2.0,
+    'store': 5.0
+}
+
+
+class CollectionPipeline:
+    """
+    Turns one read from the metrics source into a GpuMetricsRecord, checks
+    alerts and stores it. Every stage runs off the event loop (asyncio
+    subprocesses or the default thread pool) under its own timeout, so a
+    hung driver or database never stalls request handling.
+    """
+
+    def __init__(self, source: MetricsSource, inventory: InventoryCache,
+                 alert_system, db, should_store: Callable[[], bool] = lambda: True,
+                 timeouts: Optional[Dict[str, float]] = None,
+                 writer: Optional[Union[WriteBehindBuffer, MetricsSpool]] = None):
+        self.source = source
+        self.inventory = inventory
+        self.alert_system = alert_system
+        self.db = db
+        # With a write-behind buffer or spool samples are queued instead of inserted inline
+        self.writer = writer
+        self.should_store = should_store
+        self.timeouts = dict(DEFAULT_STAGE_TIMEOUTS)
+        self.timeouts.update(timeouts or settings.get('collection', 'stage_timeouts', default={}))
+
+        # Seconds of history used for the rate-of-change slopes
+        self.rate_window = settings.get('collection', 'rate_window', default=30.0)
+        self.rates: Dict[int, GpuRates] = {}
+        self.peak_temperatures: Dict[int, float] = {}
+
+        self._stage_stats = {
+            stage: {'last_duration': None, 'timeouts': 0, 'errors': 0} for stage in STAGES
+        }
+
+    async def _stage(self, name: str, awaitable: Awaitable):
+        """Await one stage under its timeout, recording duration and failures"""
+        stats = self._stage_stats[name]
+        started = time.monotonic()
+        try:
+            return await asyncio.wait_for(awaitable, self.timeouts[name])
+        except asyncio.TimeoutError:
+            stats['timeouts'] += 1
+            raise TimeoutError(f"{name} stage timed out after {self.timeouts[name]}s")
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            stats['errors'] += 1
+            raise
+        finally:
+            stats['last_duration'] = time.monotonic() - started
+
+    def get_nvidia_info(self) -> NvidiaInfo:
+        try:
+            cached = self.inventory.get()
+            return NvidiaInfo(
+                driver_version=cached.driver_version,
+                cuda_version=cached.cuda_version
+            )
+        except Exception as e:
+            logger.error(f"Error getting NVIDIA info: {str(e)}")
+            return NvidiaInfo(
+                driver_version="Unknown",
+                cuda_version="Unknown"
+            )
+
+    def build_record(self, readings: GpuColumns, nvidia_info: NvidiaInfo) -> GpuMetricsRecord:
+        """Convert a block of source readings into a metrics record"""
+        gpus = []
+        current_time = time.monotonic()
+
+        for i in range(len(readings)):
+            gpu_index = readings.index[i]
+            temperature = readings.temperature[i]
+
+            rates = self.rates.get(gpu_index)
+            if rates is None:
+                rates = self.rates[gpu_index] = GpuRates(self.rate_window)
+            change = rates.update(
+                current_time, temperature, readings.power_draw[i], readings.gpu_utilization[i])
+
+            if (gpu_index not in self.peak_temperatures
+                    or temperature > self.peak_temperatures[gpu_index]):
+                self.peak_temperatures[gpu_index] = temperature
+
+            # Values are already typed by the parser, so skip validation
+            gpus.append(GpuMetrics.model_construct(
+                index=gpu_index,
+                name=readings.name[i],
+                fan_speed=readings.fan_speed[i],
+                power_draw=readings.power_draw[i],
+                power_limit=int(readings.power_limit[i]),
+                memory_total=readings.memory_total[i],
+                memory_used=readings.memory_used[i],
+                gpu_utilization=readings.gpu_utilization[i],
+                temperature=temperature,
+                peak_temperature=int(self.peak_temperatures[gpu_index]),
+                temp_change_rate=change['temperature'],
+                power_change_rate=change['power_draw'],
+                utilization_change_rate=change['gpu_utilization'],
+                compute_mode=readings.compute_mode[i]
+            ))
+
+        return GpuMetricsRecord(
+            nvidia_info=nvidia_info,
+            gpus=gpus,
+            processes=[],
+            gpu_burn_metrics=GpuBurnMetrics(
+                running=False,
+                duration=0,
+                errors=0
+            ),
+            success=True,
+            timestamp=datetime.utcnow().isoformat()
+        )
+
+    async def collect(self) -> GpuMetricsRecord:
+        """Collect, alert on and store one sample"""
+        try:
+            readings = await self._stage(
+                'collect', self.source.read_gpus_async(self.timeouts['collect']))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Error getting GPU metrics: {str(e)}")
+            self.inventory.collection_failed("metrics collection failed")
+            raise
+
+        self.inventory.observe(len(readings))
+        nvidia_info = await self._stage('inventory', asyncio.to_thread(self.get_nvidia_info))
+        metrics = self.build_record(readings, nvidia_info)
+
+        # Alerting and storage failures are logged but still publish the sample
+        try:
+            await self._stage('alerts', asyncio.to_thread(self.alert_system.check_metrics, metrics))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Failed to check alerts: {e}")
+
+        # Store in database only if logging is enabled
+        if self.should_store():
+            if self.writer:
+                self.writer.submit(metrics)
+                return metrics
+            try:
+                await self._stage('store', asyncio.to_thread(self.db.insert_gpu_metrics, metrics))
+                logger.info("Metrics stored in database")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Failed to store metrics: {e}")
+        else:
+            logger.debug("Metrics logging is disabled, skipping database insert")
+
+        return metrics
+
+    def get_stats(self) -> Dict:
+        """Per-stage timings and failure counts for diagnostics"""
+        return {
+            'timeouts': dict(self.timeouts),
+            'stages': {stage: dict(stats) for stage, stats in self._stage_stats.items()}
+        }
@@ -0,0 +1,100 @@
+from collections import deque
+from typing import Dict
+
+from src.service.smi_parser import MISSING
+
+# Recompute the running sums from the window this often to shed
+# floating point error accumulated by subtracting expired points
+RESYNC_EVERY = 10000
+
+
+class RollingSlope:
+    """
+    Least-squares slope of y over time across a sliding time window.
+    Each add() updates running sums and expires old points from the left
+    of the window, so the cost per sample is O(1) amortized; the window is
+    never rescanned on the hot path.
+    """
+
+    __slots__ = ('window', '_points', '_origin', '_n', '_sx', '_sy', '_sxx', '_sxy', '_adds')
+
+    def __init__(self, window: float):
+        self.window = window
+        self._points = deque()
+        self._origin = None
+        self._n = 0
+        self._sx = self._sy = self._sxx = self._sxy = 0.0
+        self._adds = 0
+
+    def add(self, t: float, y: float) -> float:
+        """Add a point at time t (seconds) and return the updated slope per second"""
+        if self._origin is None:
+            self._origin = t
+        x = t - self._origin
+
+        points = self._points
+        points.append((x, y))
+        self._n += 1
+        self._sx += x
+        self._sy += y
+        self._sxx += x * x
+        self._sxy += x * y
+
+        cutoff = x - self.window
+        while points[0][0] < cutoff:
+            old_x, old_y = points.popleft()
+            self._n -= 1
+            self._sx -= old_x
+            self._sy -= old_y
+            self._sxx -= old_x * old_x
+            self._sxy -= old_x * old_y
+
+        self._adds += 1
+        if self._adds >= RESYNC_EVERY:
+            self._resync()
+        return self.slope()
+
+    def _resync(self):
+        # Move the origin to the oldest point so x stays small, then rebuild the sums
+        self._adds = 0
+        shift = self._points[0][0]
+        self._origin += shift
+        self._points = deque((x - shift, y) for x, y in self._points)
+        self._sx = sum(x for x, _ in self._points)
+        self._sy = sum(y for _, y in self._points)
+        self._sxx = sum(x * x for x, _ in self._points)
+        self._sxy = sum(x * y for x, y in self._points)
+
+    def slope(self) -> float:
+        n = self._n
+        if n < 2:
+            return 0.0
+        denominator = n * self._sxx - self._sx * self._sx
+        if denominator <= 1e-12:
+            return 0.0
+        return (n * self._sxy - self._sx * self._sy) / denominator
+
+
+class GpuRates:
+    """Per-minute rates of change for one GPU's temperature, power and utilization"""
+
+    __slots__ = ('temperature', 'power_draw', 'gpu_utilization')
+
+    def __init__(self, window: float):
+        self.temperature = RollingSlope(window)
+        self.power_draw = RollingSlope(window)
+        self.gpu_utilization = RollingSlope(window)
+
+    def update(self, t: float, temperature: float, power_draw: float,
+               gpu_utilization: float) -> Dict[str, float]:
+        """Add one sample; MISSING values leave that metric's slope unchanged"""
+        return {
+            'temperature': self._update(self.temperature, t, temperature),
+            'power_draw': self._update(self.power_draw, t, power_draw),
+            'gpu_utilization': self._update(self.gpu_utilization, t, gpu_utilization)
+        }
+
+    @staticmethod
+    def _update(slope: RollingSlope, t: float, value: float) -> float:
+        per_second = slope.slope() if value == MISSING else slope.add(t, value)
+        return round(per_second * 60, 3)
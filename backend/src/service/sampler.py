@@ -0,0 +1,165 @@
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from src.models.gpu_metrics import GpuMetricsRecord
+from src.service.scheduler import AdaptiveScheduler
+from src.service.settings import settings
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class MetricsSnapshot:
+    """Immutable view of the most recent GPU sample"""
+    record: GpuMetricsRecord
+    gpus_json: bytes  # Pre-serialized GPU list served by /api/gpu-stats
+    sequence: int
+    collected_at: float  # Wall clock time the sample was taken
+    collection_time: float  # Seconds spent collecting the sample
+
+
+class MetricsSampler:
+    """
+    Background loop that collects GPU metrics and publishes the latest
+    result as an immutable snapshot. Request handlers only read the
+    snapshot, so the sample rate no longer depends on how many clients are
+    polling. Samples are scheduled against absolute deadlines so collection
+    time does not accumulate as drift; with a scheduler the interval adapts
+    to GPU activity. While collection keeps failing, the last snapshot
+    turns stale after stale_after intervals and is no longer served.
+    """
+
+    def __init__(self, collect: Callable[[], Awaitable[GpuMetricsRecord]],
+                 interval: Optional[float] = None,
+                 scheduler: Optional[AdaptiveScheduler] = None,
+                 stale_after: Optional[float] = None,
+                 on_interval_change: Optional[Callable[[float], None]] = None):
+        self._collect = collect
+        self.interval = interval or settings.get('polling', 'base_interval', default=0.25)
+        self.stale_after = stale_after or settings.get('polling', 'stale_after', default=4)
+        self.scheduler = scheduler
+        # Called with the new interval whenever the scheduler changes it
+        self.on_interval_change = on_interval_change
+        self.overruns = 0
+        self._snapshot: Optional[MetricsSnapshot] = None
+        self._task: Optional[asyncio.Task] = None
+        self._sequence = 0
+        self._listeners: List[Callable[[MetricsSnapshot], None]] = []
+        self.errors = 0
+        self.consecutive_errors = 0
+        self.last_error: Optional[str] = None
+
+    @property
+    def snapshot(self) -> Optional[MetricsSnapshot]:
+        """Latest published snapshot, or None before the first sample"""
+        return self._snapshot
+
+    def snapshot_age(self) -> Optional[float]:
+        """Seconds since the latest snapshot was taken, or None before the first sample"""
+        snapshot = self._snapshot
+        return time.time() - snapshot.collected_at if snapshot else None
+
+    def is_stale(self) -> bool:
+        """True once collection has failed since the latest snapshot for stale_after intervals"""
+        age = self.snapshot_age()
+        return (age is not None and self.consecutive_errors > 0
+                and age > self.stale_after * self.interval)
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        """Start the sampling loop on the running event loop"""
+        if self.running:
+            return
+        self._task = asyncio.get_running_loop().create_task(self._run())
+        logger.info(f"Metrics sampler started with {self.interval}s interval")
+
+    async def stop(self):
+        """Cancel the sampling loop and wait for it to finish"""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        logger.info("Metrics sampler stopped")
+
+    def add_listener(self, listener: Callable[[MetricsSnapshot], None]):
+        """Call listener with every published snapshot, on the event loop; it must not block"""
+        self._listeners.append(listener)
+
+    async def sample_once(self) -> MetricsSnapshot:
+        """Collect one sample and publish it"""
+        started = time.monotonic()
+        record = await self._collect()
+        self._sequence += 1
+        gpus_json = b"[" + b",".join(gpu.model_dump_json().encode() for gpu in record.gpus) + b"]"
+        snapshot = MetricsSnapshot(
+            record=record,
+            gpus_json=gpus_json,
+            sequence=self._sequence,
+            collected_at=time.time(),
+            collection_time=time.monotonic() - started
+        )
+        # A single reference swap publishes the snapshot atomically
+        self._snapshot = snapshot
+        self.consecutive_errors = 0
+        self.last_error = None
+        for listener in self._listeners:
+            try:
+                listener(snapshot)
+            except Exception as e:
+                logger.error(f"Snapshot listener failed: {e}")
+        return snapshot
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        deadline = loop.time()
+        while True:
+            try:
+                snapshot = await self.sample_once()
+                if self.scheduler:
+                    interval = self.scheduler.observe(snapshot.record)
+                    if interval != self.interval and self.on_interval_change:
+                        self.on_interval_change(interval)
+                    self.interval = interval
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.errors += 1
+                self.consecutive_errors += 1
+                self.last_error = str(e)
+                logger.error(f"Error sampling GPU metrics: {e}")
+
+            deadline += self.interval
+            now = loop.time()
+            if deadline < now:
+                # Collection overran the slot; restart the schedule from now
+                # instead of firing a burst of catch-up samples
+                self.overruns += 1
+                deadline = now
+            await asyncio.sleep(deadline - now)
+
+    def get_stats(self) -> Dict:
+        """Sampler state for diagnostics"""
+        snapshot = self._snapshot
+        return {
+            'running': self.running,
+            'interval': self.interval,
+            'adaptive': self.scheduler.get_stats() if self.scheduler else None,
+            'overruns': self.overruns,
+            'samples': self._sequence,
+            'errors': self.errors,
+            'consecutive_errors': self.consecutive_errors,
+            'last_error': self.last_error,
+            'stale': self.is_stale(),
+            'last_sample_at': snapshot.collected_at if snapshot else None,
+            'last_collection_time': snapshot.collection_time if snapshot else None
+        }
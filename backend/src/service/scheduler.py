@@ -0,0 +1,95 @@
+import logging
+import time
+from typing import Dict, Optional
+
+from src.models.gpu_metrics import GpuMetricsRecord
+from src.service.settings import settings
+from src.service.smi_parser import MISSING
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ACTIVITY = {
+    'utilization_delta': 5,   # percentage points
+    'temperature_delta': 2,   # degrees C
+    'power_delta': 10,        # watts
+    'busy_utilization': 5     # any GPU above this is never idle
+}
+
+
+class AdaptiveScheduler:
+    """
+    Chooses the sampling interval from polling.activity_thresholds. The
+    interval backs off to the threshold level matching how long every GPU
+    has been idle, and drops back to base_interval on the first sample where
+    utilization, temperature or power moves.
+    """
+
+    def __init__(self, base_interval: Optional[float] = None,
+                 max_interval: Optional[float] = None,
+                 thresholds: Optional[Dict] = None,
+                 activity: Optional[Dict] = None):
+        self.base_interval = base_interval or settings.get('polling', 'base_interval', default=0.25)
+        self.max_interval = max_interval or settings.get('polling', 'max_interval', default=10.0)
+        thresholds = thresholds or settings.get('polling', 'activity_thresholds', default={})
+        # Longest idle time first so the first match is the deepest back-off
+        self.levels = sorted(
+            ((name, level['idle_time'], min(level['interval'], self.max_interval))
+             for name, level in thresholds.items()),
+            key=lambda level: level[1],
+            reverse=True
+        )
+        self.activity = dict(DEFAULT_ACTIVITY)
+        self.activity.update(activity or settings.get('polling', 'activity', default={}))
+
+        self._previous: Dict[int, tuple] = {}
+        self.last_activity = time.monotonic()
+        self.level = 'active'
+        self.interval = self.base_interval
+
+    def _moved(self, previous: float, current: float, delta: float) -> bool:
+        if previous == MISSING or current == MISSING:
+            return False
+        return abs(current - previous) >= delta
+
+    def _is_active(self, record: GpuMetricsRecord) -> bool:
+        activity = self.activity
+        active = False
+        for gpu in record.gpus:
+            current = (gpu.gpu_utilization, gpu.temperature, gpu.power_draw)
+            previous = self._previous.get(gpu.index)
+            self._previous[gpu.index] = current
+            if gpu.gpu_utilization > activity['busy_utilization']:
+                active = True
+            elif previous is None:
+                active = True
+            elif (self._moved(previous[0], current[0], activity['utilization_delta'])
+                  or self._moved(previous[1], current[1], activity['temperature_delta'])
+                  or self._moved(previous[2], current[2], activity['power_delta'])):
+                active = True
+        return active
+
+    def observe(self, record: GpuMetricsRecord, now: Optional[float] = None) -> float:
+        """Update activity from a new sample and return the next interval"""
+        now = time.monotonic() if now is None else now
+        if self._is_active(record):
+            self.last_activity = now
+
+        idle_for = now - self.last_activity
+        level, interval = 'active', self.base_interval
+        for name, idle_time, level_interval in self.levels:
+            if idle_for >= idle_time:
+                level, interval = name, level_interval
+                break
+
+        if level != self.level:
+            logger.info(f"Sampling interval {self.interval}s -> {interval}s ({level})")
+        self.level, self.interval = level, interval
+        return interval
+
+    def get_stats(self) -> Dict:
+        """Scheduler state for diagnostics"""
+        return {
+            'level': self.level,
+            'interval': self.interval,
+            'idle_for': time.monotonic() - self.last_activity
+        }
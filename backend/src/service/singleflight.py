@@ -0,0 +1,61 @@
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+def make_key(endpoint: str, **params) -> Tuple:
+    """Build a coalescing key from an endpoint name and normalized parameters"""
+    return (endpoint, tuple(sorted(params.items())))
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent identical requests: the first caller for a key runs
+    the computation and every caller that arrives while it is in flight
+    awaits the same result instead of starting its own query.
+    """
+
+    def __init__(self):
+        self._in_flight: Dict[Hashable, asyncio.Task] = {}
+        self._counters: Dict[str, Dict[str, int]] = {}
+
+    def _count(self, key: Hashable, outcome: str):
+        endpoint = key[0] if isinstance(key, tuple) else str(key)
+        counters = self._counters.setdefault(endpoint, {'hits': 0, 'misses': 0})
+        counters[outcome] += 1
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Run fn() once per key among concurrent callers and share its result"""
+        task = self._in_flight.get(key)
+        if task is not None:
+            self._count(key, 'hits')
+        else:
+            self._count(key, 'misses')
+            # Run as its own task so a disconnecting caller cannot cancel
+            # the computation the other callers are waiting on
+            task = asyncio.ensure_future(fn())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda t, k=key: self._done(k, t))
+        return await asyncio.shield(task)
+
+    def _done(self, key: Hashable, task: asyncio.Task):
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+        # Mark the exception as retrieved even if every caller went away
+        if not task.cancelled() and task.exception() is not None:
+            logger.debug(f"Coalesced request {key} failed: {task.exception()}")
+
+    def get_stats(self) -> Dict:
+        """Hit/miss counters per endpoint for diagnostics"""
+        hits = sum(c['hits'] for c in self._counters.values())
+        misses = sum(c['misses'] for c in self._counters.values())
+        total = hits + misses
+        return {
+            'hits': hits,
+            'misses': misses,
+            'hit_ratio': hits / total if total else 0.0,
+            'in_flight': len(self._in_flight),
+            'endpoints': {name: dict(c) for name, c in self._counters.items()}
+        }
@@ -0,0 +1,113 @@
+from array import array
+from typing import Dict, Iterator, List
+
+# Stored in place of values nvidia-smi reports as [N/A] or [Not Supported].
+# None of the metrics can legitimately be negative.
+MISSING = -1
+
+# Column order of GPU_METRICS_QUERY
+INT_COLUMNS = (
+    'index', 'fan_speed', 'memory_total', 'memory_used', 'gpu_utilization', 'temperature'
+)
+FLOAT_COLUMNS = ('power_draw', 'power_limit')
+TEXT_COLUMNS = ('name', 'compute_mode')
+COLUMNS = (
+    'index', 'name', 'fan_speed', 'power_draw', 'memory_total', 'memory_used',
+    'gpu_utilization', 'temperature', 'compute_mode', 'power_limit'
+)
+
+
+class GpuColumns:
+    """
+    Column-oriented block of per-GPU readings with one row per GPU.
+    Numeric columns are preallocated typed arrays; missing values hold MISSING.
+    """
+
+    __slots__ = ('size',) + INT_COLUMNS + FLOAT_COLUMNS + TEXT_COLUMNS
+
+    def __init__(self, size: int):
+        self.size = size
+        for name in INT_COLUMNS:
+            setattr(self, name, array('l', bytes(array('l').itemsize * size)))
+        for name in FLOAT_COLUMNS:
+            setattr(self, name, array('d', bytes(8 * size)))
+        for name in TEXT_COLUMNS:
+            setattr(self, name, [''] * size)
+
+    def __len__(self) -> int:
+        return self.size
+
+    def row(self, i: int) -> Dict:
+        """Return row i as a dict keyed by column name"""
+        return {name: getattr(self, name)[i] for name in COLUMNS}
+
+    def rows(self) -> Iterator[Dict]:
+        for i in range(self.size):
+            yield self.row(i)
+
+    @classmethod
+    def from_rows(cls, rows: List[Dict]) -> 'GpuColumns':
+        """Build columns from per-GPU dicts, e.g. readings from NVML"""
+        columns = cls(len(rows))
+        for i, row in enumerate(rows):
+            for name in INT_COLUMNS:
+                getattr(columns, name)[i] = int(row[name])
+            for name in FLOAT_COLUMNS:
+                getattr(columns, name)[i] = float(row[name])
+            for name in TEXT_COLUMNS:
+                getattr(columns, name)[i] = row[name]
+        return columns
+
+
+# int() and float() ignore surrounding whitespace, so numeric fields are
+# converted without stripping them first
+
+def _int(value: str) -> int:
+    if '[' in value:
+        return MISSING
+    try:
+        return int(value)
+    except ValueError:
+        try:
+            return int(float(value))
+        except ValueError:
+            return MISSING
+
+
+def _float(value: str) -> float:
+    if '[' in value:
+        return MISSING
+    try:
+        return float(value)
+    except ValueError:
+        return MISSING
+
+
+def parse_gpu_csv(text: str) -> GpuColumns:
+    """
+    Parse `--query-gpu=<GPU_METRICS_QUERY> --format=csv,noheader,nounits`
+    output in a single pass. Lines with too few fields are skipped and
+    unparseable values become MISSING rather than raising.
+    """
+    lines = [line for line in text.split('\n') if line.count(',') >= 9]
+    columns = GpuColumns(len(lines))
+
+    index, fan_speed, power_draw = columns.index, columns.fan_speed, columns.power_draw
+    memory_total, memory_used = columns.memory_total, columns.memory_used
+    gpu_utilization, temperature = columns.gpu_utilization, columns.temperature
+    power_limit, name, compute_mode = columns.power_limit, columns.name, columns.compute_mode
+
+    for i, line in enumerate(lines):
+        values = line.split(',')
+        index[i] = _int(values[0])
+        name[i] = values[1].strip()
+        fan_speed[i] = _int(values[2])
+        power_draw[i] = _float(values[3])
+        memory_total[i] = _int(values[4])
+        memory_used[i] = _int(values[5])
+        gpu_utilization[i] = _int(values[6])
+        temperature[i] = _int(values[7])
+        compute_mode[i] = values[8].strip()
+        power_limit[i] = _float(values[9])
+
+    return columns
@@ -0,0 +1,404 @@
+import json
+import logging
+import os
+import struct
+import threading
+import time
+import uuid
+import zlib
+from collections import deque
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+from src.models.gpu_metrics import GpuMetricsRecord
+from src.service.settings import settings
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SPOOL = {
+    'enabled': False,
+    'directory': 'data/spool',        # relative paths are under the backend directory
+    'segment_bytes': 16 * 1024 * 1024,
+    'max_bytes': 1024 * 1024 * 1024,  # oldest segments are dropped beyond this
+    'fsync_interval': 0.5,            # seconds between fsyncs of the open segment
+    'fsync_batch': 100,               # ...or once this many records are unsynced
+    'batch_size': 500,                # records per replayed insert
+    'retry_delay': 1.0,               # first delay after a failed replay...
+    'max_retry_delay': 30.0,          # ...doubled up to this
+    'flush_on_shutdown': True
+}
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent.parent
+
+# Record header: payload length, CRC-32 of written_at and payload, written_at
+_HEADER = struct.Struct('<IId')
+_SEGMENT_SUFFIX = '.spool'
+_CHECKPOINT = 'checkpoint.json'
+# Seconds of replays behind replay_rate
+_RATE_WINDOW = 60.0
+
+
+def encode_record(payload: bytes, written_at: float) -> bytes:
+    """One spool record: header followed by the payload"""
+    stamp = struct.pack('<d', written_at)
+    return _HEADER.pack(len(payload), zlib.crc32(payload, zlib.crc32(stamp)), written_at) + payload
+
+
+def read_records(f, end: Optional[int], limit: int) -> Tuple[List[Tuple[float, bytes]], int, bool]:
+    """
+    Read up to limit records from the current position of f, stopping at
+    offset end. Returns (written_at, payload) pairs, the offset after the
+    last good record and whether a damaged record was found there.
+    """
+    records = []
+    offset = f.tell()
+    while len(records) < limit and (end is None or offset + _HEADER.size <= end):
+        header = f.read(_HEADER.size)
+        if len(header) < _HEADER.size:
+            return records, offset, bool(header)
+        length, crc, written_at = _HEADER.unpack(header)
+        payload = f.read(length)
+        if len(payload) < length or zlib.crc32(payload, zlib.crc32(header[8:])) != crc:
+            return records, offset, True
+        records.append((written_at, payload))
+        offset += _HEADER.size + length
+    return records, offset, False
+
+
+class MetricsSpool:
+    """
+    Durable write-behind for samples. Each sample is appended to a local
+    segment file, with a CRC per record, and the open segment is fsynced
+    every fsync_interval seconds or fsync_batch records, so submit never
+    waits on the database. A background thread replays segments in order
+    through the bulk insert path, remembers its position in a checkpoint
+    file and deletes segments once they are replayed. While the database
+    is down replays back off; unreplayed segments survive restarts.
+
+    flush is called as flush(batch, replay=(spool id, positions)) with the
+    (segment, offset) after each record, so the database can store the
+    position with the batch and skip records it already has when a batch
+    is replayed again after a crash.
+    """
+
+    def __init__(self, flush: Callable[..., int],
+                 options: Optional[Dict] = None):
+        self._flush = flush
+        self.options = dict(DEFAULT_SPOOL)
+        self.options.update(options or settings.get('persistence', 'spool', default={}) or {})
+        directory = Path(self.options['directory'])
+        self.directory = directory if directory.is_absolute() else BACKEND_DIR / directory
+
+        self._condition = threading.Condition()
+        self._stop = False
+        self._thread: Optional[threading.Thread] = None
+        self._opened = False
+        self.spool_id: Optional[str] = None
+
+        # Segment sequence numbers, oldest first; the last one is open for appends
+        self._segments = deque()
+        self._active = None
+        self._active_size = 0
+        self._synced_size = 0
+        self._unsynced = 0
+        # Replay position
+        self._read_seq = 0
+        self._read_offset = 0
+        self._pending_since: Optional[float] = None
+
+        self.appended = 0
+        self.replayed = 0
+        self.replays = 0
+        self.failed_replays = 0
+        self.corrupt_records = 0
+        self.dropped_segments = 0
+        self.fsyncs = 0
+        self.last_fsync_duration: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self._replay_log = deque()  # (monotonic time, records)
+
+    def _path(self, seq: int) -> Path:
+        return self.directory / f"{seq:012d}{_SEGMENT_SUFFIX}"
+
+    def _open(self):
+        """Pick up segments left by an earlier run and open a new one for appends"""
+        if self._opened:
+            return
+        self.directory.mkdir(parents=True, exist_ok=True)
+        existing = sorted(int(path.stem) for path in self.directory.glob(f"*{_SEGMENT_SUFFIX}"))
+        try:
+            checkpoint = json.loads((self.directory / _CHECKPOINT).read_text())
+            self._read_seq, self._read_offset = checkpoint['segment'], checkpoint['offset']
+            self.spool_id = checkpoint.get('spool_id')
+        except (OSError, ValueError, KeyError):
+            self._read_seq, self._read_offset = 0, 0
+            self.spool_id = None
+        # Positions are only comparable within one checkpoint, so the id the
+        # database stores them under lives in the checkpoint too
+        new_id = not self.spool_id
+        if new_id:
+            self.spool_id = uuid.uuid4().hex
+        for seq in existing:
+            if seq < self._read_seq:
+                self._path(seq).unlink(missing_ok=True)
+        self._segments.extend(seq for seq in existing if seq >= self._read_seq)
+        if self._segments and self._segments[0] != self._read_seq:
+            self._read_seq, self._read_offset = self._segments[0], 0
+
+        self._start_segment(self._segments[-1] + 1 if self._segments else self._read_seq or 1)
+        if len(self._segments) == 1:
+            self._read_seq, self._read_offset = self._segments[0], 0
+        if new_id:
+            self._write_checkpoint()
+        self._opened = True
+        if len(self._segments) > 1:
+            logger.info(f"Metrics spool has {len(self._segments) - 1} segments to replay")
+
+    def _start_segment(self, seq: int):
+        self._segments.append(seq)
+        self._active = open(self._path(seq), 'ab')
+        self._active_size = self._synced_size = 0
+
+    def _roll(self):
+        """Seal the open segment and start the next one"""
+        self._active.flush()
+        os.fsync(self._active.fileno())
+        self._active.close()
+        self._synced_size = self._active_size
+        self._unsynced = 0
+        self._start_segment(self._segments[-1] + 1)
+        self._enforce_max_bytes()
+
+    def _enforce_max_bytes(self):
+        # Drop the oldest sealed segments, replayed or not, to bound disk use
+        while len(self._segments) > 1 and self._spool_bytes() > self.options['max_bytes']:
+            seq = self._segments.popleft()
+            self._path(seq).unlink(missing_ok=True)
+            self.dropped_segments += 1
+            if seq == self._read_seq:
+                self._read_seq, self._read_offset = self._segments[0], 0
+            logger.warning(f"Metrics spool over {self.options['max_bytes']} bytes; "
+                           f"dropped segment {seq}")
+
+    def _segment_size(self, seq: int) -> int:
+        if seq == self._segments[-1]:
+            return self._active_size
+        try:
+            return self._path(seq).stat().st_size
+        except OSError:
+            return 0
+
+    def _spool_bytes(self) -> int:
+        return sum(self._segment_size(seq) for seq in self._segments)
+
+    def start(self):
+        """Open the spool and start the sync and replay thread"""
+        if self._thread and self._thread.is_alive():
+            return
+        with self._condition:
+            self._open()
+            self._stop = False
+        self._thread = threading.Thread(target=self._run, name="metrics-spool", daemon=True)
+        self._thread.start()
+        logger.info(f"Metrics spool started in {self.directory}")
+
+    def stop(self, flush: Optional[bool] = None, timeout: float = 10.0):
+        """
+        Stop the background thread, then replay what the database accepts
+        within timeout unless flush is False; the rest stays on disk
+        """
+        if flush is None:
+            flush = self.options['flush_on_shutdown']
+        with self._condition:
+            self._stop = True
+            self._condition.notify()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+        if not self._opened:
+            return
+        self._sync()
+        if flush:
+            deadline = time.monotonic() + timeout
+            while time.monotonic() < deadline:
+                replayed = self._replay_batch()
+                if not replayed:
+                    break
+        pending = self.get_stats()['pending_bytes']
+        with self._condition:
+            self._active.close()
+            self._opened = False
+            self._segments.clear()
+        if pending:
+            logger.warning(f"Metrics spool stopped with {pending} bytes left to replay")
+
+    def submit(self, record: GpuMetricsRecord):
+        """Append a sample to the spool; never waits on the database"""
+        data = encode_record(record.model_dump_json().encode('utf-8'), time.time())
+        with self._condition:
+            self._open()
+            self._active.write(data)
+            self._active_size += len(data)
+            self._unsynced += 1
+            self.appended += 1
+            if self._active_size >= self.options['segment_bytes']:
+                self._roll()
+            elif self._unsynced >= self.options['fsync_batch']:
+                self._condition.notify()
+
+    def _sync(self):
+        """fsync the open segment; records become replayable once synced"""
+        with self._condition:
+            if not self._opened or not self._unsynced:
+                return
+            self._active.flush()
+            seq, fileno, size = self._segments[-1], self._active.fileno(), self._active_size
+            self._unsynced = 0
+        started = time.monotonic()
+        try:
+            os.fsync(fileno)
+        except OSError as e:
+            # The segment was rolled and closed meanwhile, which fsynced it
+            logger.debug(f"Metrics spool fsync skipped: {e}")
+        with self._condition:
+            if self._opened and self._segments[-1] == seq:
+                self._synced_size = max(self._synced_size, size)
+        self.fsyncs += 1
+        self.last_fsync_duration = time.monotonic() - started
+
+    def _replay_batch(self) -> Optional[int]:
+        """
+        Replay the next batch of records; returns how many were written,
+        0 when there is nothing to replay and None if the write failed
+        """
+        while True:
+            with self._condition:
+                if not self._opened:
+                    return 0
+                seq, offset = self._read_seq, self._read_offset
+                sealed = seq != self._segments[-1]
+                end = None if sealed else self._synced_size
+            try:
+                with open(self._path(seq), 'rb') as f:
+                    f.seek(offset)
+                    records, new_offset, damaged = read_records(f, end, self.options['batch_size'])
+            except FileNotFoundError:
+                records, new_offset, damaged = [], offset, False
+
+            if damaged:
+                # Nothing after a damaged record can be trusted; skip the rest of the segment
+                self.corrupt_records += 1
+                logger.error(f"Metrics spool segment {seq} is damaged at offset {new_offset}; "
+                             f"skipping the rest of it")
+            if records:
+                break
+            with self._condition:
+                if not sealed or seq != self._read_seq:
+                    if damaged:
+                        self._read_offset = self._synced_size
+                        self._write_checkpoint()
+                    return 0
+                # Sealed segment fully replayed
+                self._segments.remove(seq)
+                self._read_seq, self._read_offset = self._segments[0], 0
+                self._write_checkpoint()
+            self._path(seq).unlink(missing_ok=True)
+
+        self._pending_since = records[0][0]
+        batch = []
+        positions = []
+        end = offset
+        for _, payload in records:
+            end += _HEADER.size + len(payload)
+            try:
+                batch.append(GpuMetricsRecord.model_validate_json(payload))
+                positions.append((seq, end))
+            except ValueError as e:
+                self.corrupt_records += 1
+                logger.error(f"Skipping unreadable spooled sample: {e}")
+        try:
+            if batch:
+                self._flush(batch, replay=(self.spool_id, positions))
+        except Exception as e:
+            self.failed_replays += 1
+            self.last_error = str(e)
+            logger.error(f"Failed to replay {len(batch)} spooled metrics: {e}")
+            return None
+
+        with self._condition:
+            if seq == self._read_seq and self._read_offset == offset:
+                self._read_offset = new_offset
+                self._write_checkpoint()
+        self.replays += 1
+        self.replayed += len(batch)
+        now = time.monotonic()
+        self._replay_log.append((now, len(batch)))
+        while self._replay_log and self._replay_log[0][0] < now - _RATE_WINDOW:
+            self._replay_log.popleft()
+        return len(records)
+
+    def _write_checkpoint(self):
+        # Written after each replayed batch. A crash in between replays that
+        # batch again; the position stored with it in the database skips it
+        path = self.directory / _CHECKPOINT
+        temporary = path.with_suffix('.tmp')
+        temporary.write_text(json.dumps({
+            'segment': self._read_seq, 'offset': self._read_offset, 'spool_id': self.spool_id
+        }))
+        os.replace(temporary, path)
+
+    def _run(self):
+        retry_delay = self.options['retry_delay']
+        next_replay = 0.0
+        while True:
+            with self._condition:
+                if not self._stop:
+                    self._condition.wait(self.options['fsync_interval'])
+                if self._stop:
+                    return
+            self._sync()
+            if time.monotonic() < next_replay:
+                continue
+            while not self._stop:
+                replayed = self._replay_batch()
+                if replayed is None:
+                    # Database is unhappy; back off before retrying
+                    next_replay = time.monotonic() + retry_delay
+                    retry_delay = min(retry_delay * 2, self.options['max_retry_delay'])
+                    break
+                retry_delay = self.options['retry_delay']
+                if not replayed:
+                    break
+                self._sync()
+
+    def get_stats(self) -> Dict:
+        """Spool size, replay lag and replay rate for diagnostics"""
+        with self._condition:
+            segments = len(self._segments)
+            spool_bytes = self._spool_bytes() if self._opened else 0
+            pending_bytes = 0
+            if self._opened:
+                pending_bytes = sum(self._segment_size(seq) for seq in self._segments
+                                    if seq >= self._read_seq) - self._read_offset
+        now = time.monotonic()
+        recent = [(t, n) for t, n in self._replay_log if t >= now - _RATE_WINDOW]
+        return {
+            'running': self._thread is not None and self._thread.is_alive(),
+            'directory': str(self.directory),
+            'spool_id': self.spool_id,
+            'segments': segments,
+            'spool_bytes': spool_bytes,
+            'pending_bytes': pending_bytes,
+            'lag_seconds': (time.time() - self._pending_since
+                            if pending_bytes and self._pending_since else 0.0),
+            'appended': self.appended,
+            'replayed': self.replayed,
+            'replay_rate': sum(n for _, n in recent) / _RATE_WINDOW,
+            'replays': self.replays,
+            'failed_replays': self.failed_replays,
+            'corrupt_records': self.corrupt_records,
+            'dropped_segments': self.dropped_segments,
+            'fsyncs': self.fsyncs,
+            'last_fsync_duration': self.last_fsync_duration,
+            'last_error': self.last_error
+        }
@@ -1,3 +1,4 @@
+import asyncio
 import subprocess
 import shutil
 import logging
@@ -7,10 +8,21 @@ import os
 
 logger = logging.getLogger(__name__)
 
+# Per-GPU metrics query shared by the one-shot and streaming collectors
+GPU_METRICS_QUERY = "--query-gpu=index,name,fan.speed,power.draw,memory.total,memory.used,utilization.gpu,temperature.gpu,compute_mode,power.limit"
+
+# Static per-GPU inventory, loaded once and cached
+GPU_INVENTORY_QUERY = "--query-gpu=index,name,pci.bus_id,memory.total,driver_version"
+
+# Bounds for the nvidia-smi -lms loop interval in milliseconds
+MIN_LOOP_MS = 50
+MAX_LOOP_MS = 3600000
+
 class SystemHealthCheck:
     def __init__(self):
-        # Find nvidia-smi with full path and validate it
-        self.nvidia_smi_path = shutil.which('nvidia-smi')
+        # Find nvidia-smi with full path and validate it. NVIDIA_SMI_PATH
+        # overrides the lookup, e.g. to use tools/fake-nvidia-smi for testing
+        self.nvidia_smi_path = os.environ.get('NVIDIA_SMI_PATH') or shutil.which('nvidia-smi')
         if self.nvidia_smi_path:
             self.nvidia_smi_path = os.path.realpath(self.nvidia_smi_path)
             if not os.path.exists(self.nvidia_smi_path):
@@ -26,10 +38,21 @@ class SystemHealthCheck:
             "--query-gpu=gpu_name",
             "--query-gpu=gpu_name,gpu_bus_id,memory.total,compute_mode",
             "--query-gpu=driver_version",
-            "--query-gpu=index,name,fan.speed,power.draw,memory.total,memory.used,utilization.gpu,temperature.gpu,compute_mode,power.limit",
+            GPU_METRICS_QUERY,
+            GPU_INVENTORY_QUERY,
             "--format=csv,noheader",
             "--format=csv,noheader,nounits"
         ]
+        args = list(args)
+        # Allow a single "-lms <interval>" loop option for streaming mode
+        if "-lms" in args:
+            position = args.index("-lms")
+            if position + 1 >= len(args):
+                return False
+            interval = args[position + 1]
+            if not interval.isdigit() or not MIN_LOOP_MS <= int(interval) <= MAX_LOOP_MS:
+                return False
+            del args[position:position + 2]
         return all(arg in valid_args or arg == self.nvidia_smi_path for arg in args)
 
     def _run_nvidia_command(self, args: List[str]) -> subprocess.CompletedProcess:
@@ -48,6 +71,30 @@ class SystemHealthCheck:
             check=False  # We handle return code manually
         )
 
+    async def _run_nvidia_command_async(self, args: List[str],
+                                        timeout: float = 5) -> subprocess.CompletedProcess:
+        """Run nvidia-smi as an asyncio subprocess, killing it on timeout or cancellation"""
+        if not self.nvidia_smi_path:
+            raise RuntimeError("nvidia-smi not found or not executable")
+
+        if not self._validate_nvidia_command(args):
+            raise ValueError("Invalid nvidia-smi arguments")
+
+        process = await asyncio.create_subprocess_exec(
+            *args,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE
+        )
+        try:
+            stdout, stderr = await asyncio.wait_for(process.communicate(), timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError):
+            process.kill()
+            await process.wait()
+            raise
+        return subprocess.CompletedProcess(
+            args, process.returncode, stdout.decode(), stderr.decode()
+        )
+
     def check_nvidia_smi(self) -> Dict[str, bool | str]:
         """Check if nvidia-smi is available and accessible."""
         if not self.nvidia_smi_path:
@@ -129,14 +176,20 @@ class SystemHealthCheck:
                 "gpus": []
             }
 
-    def check_driver_version(self) -> Dict[str, bool | str]:
-        """Check NVIDIA driver version."""
+    def check_driver_version(self, refresh: bool = False) -> Dict[str, bool | str]:
+        """Check NVIDIA driver version. The version is cached after the first success."""
         if not self.nvidia_smi_path:
             return {
                 "available": False,
                 "error": "nvidia-smi not available"
             }
 
+        if self._driver_version and not refresh:
+            return {
+                "available": True,
+                "version": self._driver_version
+            }
+
         try:
             result = self._run_nvidia_command([
                 self.nvidia_smi_path,
@@ -170,14 +223,20 @@ class SystemHealthCheck:
                 "error": f"Error checking driver version: {str(e)}"
             }
 
-    def check_cuda_version(self) -> Dict[str, bool | str]:
-        """Check CUDA version."""
+    def check_cuda_version(self, refresh: bool = False) -> Dict[str, bool | str]:
+        """Check CUDA version. The version is cached after the first success."""
         if not self.nvidia_smi_path:
             return {
                 "available": False,
                 "error": "nvidia-smi not available"
             }
 
+        if self._cuda_version and not refresh:
+            return {
+                "available": True,
+                "version": self._cuda_version
+            }
+
         try:
             result = self._run_nvidia_command([self.nvidia_smi_path])
             
@@ -238,20 +297,21 @@ class SystemHealthCheck:
 
     def run_full_check(self) -> Dict[str, any]:
         """Run all system health checks."""
-        return {
+        results = {
             "nvidia_smi": self.check_nvidia_smi(),
             "gpus": self.check_gpus(),
             "driver": self.check_driver_version(),
             "cuda": self.check_cuda_version(),
-            "memory": self.check_memory_requirements(),
-            "system_ready": all([
-                self.check_nvidia_smi().get("available", False),
-                self.check_gpus().get("available", False),
-                self.check_driver_version().get("available", False),
-                self.check_cuda_version().get("available", False),
-                self.check_memory_requirements().get("meets_requirements", False)
-            ])
+            "memory": self.check_memory_requirements()
         }
+        results["system_ready"] = all([
+            results["nvidia_smi"].get("available", False),
+            results["gpus"].get("available", False),
+            results["driver"].get("available", False),
+            results["cuda"].get("available", False),
+            results["memory"].get("meets_requirements", False)
+        ])
+        return results
 
     def get_user_friendly_message(self, check_results: Dict[str, any]) -> str:
         """Generate a user-friendly message from check results."""
@@ -0,0 +1,156 @@
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+import json
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pandas as pd
+
+from src.service.analytics_cache import AnalyticsCache
+from src.service.analytics_service import (
+    REPORT_WINDOWS, AnalyticsService, parse_analyses, student_t_sf
+)
+
+END = datetime(2024, 2, 20, 15, 0, tzinfo=timezone.utc)
+
+
+def history_frame(days: int = 30) -> pd.DataFrame:
+    """A cool GPU 0 and a hot GPU 1 sampled every 10 minutes, with one spike on GPU 1"""
+    times = pd.date_range(END - timedelta(days=days), END, freq='10min', inclusive='right')
+    gpus = np.tile(np.array([0, 1], dtype=np.int16), len(times))
+    frame = pd.DataFrame({
+        'timestamp': np.repeat(times, 2),
+        'gpu_index': gpus,
+        'gpu_utilization': np.float32(50),
+        'temperature': np.where(gpus == 1, 80, 60).astype(np.float32),
+        'memory_used': np.float32(4096),
+        'memory_total': np.float32(8192),
+        'power_draw': np.float32(200)
+    })
+    frame.loc[frame.index[-1], 'temperature'] = 95
+    frame.loc[frame.index[:100], 'power_draw'] = np.nan
+    return frame
+
+
+class CountingAnalytics(AnalyticsService):
+    """Serves history_frame() and records each load; bucket partials are not cached"""
+
+    def __init__(self, cache=None):
+        super().__init__(cache or AnalyticsCache({'enabled': False}))
+        self.loads = []
+
+    def load_frame(self, start_time, end_time):
+        self.loads.append((start_time, end_time))
+        frame = history_frame()
+        return frame[(frame['timestamp'] >= start_time) & (frame['timestamp'] <= end_time)]
+
+
+def test_report_loads_history_once():
+    service = CountingAnalytics()
+    report = service.generate_report(end_time=END)
+    assert service.loads == [(END - timedelta(days=30), END)]
+    assert set(report['analyses']) == set(REPORT_WINDOWS)
+    assert set(report['timings_ms']) == {'load', *REPORT_WINDOWS}
+    assert report['rows'] == 30 * 144 * 2
+
+    # Each section only sees its own window
+    anomalies = report['analyses']['anomalies']
+    assert [(anomaly['gpu_index'], anomaly['metric'])
+            for anomaly in anomalies] == [(1, 'temperature')]
+    assert anomalies[0]['timestamp'] == END.isoformat()
+    for gpu in ('0', '1'):
+        memory = report['analyses']['efficiency'][gpu]['memory_efficiency']
+        assert memory['avg_memory_utilization'] == 50
+    assert json.loads(json.dumps(report)) == report
+
+
+def test_report_sections_match_separate_analyses():
+    service = CountingAnalytics()
+    report = service.generate_report(
+        {'trends': timedelta(days=2), 'usage_patterns': timedelta(days=1)}, end_time=END
+    )
+    assert service.loads == [(END - timedelta(days=2), END)]
+    frame = history_frame()
+    day = frame[frame['timestamp'] >= END - timedelta(days=1)]
+    patterns = report['analyses']['usage_patterns']
+    assert set(patterns) == {'0', '1'}
+    assert patterns['0']['utilization_distribution'] == {
+        '0-20%': 0, '21-40%': 0, '41-60%': len(day) // 2, '61-80%': 0, '81-100%': 0
+    }
+    # Each GPU is averaged on its own rather than mixed with the other
+    assert set(patterns['0']['hourly_avg']['temperature'].values()) == {60}
+    assert min(patterns['1']['hourly_avg']['temperature'].values()) == 80
+    assert patterns['1']['peak_usage_times'][1] == {
+        'metric': 'temperature', 'value': 95, 'timestamp': END.isoformat()
+    }
+    trends = report['analyses']['trends']
+    assert trends['0']['temperature_trend']['slope'] == 0
+    assert trends['1']['temperature_trend']['trend_direction'] == 'increasing'
+    assert 'timestamp' in frame.columns and 'hour' not in frame.columns
+
+
+def test_empty_history_and_section_parsing():
+    class EmptyAnalytics(AnalyticsService):
+        def load_frame(self, start_time, end_time):
+            return pd.DataFrame()
+
+    report = EmptyAnalytics(AnalyticsCache({'enabled': False})).generate_report(end_time=END)
+    assert report['rows'] == 0
+    assert report['analyses'] == {
+        'usage_patterns': {}, 'anomalies': [], 'trends': {}, 'efficiency': {}
+    }
+    assert report['errors'] == {}
+
+    assert parse_analyses("trends, anomalies,trends") == ('trends', 'anomalies')
+    for value in ("", "trends,forecast"):
+        try:
+            parse_analyses(value)
+        except ValueError:
+            pass
+        else:
+            raise AssertionError(f"{value!r} accepted")
+
+
+def test_failed_history_load_is_reported():
+    class OfflineAnalytics(AnalyticsService):
+        def __init__(self, cache, tail_rows=None):
+            super().__init__(cache)
+            self.tail_rows = tail_rows
+
+        def load_frame(self, start_time, end_time):
+            # The open tail comes back; older buckets hit the outage
+            if self.tail_rows is not None and end_time - start_time < timedelta(hours=1):
+                return self.tail_rows
+            raise ConnectionError("could not connect to server")
+
+    report = OfflineAnalytics(AnalyticsCache({'enabled': False})).generate_report(end_time=END)
+    assert report['analyses'] == dict.fromkeys(REPORT_WINDOWS)
+    assert report['errors'] == dict.fromkeys(REPORT_WINDOWS, "could not connect to server")
+
+    service = OfflineAnalytics(AnalyticsCache({'enabled': True}), tail_rows=pd.DataFrame())
+    report = service.generate_report(
+        {'trends': timedelta(days=2), 'anomalies': timedelta(minutes=5)}, end_time=END
+    )
+    assert report['analyses'] == {'trends': None, 'anomalies': []}
+    assert report['errors'] == {'trends': "could not connect to server"}
+
+
+def test_student_t_survival_function():
+    # Reference values of scipy.stats.t.sf
+    for t, df, expected in [(0, 5, 0.5), (1, 1, 0.25), (2, 10, 0.03669401738537018),
+                            (-1.5, 3, 0.8847080673775886), (4, 200, 4.456547609296721e-05),
+                            (3, 1e6, 0.0013499312707109)]:
+        assert np.isclose(student_t_sf(t, df), expected, rtol=1e-9, atol=0)
+    assert student_t_sf(float('inf'), 10) == 0.0
+    assert np.isnan(student_t_sf(float('nan'), 10))
+
+
+if __name__ == "__main__":
+    test_report_loads_history_once()
+    test_report_sections_match_separate_analyses()
+    test_empty_history_and_section_parsing()
+    test_failed_history_load_is_reported()
+    test_student_t_survival_function()
+    print("Analytics report tests passed")
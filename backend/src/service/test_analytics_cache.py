@@ -0,0 +1,185 @@
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+import math
+import time
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+
+from src.service.analytics_cache import (
+    AnalyticsCache, build_partials, combine_partials, metric_column
+)
+from src.service.test_analytics import END, CountingAnalytics
+
+
+def noisy_frame(days: int = 3, gpus: int = 3) -> pd.DataFrame:
+    """GPUs sampled every minute with random readings and some gaps"""
+    rng = np.random.default_rng(7)
+    times = pd.date_range(END - timedelta(days=days), END, freq='1min', inclusive='right')
+    rows = len(times) * gpus
+    frame = pd.DataFrame({
+        'timestamp': np.repeat(times, gpus),
+        'gpu_index': np.tile(np.arange(gpus, dtype=np.int16), len(times)),
+        'gpu_utilization': rng.integers(0, 101, rows).astype(np.float32),
+        'temperature': (50 + 0.001 * np.arange(rows) + rng.normal(0, 3, rows)).astype(np.float32),
+        'memory_used': rng.integers(1000, 8000, rows).astype(np.float32),
+        'memory_total': np.float32(8192),
+        'power_draw': rng.uniform(50, 300, rows).astype(np.float32)
+    })
+    frame.loc[rng.choice(rows, rows // 50, replace=False), 'power_draw'] = np.nan
+    return frame
+
+
+class FrameAnalytics(CountingAnalytics):
+    def __init__(self, frame, cache=None):
+        super().__init__(cache)
+        self.frame = frame
+
+    def load_frame(self, start_time, end_time):
+        self.loads.append((start_time, end_time))
+        times = self.frame['timestamp']
+        return self.frame[(times >= start_time) & (times <= end_time)]
+
+
+def assert_close(cached, expected, path="report"):
+    if isinstance(expected, dict):
+        assert set(cached) == set(expected), f"{path}: {set(cached) ^ set(expected)}"
+        for key in expected:
+            assert_close(cached[key], expected[key], f"{path}.{key}")
+    elif isinstance(expected, list):
+        assert len(cached) == len(expected), path
+        for position, (left, right) in enumerate(zip(cached, expected)):
+            assert_close(left, right, f"{path}[{position}]")
+    elif isinstance(expected, float):
+        assert math.isclose(cached, expected, rel_tol=1e-4, abs_tol=1e-9), \
+            f"{path}: {cached} != {expected}"
+    else:
+        assert cached == expected, f"{path}: {cached} != {expected}"
+
+
+def test_partials_merge_like_one_pass():
+    frame = noisy_frame(days=1)
+    parts = build_partials(frame, 3600)
+    assert [part.rows.tolist() for part in parts] == [[59] * 3] + [[60] * 3] * 23 + [[1] * 3]
+    combined = combine_partials(parts)
+    assert combined['gpus'].tolist() == [0, 1, 2] and combined['rows'].tolist() == [1440] * 3
+
+    # GPU 1 on its own, as a single pass over its rows would see it
+    column = metric_column('power_draw')
+    readings = frame.loc[frame['gpu_index'] == 1, 'power_draw'].to_numpy(dtype=np.float64)
+    valid = ~np.isnan(readings)
+    positions = np.arange(len(readings))[valid]
+    values = readings[valid]
+    assert combined['n'][1, column] == valid.sum()
+    assert math.isclose(combined['mean'][1, column], values.mean())
+    assert math.isclose(combined['m2'][1, column], ((values - values.mean()) ** 2).sum())
+    assert math.isclose(combined['x_m2'][1, column], ((positions - positions.mean()) ** 2).sum())
+    assert math.isclose(combined['c_xy'][1, column],
+                        ((positions - positions.mean()) * (values - values.mean())).sum())
+    assert combined['maximum'][1, column] == values.max()
+    assert combined['histogram'].sum() == (frame['gpu_utilization'] > 0).sum()
+
+
+def test_cached_report_matches_full_scan():
+    frame = noisy_frame()
+    windows = {'usage_patterns': timedelta(days=2, minutes=30), 'trends': timedelta(days=3),
+               'efficiency': timedelta(hours=7), 'anomalies': timedelta(hours=5)}
+    expected = FrameAnalytics(frame).generate_report(windows, end_time=END)['analyses']
+
+    service = FrameAnalytics(frame, AnalyticsCache({'enabled': True}))
+    report = service.generate_report(windows, end_time=END)
+    assert report['sources'] == {'usage_patterns': 'partials', 'trends': 'partials',
+                                 'efficiency': 'partials', 'anomalies': 'samples'}
+    assert_close(report['analyses'], expected)
+    stats = service.cache.get_stats()
+    assert stats['buckets'] == 72 and stats['misses'] == 72
+
+    # Second report: every closed bucket comes from the cache
+    service.loads.clear()
+    assert_close(service.generate_report(windows, end_time=END)['analyses'], expected)
+    assert service.loads == [(END - timedelta(hours=5), END), (END - timedelta(days=2, minutes=30),
+                                                               END - timedelta(days=2))]
+    # 72 misses on the first report (55 hits from overlapping windows), then 127 hits
+    stats = service.cache.get_stats()
+    assert (stats['hits'], stats['misses']) == (55 + 127, 72)
+    assert stats['hit_ratio'] == 182 / 254
+
+
+def test_open_tail_is_not_cached():
+    frame = noisy_frame(days=1)
+    cache = AnalyticsCache({'enabled': True, 'settle_seconds': 0})
+    now = time.time()
+    shift = pd.Timedelta(seconds=now - END.timestamp())
+    recent = frame.assign(timestamp=frame['timestamp'] + shift)
+    end = END + shift.to_pytimedelta()
+    service = FrameAnalytics(recent, cache)
+    service.generate_report({'trends': timedelta(hours=3)}, end_time=end)
+    assert cache.closed_before(end.timestamp()) <= now
+    assert all(bucket + 3600 <= now for bucket in cache._entries)
+
+
+def test_eviction_and_expiry():
+    frame = noisy_frame(days=1, gpus=1)
+    parts = build_partials(frame, 3600)
+    cache = AnalyticsCache({'enabled': True, 'max_buckets': 10, 'max_bytes': parts[0].nbytes * 8})
+    for part in parts:
+        cache._put(part)
+    stats = cache.get_stats()
+    assert stats['buckets'] == 8 and stats['evicted'] == len(parts) - 8
+    assert stats['memory_bytes'] <= stats['max_bytes']
+    assert list(cache._entries) == [part.start for part in parts[-8:]]
+
+    cache.ttl = 0
+    time.sleep(0.01)
+    with cache._lock:
+        assert cache._get(parts[-1].start) is None
+    assert cache.get_stats()['expired'] == 1
+
+    try:
+        AnalyticsCache({'bucket_seconds': 7200})
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("bucket_seconds not dividing an hour accepted")
+
+
+def test_late_rows_invalidate_cached_buckets():
+    frame = noisy_frame(days=1)
+    times = frame['timestamp']
+    # The database was down for three hours; the spool replays them later
+    outage = (times > END - timedelta(hours=9)) & (times <= END - timedelta(hours=6))
+    windows = {'usage_patterns': timedelta(days=1), 'trends': timedelta(days=1)}
+    service = FrameAnalytics(frame[~outage], AnalyticsCache({'enabled': True}))
+    service.generate_report(windows, end_time=END)
+
+    service.frame = frame
+    replayed = times[outage]
+    assert service.cache.invalidate(replayed.min().timestamp(), replayed.max().timestamp()) == 4
+    service.loads.clear()
+    report = service.generate_report(windows, end_time=END)
+    expected = FrameAnalytics(frame).generate_report(windows, end_time=END)['analyses']
+    assert_close(report['analyses'], expected)
+    # Only the invalidated buckets are loaded again (after the empty open tail)
+    assert service.loads == [(END, END), (END - timedelta(hours=9), END - timedelta(hours=5))]
+    assert service.cache.get_stats()['invalidated'] == 4
+
+    # Partials loaded before an invalidation are not cached
+    cache = AnalyticsCache({'enabled': True})
+    part = build_partials(frame, 3600)[0]
+    with cache._lock:
+        generation = cache._generation
+    cache.invalidate(part.start, part.start)
+    cache._put(part, generation)
+    assert cache.get_stats()['buckets'] == 0
+
+
+if __name__ == "__main__":
+    test_partials_merge_like_one_pass()
+    test_cached_report_matches_full_scan()
+    test_open_tail_is_not_cached()
+    test_eviction_and_expiry()
+    test_late_rows_invalidate_cached_buckets()
+    print("Analytics cache tests passed")
@@ -0,0 +1,105 @@
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+import tempfile
+from datetime import timedelta
+
+from src.service.analytics_cache import AnalyticsCache
+from src.service.anomaly_detector import AnomalyDetector
+from src.service.smi_parser import MISSING
+from src.service.test_analytics import CountingAnalytics
+from src.service.test_hot_tier import START, at, record_at
+
+OPTIONS = {'warmup': 10, 'half_life': 60, 'cooldown': 30, 'threshold': 4.0}
+
+
+def two_gpu_record(seconds: int, temperature: int = 48, spare_temperature: int = 48, **gpu):
+    """Samples of GPU 0 and GPU 1, with small alternating noise"""
+    noise = 1 if seconds % 2 else -1
+    record = record_at(seconds, temperature=temperature + noise, **gpu)
+    spare = {'index': 1, 'temperature': spare_temperature + noise}
+    record.gpus.append(record.gpus[0].model_copy(update=spare))
+    return record
+
+
+def feed(detector, seconds, **gpu):
+    events = []
+    for second in seconds:
+        events.extend(detector.update(two_gpu_record(second, **gpu)))
+    return events
+
+
+def test_spike_is_reported_once_for_its_gpu():
+    detector = AnomalyDetector({**OPTIONS, 'state_file': '/nonexistent/state.json'})
+    assert feed(detector, range(60)) == []
+
+    events = detector.update(two_gpu_record(60, temperature=70))
+    assert [(event['gpu_index'], event['metric']) for event in events] == [(0, 'temperature')]
+    assert events[0]['timestamp'] == at(60) and events[0]['z_score'] > 4
+    assert events[0]['value'] == 69 and abs(events[0]['expected'] - 48) < 1
+
+    # Still hot: within the cooldown no new event
+    assert feed(detector, range(61, 80), temperature=70) == []
+    assert detector.recent_events(at(50), at(70)) == events
+    assert detector.recent_events(at(50), gpus=[1]) == []
+    stats = detector.get_stats()
+    assert stats['gpus'] == 2 and stats['events'] == 1 and stats['samples'] == 80
+
+
+def test_warmup_missing_readings_and_gaps():
+    detector = AnomalyDetector({**OPTIONS, 'reset_after': 600})
+    # Jumps during the warmup are not reported
+    feed(detector, range(5))
+    assert detector.update(two_gpu_record(5, temperature=90)) == []
+
+    # Missing readings are skipped, not scored
+    feed(detector, range(6, 60), temperature=90)
+    assert detector.update(two_gpu_record(60, temperature=90, power_draw=MISSING)) == []
+
+    # After a long gap the series restarts and warms up again
+    assert feed(detector, [1000], temperature=20) == []
+    assert detector.get_stats()['warming_up'] == 2
+
+
+def test_state_survives_restart():
+    with tempfile.TemporaryDirectory() as directory:
+        options = {**OPTIONS, 'state_file': str(Path(directory) / 'state.json')}
+        detector = AnomalyDetector(options)
+        feed(detector, range(60))
+        detector.update(two_gpu_record(60, spare_temperature=80))
+        assert detector.save() == 2
+
+        restarted = AnomalyDetector(options)
+        restarted.start()
+        assert restarted.get_stats()['warming_up'] == 0
+        assert [event['gpu_index'] for event in restarted.recent_events()] == [1]
+        # No new warmup: the next spike is reported right away
+        events = restarted.update(two_gpu_record(61, temperature=80))
+        assert [(event['gpu_index'], event['metric']) for event in events] == [(0, 'temperature')]
+
+        # State for other metrics is ignored
+        other = AnomalyDetector({**options, 'metrics': ['power_draw']})
+        other.start()
+        assert other.get_stats()['gpus'] == 0
+
+
+def test_report_serves_anomalies_from_detector():
+    detector = AnomalyDetector({**OPTIONS, 'state_file': '/nonexistent/state.json'})
+    feed(detector, range(60))
+    detector.update(two_gpu_record(60, temperature=70))
+
+    service = CountingAnalytics()
+    service.detector = detector
+    report = service.generate_report({'anomalies': timedelta(minutes=5)}, end_time=at(120))
+    assert report['sources'] == {'anomalies': 'detector'}
+    assert service.loads == [] and report['rows'] == 0
+    assert [event['timestamp'] for event in report['analyses']['anomalies']] == [at(60).isoformat()]
+
+
+if __name__ == "__main__":
+    test_spike_is_reported_once_for_its_gpu()
+    test_warmup_missing_readings_and_gaps()
+    test_state_survives_restart()
+    test_report_serves_anomalies_from_detector()
+    print("Anomaly detector tests passed")
@@ -0,0 +1,159 @@
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+from contextlib import contextmanager
+from datetime import datetime
+
+import psycopg2
+
+from src.database.bulk import BulkIngest, GPU_METRICS_COLUMNS, GPU_SAMPLES_COLUMNS
+from src.service.smi_parser import MISSING
+from src.service.test_sampler import make_record
+
+
+class RecordingCursor:
+    def __init__(self, db):
+        self.db = db
+        self.connection = db
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def copy_expert(self, statement, stream):
+        if self.db.reject_copy:
+            raise psycopg2.NotSupportedError("COPY not supported")
+        data = b''
+        while True:
+            chunk = stream.read(64)
+            if not chunk:
+                break
+            data += chunk
+        self.db.copies.append((statement, data.decode('utf-8')))
+
+    def mogrify(self, template, args):
+        return repr(args).encode('utf-8')
+
+    def execute(self, statement, params=None):
+        if params is None:
+            self.db.inserts.append(statement.decode('utf-8'))
+            return
+        self.db.queries.append((' '.join(statement.split()), params))
+        selects = statement.lstrip().startswith('SELECT')
+        self.row = self.db.positions.get(params[0]) if selects else None
+
+    def fetchone(self):
+        return self.row
+
+
+class RecordingDatabase:
+    """Stands in for db.get_connection; records what each path sends"""
+
+    encoding = 'UTF8'
+
+    def __init__(self, reject_copy: bool = False):
+        self.reject_copy = reject_copy
+        self.copies = []
+        self.inserts = []
+        self.queries = []
+        self.positions = {}  # spool_positions rows
+
+    @contextmanager
+    def get_connection(self):
+        yield self
+
+    def cursor(self):
+        return RecordingCursor(self)
+
+
+def test_copy_encodes_rows_in_text_format():
+    db = RecordingDatabase()
+    ingest = BulkIngest(db.get_connection)
+    alerts = [{
+        'gpu_index': 1, 'value': 91.5, 'threshold': 90, 'severity': 'critical',
+        'timestamp': datetime(2024, 2, 20, 15, 25)
+    }]
+    assert ingest.alerts(alerts) == 1
+    statement, data = db.copies[0]
+    assert statement.startswith('COPY alert_history (gpu_index,')
+    assert data == "1\t91.5\t90\tcritical\t2024-02-20T15:25:00\n"
+
+
+def test_copy_escapes_json_and_nulls():
+    db = RecordingDatabase()
+    ingest = BulkIngest(db.get_connection, samples={'enabled': False})
+    record = make_record(60).model_dump()
+    record['gpus'][0]['name'] = 'GPU\twith\\tab'
+    record['timestamp'] = None
+    ingest.gpu_metrics([record])
+    fields = db.copies[0][1].rstrip('\n').split('\t')
+    assert len(fields) == len(GPU_METRICS_COLUMNS)
+    assert fields[3] == 'f' and fields[8] == 't'
+    assert 'GPU\\\\twith\\\\\\\\tab' in fields[6]
+    assert fields[0]  # missing timestamps are filled in
+
+
+def test_gpu_samples_written_in_same_transaction():
+    db = RecordingDatabase()
+    ingest = BulkIngest(db.get_connection, samples={'enabled': True, 'keep_gpus_blob': False})
+    record = make_record(60).model_dump()
+    record['gpus'][0]['fan_speed'] = MISSING
+    assert ingest.gpu_metrics([record]) == 1
+
+    (metrics_statement, metrics), (samples_statement, samples) = db.copies
+    assert metrics_statement.startswith('COPY gpu_metrics')
+    assert metrics.split('\t')[6] == '[]'  # blob no longer filled
+    assert samples_statement.startswith('COPY gpu_samples (timestamp, gpu_index,')
+    fields = samples.rstrip('\n').split('\t')
+    assert len(fields) == len(GPU_SAMPLES_COLUMNS)
+    assert fields[0] == metrics.split('\t')[0]
+    assert fields[1:5] == ['0', 'NVIDIA TITAN Xp', '\\N', '67.17']
+    assert ingest.get_stats()['rows']['copy'] == 2
+
+
+def test_chunks_and_falls_back_to_insert():
+    db = RecordingDatabase(reject_copy=True)
+    ingest = BulkIngest(db.get_connection, {'chunk_size': 2}, {'enabled': False}, rollups=False)
+    records = [make_record(t).model_dump() for t in range(5)]
+    assert ingest.gpu_metrics(iter(records)) == 5
+    assert len(db.inserts) == 3
+    assert all(statement.startswith('INSERT INTO gpu_metrics (timestamp,')
+               for statement in db.inserts)
+    assert db.inserts[2].count('Json object') == 2  # last chunk holds one row
+    stats = ingest.get_stats()
+    assert stats['method'] == 'insert'
+    assert stats['copy_failures'] == 1
+    assert stats['rows'] == {'copy': 0, 'insert': 5}
+
+
+def test_replayed_records_already_written_are_skipped():
+    db = RecordingDatabase()
+    ingest = BulkIngest(db.get_connection, {'chunk_size': 2}, {'enabled': False}, rollups=False)
+    records = [make_record(t).model_dump() for t in range(4)]
+    positions = [(3, 100), (3, 200), (3, 300), (3, 400)]
+
+    # Position (3, 200) was stored by a batch that committed before a crash
+    db.positions['spool-a'] = (3, 200)
+    assert ingest.gpu_metrics(records, replay=('spool-a', positions)) == 2
+
+    # One transaction for the remaining records despite chunk_size, storing the new position
+    assert len(db.copies) == 1 and db.copies[0][1].count('\n') == 2
+    statement, params = db.queries[-1]
+    assert statement.startswith('INSERT INTO spool_positions') and params == ('spool-a', 3, 400)
+    assert ingest.get_stats()['replay_skipped'] == 2
+
+    db.positions['spool-a'] = (3, 400)
+    assert ingest.gpu_metrics(records, replay=('spool-a', positions)) == 0
+    assert len(db.copies) == 1
+
+
+if __name__ == "__main__":
+    test_copy_encodes_rows_in_text_format()
+    test_copy_escapes_json_and_nulls()
+    test_gpu_samples_written_in_same_transaction()
+    test_chunks_and_falls_back_to_insert()
+    test_replayed_records_already_written_are_skipped()
+    print("Bulk ingest tests passed")
@@ -0,0 +1,148 @@
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+import threading
+import time
+
+from psycopg2 import extensions
+
+from src.database.pool import ConnectionPool, PoolTimeout
+
+
+class FakeConnection:
+    def __init__(self, broken: bool = False):
+        self.closed = 0
+        self.broken = broken
+        self.commits = 0
+        self.rollbacks = 0
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def get_transaction_status(self):
+        return extensions.TRANSACTION_STATUS_IDLE
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        self.rollbacks += 1
+
+    def close(self):
+        self.closed = 1
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, query, params=None):
+        if self.conn.broken:
+            raise RuntimeError("server closed the connection unexpectedly")
+
+
+class Connector:
+    def __init__(self):
+        self.connections = []
+
+    def __call__(self):
+        conn = FakeConnection()
+        self.connections.append(conn)
+        return conn
+
+
+def make_pool(connector, **options):
+    defaults = {'min_size': 1, 'max_size': 2, 'max_lifetime': 60.0,
+                'health_check_interval': 30.0, 'acquire_timeout': 0.2}
+    defaults.update(options)
+    return ConnectionPool(connector, defaults)
+
+
+def test_connections_are_reused():
+    connector = Connector()
+    pool = make_pool(connector)
+    for _ in range(5):
+        with pool.connection() as conn:
+            assert conn is connector.connections[0]
+    assert len(connector.connections) == 1
+    assert connector.connections[0].commits == 5
+    stats = pool.get_stats()
+    assert stats['acquired'] == 5 and stats['idle'] == 1 and stats['in_use'] == 0
+
+
+def test_error_rolls_back_and_keeps_connection():
+    connector = Connector()
+    pool = make_pool(connector)
+    try:
+        with pool.connection():
+            raise ValueError("bad query")
+    except ValueError:
+        pass
+    conn = connector.connections[0]
+    assert conn.rollbacks == 1 and conn.commits == 0
+    assert pool.get_stats()['idle'] == 1
+
+
+def test_waits_for_free_connection_and_times_out():
+    connector = Connector()
+    pool = make_pool(connector, max_size=1)
+    held = pool.acquire()
+    try:
+        pool.acquire(timeout=0.05)
+        assert False, "expected PoolTimeout"
+    except PoolTimeout:
+        pass
+
+    # Released by another thread while we wait
+    timer = threading.Timer(0.05, pool.release, args=(held,))
+    timer.start()
+    pooled = pool.acquire(timeout=1.0)
+    assert pooled.conn is held.conn
+    stats = pool.get_stats()
+    assert stats['timeouts'] == 1
+    assert stats['max_wait'] >= 0.04
+
+
+def test_expired_and_unhealthy_connections_are_replaced():
+    connector = Connector()
+    pool = make_pool(connector, max_lifetime=0.05, health_check_interval=0.0)
+    with pool.connection():
+        pass
+    time.sleep(0.06)
+    with pool.connection() as conn:
+        assert conn is connector.connections[1]
+    assert connector.connections[0].closed
+    assert pool.get_stats()['recycled'] == 1
+
+    pool.max_lifetime = 60.0
+    connector.connections[1].broken = True
+    with pool.connection() as conn:
+        assert conn is connector.connections[2]
+    assert pool.get_stats()['failed_health_checks'] == 1
+    assert pool.get_stats()['size'] == 1
+
+
+def test_open_and_close():
+    connector = Connector()
+    pool = make_pool(connector, min_size=2)
+    pool.open()
+    assert pool.get_stats()['idle'] == 2
+    pool.close()
+    assert all(conn.closed for conn in connector.connections)
+    assert pool.get_stats()['size'] == 0
+
+
+if __name__ == "__main__":
+    test_connections_are_reused()
+    test_error_rolls_back_and_keeps_connection()
+    test_waits_for_free_connection_and_times_out()
+    test_expired_and_unhealthy_connections_are_replaced()
+    test_open_and_close()
+    print("Connection pool tests passed")
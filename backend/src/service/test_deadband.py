@@ -0,0 +1,138 @@
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+from datetime import datetime, timedelta, timezone
+
+import psycopg2
+
+from src.database.bulk import BulkIngest
+from src.database.client import DatabaseClient
+from src.database.deadband import DeadbandFilter
+from src.service.smi_parser import MISSING
+from src.service.test_bulk_ingest import RecordingCursor, RecordingDatabase
+from src.service.test_sampler import make_record
+
+START = datetime(2024, 2, 20, 15, 0)
+
+
+def record_at(seconds: float, **gpu):
+    record = make_record(48).model_dump()
+    record['timestamp'] = (START + timedelta(seconds=seconds)).isoformat()
+    record['gpus'][0].update(gpu)
+    return record
+
+
+def test_idle_samples_are_skipped_until_heartbeat():
+    deadband = DeadbandFilter({'enabled': True, 'max_interval': 60})
+    assert deadband.select(record_at(0)) == {0}
+    # Within every deadband: not stored
+    assert deadband.select(record_at(0.25, gpu_utilization=11)) is None
+    assert deadband.select(record_at(30, power_draw=70.0)) is None
+    # Heartbeat
+    assert deadband.select(record_at(60)) == {0}
+    # A move beyond the deadband is compared with the last stored value
+    assert deadband.select(record_at(61, temperature=49)) is None
+    assert deadband.select(record_at(62, temperature=50)) == {0}
+
+    stats = deadband.get_stats()
+    assert stats['records_seen'] == 6 and stats['records_stored'] == 3
+    assert stats['stored_ratio'] == 0.5
+    assert deadband.hold_seconds == 120
+
+
+def test_missing_and_exact_fields_always_count():
+    deadband = DeadbandFilter({'enabled': True, 'deadbands': {'fan_speed': 50}})
+    deadband.select(record_at(0))
+    assert deadband.select(record_at(1, fan_speed=MISSING)) == {0}
+    assert deadband.select(record_at(2, fan_speed=MISSING, compute_mode="Exclusive_Process")) == {0}
+
+    # A record is still stored when only its processes changed
+    record = record_at(3, fan_speed=MISSING, compute_mode="Exclusive_Process")
+    record['processes'] = [{'pid': 1234, 'name': 'python', 'used_memory': 512}]
+    assert deadband.select(record) == set()
+
+
+def test_disabled_filter_keeps_everything():
+    deadband = DeadbandFilter({'enabled': False})
+    assert deadband.select(record_at(0)) == {0}
+    assert deadband.select(record_at(0.25)) == {0}
+    assert deadband.hold_seconds is None
+
+
+def test_bulk_ingest_skips_filtered_rows_but_rolls_up_all():
+    db = RecordingDatabase(reject_copy=True)
+    ingest = BulkIngest(db.get_connection)
+    deadband = DeadbandFilter({'enabled': True})
+    records = [record_at(i * 0.25) for i in range(8)]
+    assert ingest.gpu_metrics(records, deadband) == 1
+    gpu_metrics = [sql for sql in db.inserts if sql.startswith('INSERT INTO gpu_metrics')]
+    assert len(gpu_metrics) == 1 and gpu_metrics[0].count('), (') == 0
+    rollups = [sql for sql in db.inserts if 'gpu_rollup_10s' in sql]
+    # All eight samples reach the rollups
+    assert len(rollups) == 1 and ', 8, ' in rollups[0]
+
+    # A chunk with nothing to store still updates the rollups
+    db.inserts.clear()
+    assert ingest.gpu_metrics([record_at(3)], deadband) == 0
+    assert not any('gpu_metrics' in sql or 'gpu_samples' in sql for sql in db.inserts)
+    assert any('gpu_rollup_1m' in sql for sql in db.inserts)
+
+
+def test_failed_write_is_selected_again_on_retry():
+    class FlakyDatabase(RecordingDatabase):
+        failures = 0
+
+        def cursor(self):
+            cursor = RecordingCursor(self)
+            if self.failures:
+                self.failures -= 1
+
+                def copy_expert(statement, stream):
+                    raise psycopg2.OperationalError("server closed the connection unexpectedly")
+                cursor.copy_expert = copy_expert
+            return cursor
+
+    db = FlakyDatabase()
+    ingest = BulkIngest(db.get_connection)
+    deadband = DeadbandFilter({'enabled': True})
+    assert ingest.gpu_metrics([record_at(0)], deadband) == 1
+    records = [record_at(60 + i * 0.25, temperature=60) for i in range(4)]
+    db.failures = 1
+    try:
+        ingest.gpu_metrics(records, deadband)
+        assert False, "the write should have failed"
+    except psycopg2.OperationalError:
+        pass
+    assert deadband.get_stats()['records_seen'] == 1
+
+    # The retried batch is measured against what was written, not what failed
+    assert ingest.gpu_metrics(records, deadband) == 1
+    samples = [data for statement, data in db.copies if statement.startswith('COPY gpu_samples')]
+    assert len(samples) == 2 and '\t60\t' in samples[1]
+    assert deadband.get_stats()['records_stored'] == 2
+
+
+def test_history_holds_values_between_stored_samples():
+    t0 = START.replace(tzinfo=timezone.utc)
+    samples = [
+        {'timestamp': t0, 'index': 0, 'temperature': 48},
+        {'timestamp': t0, 'index': 1, 'temperature': 60},
+        {'timestamp': t0 + timedelta(seconds=5), 'index': 1, 'temperature': 70},
+    ]
+    results = [{'timestamp': t0 + timedelta(seconds=s), 'gpus': []} for s in (0, 5, 200)]
+    DatabaseClient._hold_samples(results, samples, hold_seconds=120)
+    assert results[0]['gpus'] == [{'index': 0, 'temperature': 48}, {'index': 1, 'temperature': 60}]
+    assert results[1]['gpus'] == [{'index': 0, 'temperature': 48}, {'index': 1, 'temperature': 70}]
+    # Nothing is held past hold_seconds
+    assert results[2]['gpus'] == []
+
+
+if __name__ == "__main__":
+    test_idle_samples_are_skipped_until_heartbeat()
+    test_missing_and_exact_fields_always_count()
+    test_disabled_filter_keeps_everything()
+    test_bulk_ingest_skips_filtered_rows_but_rolls_up_all()
+    test_failed_write_is_selected_again_on_retry()
+    test_history_holds_values_between_stored_samples()
+    print("Deadband tests passed")
@@ -0,0 +1,164 @@
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+import psycopg2
+
+from src.database.frames import (
+    FRAME_METRICS, frame_query, hold_weights, load_gpu_frame, parse_frame_csv
+)
+from src.service.analytics_service import AnalyticsService
+
+CSV = (
+    b"1708441200.25,0,40,67.17,250,12288,135,10,48,50,0.5,1.2,-0.4\n"
+    b"1708441200.25,1,,80.5,250,12288,2000,95,71,75,0,0,0\n"
+)
+
+
+def test_frame_query_reads_typed_columns():
+    query, params = frame_query('start', 'end', ['temperature', 'gpu_utilization'], gpus=[3])
+    assert "FROM gpu_samples" in query and "temperature::real" in query
+    assert "jsonb" not in query and params == ['start', 'end', [3]]
+
+    query, _ = frame_query('start', 'end', ['fan_speed', 'temp_change_rate'], source='blob')
+    assert "nullif((g->>'fan_speed')::real, -1)" in query
+    assert "(g->>'temp_change_rate')::real" in query
+    assert "nullif((g->>'temp_change_rate')" not in query
+    try:
+        frame_query('start', 'end', ['utilization'])
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("unknown metric accepted")
+
+
+def test_parse_frame_csv_has_fixed_dtypes():
+    frame = parse_frame_csv(CSV, FRAME_METRICS)
+    assert frame['timestamp'].iloc[0] == datetime(2024, 2, 20, 15, 0, 0, 250000,
+                                                  tzinfo=timezone.utc)
+    assert frame['gpu_index'].dtype == np.int16
+    assert all(frame[metric].dtype == np.float32 for metric in FRAME_METRICS)
+    assert np.isnan(frame['fan_speed'].iloc[1])
+    assert frame['gpu_utilization'].tolist() == [10, 95]
+
+    empty = parse_frame_csv(b"", ['temperature'])
+    assert list(empty.columns) == ['timestamp', 'gpu_index', 'temperature'] and empty.empty
+    assert empty['temperature'].dtype == np.float32
+
+
+class FrameDatabase:
+    """Answers COPY with CSV, or rejects it and answers the plain query"""
+
+    def __init__(self, reject_copy: bool = False):
+        self.reject_copy = reject_copy
+        self.rolled_back = False
+
+    @contextmanager
+    def get_connection(self):
+        yield self
+
+    def cursor(self):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def rollback(self):
+        self.rolled_back = True
+
+    def mogrify(self, query, params):
+        return query.encode('utf-8')
+
+    def copy_expert(self, statement, buffer):
+        if self.reject_copy:
+            raise psycopg2.NotSupportedError("COPY not supported")
+        assert statement.startswith("COPY (") and statement.endswith("TO STDOUT WITH (FORMAT csv)")
+        buffer.write(b"1708441200,0,48\n1708441201,0,\n")
+
+    def execute(self, query, params):
+        pass
+
+    def fetchall(self):
+        return [(1708441200.0, 0, 48), (1708441201.0, 0, None)]
+
+
+def test_load_gpu_frame_with_and_without_copy():
+    for db in (FrameDatabase(), FrameDatabase(reject_copy=True)):
+        frame = load_gpu_frame(db.get_connection, 'start', 'end', ['temperature'])
+        assert len(frame) == 2 and frame['temperature'].dtype == np.float32
+        assert frame['temperature'].iloc[0] == 48 and np.isnan(frame['temperature'].iloc[1])
+        assert db.rolled_back == db.reject_copy
+
+
+def test_analytics_uses_stored_column_names():
+    frame = parse_frame_csv(CSV, FRAME_METRICS)
+    patterns = AnalyticsService()._usage_patterns(frame)
+    assert patterns[0]['utilization_distribution']['0-20%'] == 1
+    assert patterns[1]['utilization_distribution']['81-100%'] == 1
+    assert patterns[0]['hourly_avg']['gpu_utilization'] == {15: 10}
+
+
+def make_frame(times, utilization) -> pd.DataFrame:
+    columns = {metric: np.full(len(times), 100.0, dtype=np.float32) for metric in FRAME_METRICS}
+    columns['memory_total'][:] = 12288
+    columns['gpu_utilization'] = np.asarray(utilization, dtype=np.float32)
+    frame = pd.DataFrame({'gpu_index': np.zeros(len(times), dtype=np.int16), **columns})
+    frame.insert(0, 'timestamp', pd.to_datetime(np.asarray(times) * 1e6, unit='us', utc=True))
+    return frame
+
+
+def test_held_values_start_each_series():
+    query, params = frame_query('start', 'end', ['temperature'], gpus=[1], hold_seconds=120)
+    assert "DISTINCT ON (gpu_index)" in query and "interval '120.0 seconds'" in query
+    assert query.rstrip().endswith("ORDER BY 1, 2")
+    assert params == ['start', 'start', 'start', [1], 'start', 'end', [1]]
+
+    weights = hold_weights(np.array([0.0, 0.0, 60.0, 0.5, 600.0]), np.array([0, 1, 0, 1, 0]),
+                           end=601.0, hold_seconds=120, interval=0.25)
+    # Until the GPU's next row, capped at hold_seconds, until end for the last one
+    assert weights.tolist() == [240, 2, 480, 480, 4]
+
+
+def test_deadbanded_history_is_weighted_by_time():
+    # Near idle for 30 minutes (stored only at each 60 s heartbeat), then busy
+    # for 30 minutes (every 0.25 s sample stored)
+    hour = 1708441200.0
+    idle = hour + np.arange(0, 1800, 60.0)
+    busy = hour + 1800 + np.arange(0, 1800, 0.25)
+    times = np.r_[idle, busy]
+    frame = make_frame(times, np.r_[np.full(len(idle), 10.0), np.full(len(busy), 100.0)])
+    service = AnalyticsService()
+    assert service._usage_patterns(frame)[0]['hourly_avg']['gpu_utilization'][15] > 99
+
+    frame['weight'] = hold_weights(times, frame['gpu_index'].to_numpy(), hour + 3600, 120, 0.25)
+    patterns = service._usage_patterns(frame)[0]
+    assert patterns['hourly_avg']['gpu_utilization'] == {15: 55.0}
+    assert patterns['utilization_distribution']['0-20%'] == 7200
+    assert patterns['utilization_distribution']['81-100%'] == 7200
+
+    # The same as forward filling the stored rows to the 0.25 s grid
+    grid = hour + np.arange(0, 3600, 0.25)
+    filled = make_frame(grid, np.where(grid < hour + 1800, 10.0, 100.0))
+    weighted, expected = service._trends(frame)[0], service._trends(filled)[0]
+    for name in ('slope', 'r_squared', 'p_value'):
+        assert np.isclose(weighted['utilization_trend'][name], expected['utilization_trend'][name])
+    assert np.isclose(service._efficiency(frame)[0]['power_efficiency']['avg_efficiency'], 0.55)
+    assert np.isclose(service._efficiency(filled)[0]['power_efficiency']['avg_efficiency'], 0.55)
+
+
+if __name__ == "__main__":
+    test_frame_query_reads_typed_columns()
+    test_parse_frame_csv_has_fixed_dtypes()
+    test_load_gpu_frame_with_and_without_copy()
+    test_analytics_uses_stored_column_names()
+    test_held_values_start_each_series()
+    test_deadbanded_history_is_weighted_by_time()
+    print("Frame loader tests passed")
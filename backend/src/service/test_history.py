@@ -0,0 +1,153 @@
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+import json
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+from src.database.history import (
+    format_after, history_query, iter_history, parse_after, parse_fields, parse_gpus, row_json
+)
+from src.database.rollups import fetch_rollups
+
+RECORD_ID = '0b6c1e52-3f4a-4c7e-9d1b-2a5f8e7c6d40'
+
+
+def test_after_cursor_round_trip():
+    timestamp = datetime(2024, 2, 20, 15, 4, 10, 250000, tzinfo=timezone.utc)
+    assert parse_after(format_after(timestamp, RECORD_ID)) == (timestamp, RECORD_ID)
+    # '+' in an unencoded query string arrives as a space
+    parsed = parse_after(f"2024-02-20T15:04:10 00:00,{RECORD_ID}")[0]
+    assert parsed == timestamp.replace(microsecond=0)
+    # Naive timestamps are UTC
+    assert parse_after(f"2024-02-20T15:04:10,{RECORD_ID}")[0].tzinfo == timezone.utc
+    for bad in ("2024-02-20T15:04:10", f"yesterday,{RECORD_ID}", "2024-02-20T15:04:10,42"):
+        try:
+            parse_after(bad)
+        except ValueError:
+            continue
+        raise AssertionError(f"{bad!r} accepted")
+
+
+def test_history_query_keyset_and_limit():
+    after = (datetime(2024, 2, 20, tzinfo=timezone.utc), RECORD_ID)
+    query, params, _ = history_query('start', 'end', after, limit=500)
+    assert "(m.timestamp, m.id) > (%s, %s::uuid)" in query
+    assert query.rstrip().endswith("ORDER BY m.timestamp, m.id LIMIT %s")
+    assert params == ['start', 'end', after[0], RECORD_ID, 500]
+
+    query, params, _ = history_query('start', 'end')
+    assert "LIMIT" not in query and params == ['start', 'end']
+    assert "gpu_samples" not in query
+    assert "gpu_samples" in history_query('start', 'end', rebuild_gpus=True)[0]
+
+
+class NamedCursorDatabase:
+    """Serves rows from a named cursor and records how it was used"""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.cursor_name = None
+        self.itersize = None
+        self.released = False
+
+    @contextmanager
+    def get_connection(self):
+        try:
+            yield self
+        finally:
+            self.released = True
+
+    def cursor(self, name=None):
+        self.cursor_name = name
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, query, params):
+        pass
+
+    def __iter__(self):
+        return iter(self.rows)
+
+
+def test_iter_history_streams_rows_and_cursors():
+    timestamp = datetime(2024, 2, 20, 15, 0, tzinfo=timezone.utc)
+    row = (RECORD_ID, timestamp, 0.1, None, None, '12.2', '535.54',
+           '[{"index": 0, "temperature": 61}]', '[]', True, timestamp)
+    db = NamedCursorDatabase([row, row])
+    rows = iter_history(db.get_connection, 'start', 'end', batch_size=250)
+
+    text, cursor = next(rows)
+    assert db.cursor_name.startswith('history_') and db.itersize == 250
+    decoded = json.loads(text)
+    assert decoded['gpus'] == [{"index": 0, "temperature": 61}]
+    assert decoded['timestamp'] == timestamp.isoformat() and decoded['errors'] is None
+    assert parse_after(cursor) == (timestamp, RECORD_ID)
+
+    rows.close()
+    assert db.released
+
+
+def test_projection_reads_only_selected_fields_and_gpus():
+    assert parse_fields("temperature, power_draw,temperature") == ('temperature', 'power_draw')
+    assert parse_gpus("3,0,3") == (3, 0)
+    for parse, bad in ((parse_fields, "temperature,processes"), (parse_fields, ","),
+                       (parse_gpus, "gpu3"), (parse_gpus, "-1")):
+        try:
+            parse(bad)
+        except ValueError:
+            continue
+        raise AssertionError(f"{bad!r} accepted")
+
+    query, params, columns = history_query('start', 'end', fields=('temperature',), gpus=(3,))
+    assert columns == ('id', 'timestamp', 'gpus')
+    assert "'temperature', coalesce(s.temperature, -1)" in query
+    assert "power_draw" not in query and "processes" not in query and "m.gpus" not in query
+    assert "gpu_index = ANY(%s)" in query
+    # The GPU filter sits in the select list, before the range
+    assert params == [[3], 'start', 'end']
+
+    query, params, _ = history_query('start', 'end', descending=True, gpus=(0,))
+    assert "ORDER BY m.timestamp DESC, m.id DESC" in query
+    assert "'power_draw'" in query
+
+
+class RollupCursor:
+    def __init__(self):
+        self.query = None
+        self.params = None
+
+    def execute(self, query, params):
+        self.query, self.params = query, params
+
+    def fetchall(self):
+        return []
+
+
+def test_rollup_projection():
+    cur = RollupCursor()
+    fetch_rollups(cur, '1m', 'start', 'end', gpus=(3,), fields=('temperature', 'name'))
+    assert "temperature_last" in cur.query and "power_draw_sum" not in cur.query
+    assert "gpu_index = ANY(%s)" in cur.query and cur.params == ['start', 'end', [3]]
+
+
+def test_row_json_passes_jsonb_through():
+    row = (RECORD_ID, None, None, None, None, None, None, '[1,  2]', None, True, None)
+    assert '"gpus":[1,  2]' in row_json(row)
+    assert json.loads(row_json(row))['processes'] is None
+
+
+if __name__ == "__main__":
+    test_after_cursor_round_trip()
+    test_history_query_keyset_and_limit()
+    test_iter_history_streams_rows_and_cursors()
+    test_projection_reads_only_selected_fields_and_gpus()
+    test_rollup_projection()
+    test_row_json_passes_jsonb_through()
+    print("History tests passed")
@@ -0,0 +1,98 @@
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+from src.service.hot_tier import HotTier
+from src.service.sampler import MetricsSampler
+from src.service.smi_parser import MISSING
+from src.service.test_sampler import make_record
+
+START = datetime(2024, 2, 20, 15, 0, tzinfo=timezone.utc)
+
+
+def record_at(seconds: float, temperature: int = 48, **gpu):
+    record = make_record(temperature)
+    record.timestamp = (START + timedelta(seconds=seconds)).replace(tzinfo=None).isoformat()
+    for field, value in gpu.items():
+        setattr(record.gpus[0], field, value)
+    return record
+
+
+def at(seconds: float) -> datetime:
+    return START + timedelta(seconds=seconds)
+
+
+def test_samples_between_matches_database_shape():
+    tier = HotTier({'horizon': 60}, interval=1)
+    for second in range(5):
+        tier.add(record_at(second, temperature=50 + second,
+                           fan_speed=MISSING if second == 2 else 30))
+    samples = tier.samples_between(at(1), at(3))
+    assert [sample['temperature'] for sample in samples] == [51, 52, 53]
+    assert samples[0]['timestamp'] == at(1) and samples[0]['index'] == 0
+    assert samples[1]['fan_speed'] == MISSING
+    assert samples[0]['power_draw'] == 67.17 and samples[0]['name'] == "NVIDIA TITAN Xp"
+
+    projected = tier.samples_between(at(0), at(4), gpus=[0], fields=['temperature'])
+    assert set(projected[0]) == {'timestamp', 'index', 'temperature'}
+    assert tier.samples_between(at(0), at(4), gpus=[1]) == []
+
+
+def test_ring_keeps_only_the_horizon():
+    tier = HotTier({'horizon': 10}, interval=1)
+    for second in range(25):
+        tier.add(record_at(second))
+    assert tier.covered_from() == at(15)
+    # Aligned up to whole buckets so no bucket is split between memory and the database
+    assert tier.covered_from(10) == at(20)
+    assert len(tier.samples_between(at(0), at(30))) == 10
+    # Out-of-order samples are ignored
+    tier.add(record_at(3))
+    assert tier.get_stats()['out_of_order'] == 1
+    stats = tier.get_stats()
+    assert stats['held_samples'] == 10 and stats['memory_bytes'] == stats['max_memory_bytes'] // 64
+
+
+def test_rollups_between_aggregates_buckets():
+    tier = HotTier({'horizon': 60}, interval=1)
+    for second in range(20):
+        tier.add(record_at(second, temperature=40 + second,
+                           gpu_utilization=MISSING if second >= 10 else second))
+    points = tier.rollups_between(10, at(0), at(19))
+    assert [point['bucket'] for point in points] == [at(0), at(10)]
+    first, second = points
+    assert first['samples'] == 10
+    assert first['temperature'] == {'min': 40, 'max': 49, 'avg': 44.5, 'last': 49}
+    assert first['gpu_utilization']['last'] == 9
+    # A bucket without valid readings
+    assert second['gpu_utilization'] == {'min': None, 'max': None, 'avg': None, 'last': None}
+    assert tier.covered_from(10) == at(0)
+
+
+def test_sampler_fills_hot_tier():
+    tier = HotTier({'horizon': 60}, interval=1)
+    second = iter(range(100))
+
+    async def collect():
+        return record_at(next(second))
+
+    sampler = MetricsSampler(collect, interval=0.01)
+    sampler.add_listener(lambda snapshot: tier.add(snapshot.record))
+
+    async def run():
+        await sampler.sample_once()
+        await sampler.sample_once()
+
+    asyncio.run(run())
+    assert tier.get_stats()['samples'] == 2
+
+
+if __name__ == "__main__":
+    test_samples_between_matches_database_shape()
+    test_ring_keeps_only_the_horizon()
+    test_rollups_between_aggregates_buckets()
+    test_sampler_fills_hot_tier()
+    print("Hot tier tests passed")
@@ -0,0 +1,96 @@
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+from src.service.inventory import InventoryCache
+from src.service.metrics_source import SyntheticSource
+
+
+class CountingSource(SyntheticSource):
+    def __init__(self, gpu_count: int):
+        super().__init__(gpu_count=gpu_count)
+        self.inventory_reads = 0
+
+    def read_inventory(self):
+        self.inventory_reads += 1
+        return super().read_inventory()
+
+
+def test_inventory_loaded_once():
+    source = CountingSource(gpu_count=2)
+    cache = InventoryCache(source.read_inventory)
+
+    for _ in range(10):
+        assert cache.get().driver_version == "535.183.01"
+    assert source.inventory_reads == 1
+
+
+def test_inventory_reloads_on_gpu_count_change():
+    source = CountingSource(gpu_count=2)
+    cache = InventoryCache(source.read_inventory)
+    cache.get()
+
+    cache.observe(2)
+    cache.get()
+    assert source.inventory_reads == 1
+
+    source.gpu_count = 3
+    cache.observe(3)
+    assert len(cache.get().gpus) == 3
+    assert source.inventory_reads == 2
+
+
+def test_explicit_refresh_and_invalidate():
+    source = CountingSource(gpu_count=1)
+    cache = InventoryCache(source.read_inventory)
+    cache.get()
+    cache.refresh()
+    cache.invalidate("test")
+    cache.get()
+    assert source.inventory_reads == 3
+    assert cache.get_stats()["loads"] == 3
+
+
+def test_failed_collections_reload_with_backoff():
+    source = CountingSource(gpu_count=2)
+    cache = InventoryCache(source.read_inventory, invalidate_after=3, reload_backoff=60.0)
+    cache.get()
+
+    # A short run of failures keeps the cache
+    cache.collection_failed("test")
+    cache.collection_failed("test")
+    cache.observe(2)
+    cache.collection_failed("test")
+    cache.get()
+    assert source.inventory_reads == 1
+
+    # A longer one drops it once per backoff, however many samples fail
+    for _ in range(20):
+        cache.collection_failed("test")
+        cache.get()
+    assert source.inventory_reads == 2
+
+
+def test_failing_loader_is_not_retried_every_sample():
+    calls = []
+
+    def loader():
+        calls.append(1)
+        raise RuntimeError("nvidia-smi -q failed")
+
+    cache = InventoryCache(loader, reload_backoff=60.0)
+    for _ in range(10):
+        try:
+            cache.get()
+        except RuntimeError as e:
+            assert "nvidia-smi -q failed" in str(e)
+    assert len(calls) == 1
+
+
+if __name__ == "__main__":
+    test_inventory_loaded_once()
+    test_inventory_reloads_on_gpu_count_change()
+    test_explicit_refresh_and_invalidate()
+    test_failed_collections_reload_with_backoff()
+    test_failing_loader_is_not_retried_every_sample()
+    print("Inventory tests passed")
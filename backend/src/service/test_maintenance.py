@@ -0,0 +1,101 @@
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+import asyncio
+from contextlib import contextmanager
+
+from src.database.partitions import PartitionManager
+from src.service.maintenance import PeriodicTask
+
+
+class RecordingDatabase:
+    """Answers partition function calls with a fixed count per call"""
+
+    def __init__(self, result: int = 1):
+        self.calls = []
+        self.result = result
+
+    @contextmanager
+    def get_connection(self):
+        yield self
+
+    def cursor(self):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, query, params):
+        words = query.split()
+        name = words[1].split('(')[0] if words[0] == 'SELECT' else words[0]
+        self.calls.append((name,) + tuple(params))
+
+    def fetchone(self):
+        return (self.result,)
+
+    @property
+    def rowcount(self):
+        return self.result
+
+
+def test_partition_manager_uses_configured_retention():
+    db = RecordingDatabase()
+    manager = PartitionManager(db.get_connection, {
+        'days_to_keep': 7, 'alerts_days_to_keep': 30, 'partitions_ahead': 3
+    })
+    result = manager.maintain()
+    assert set(result['created']) == {
+        'gpu_metrics', 'gpu_samples', 'alert_history', 'gpu_rollup_10s', 'gpu_rollup_1m'
+    }
+    assert ('create_daily_partitions', 'gpu_metrics', 3) in db.calls
+    assert ('drop_expired_partitions', 'gpu_samples', 7) in db.calls
+    assert ('drop_expired_partitions', 'alert_history', 30) in db.calls
+    assert ('drop_expired_partitions', 'gpu_rollup_1m', 90) in db.calls
+    assert ('DELETE', 730) in db.calls  # hourly rollups are not partitioned
+    assert result['deleted'] == {'gpu_rollup_1h': 1}
+    assert manager.get_stats()['dropped'] == 5
+
+
+def test_partition_manager_retention_override():
+    db = RecordingDatabase(result=2)
+    manager = PartitionManager(db.get_connection, {})
+    assert manager.drop_expired({'alert_history': 5}) == {'alert_history': 2}
+    assert db.calls == [('drop_expired_partitions', 'alert_history', 5)]
+
+
+def test_periodic_task_runs_and_survives_errors():
+    outcomes = [RuntimeError("database unavailable"), {'dropped': 1}]
+
+    def job():
+        outcome = outcomes.pop(0) if outcomes else {'dropped': 1}
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    async def run():
+        task = PeriodicTask("test", job, interval=0.01)
+        task.start()
+        for _ in range(100):
+            if task.runs >= 2:
+                break
+            await asyncio.sleep(0.01)
+        await task.stop()
+        return task.get_stats()
+
+    stats = asyncio.run(run())
+    assert stats['runs'] >= 2
+    assert stats['errors'] == 1
+    assert stats['last_result'] == {'dropped': 1}
+    assert stats['last_error'] is None
+    assert not stats['running']
+
+
+if __name__ == "__main__":
+    test_partition_manager_uses_configured_retention()
+    test_partition_manager_retention_override()
+    test_periodic_task_runs_and_survives_errors()
+    print("Maintenance tests passed")
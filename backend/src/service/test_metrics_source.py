@@ -0,0 +1,51 @@
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+import os
+
+from src.service.metrics_source import NvidiaSmiSource, SyntheticSource, create_metrics_source
+from src.service.smi_parser import COLUMNS
+from src.service.system_health import SystemHealthCheck
+
+FAKE_NVIDIA_SMI = str(Path(__file__).resolve().parent.parent.parent / "tools" / "fake-nvidia-smi")
+
+
+def test_synthetic_source_is_deterministic():
+    first, second = SyntheticSource(gpu_count=4), SyntheticSource(gpu_count=4)
+    for _ in range(3):
+        assert list(first.read_gpus().rows()) == list(second.read_gpus().rows())
+
+    readings = first.read_gpus()
+    assert list(readings.index) == [0, 1, 2, 3]
+    assert set(readings.row(0)) == set(COLUMNS)
+
+
+def test_nvidia_smi_source_with_fake_binary():
+    health_check = SystemHealthCheck()
+    health_check.nvidia_smi_path = FAKE_NVIDIA_SMI
+    source = NvidiaSmiSource(health_check, mode="poll")
+
+    inventory = source.read_inventory()
+    assert inventory.driver_version == "535.183.01"
+    assert inventory.cuda_version == "12.2"
+    assert [gpu.bus_id for gpu in inventory.gpus] == ["00000000:01:00.0", "00000000:02:00.0"]
+
+    readings = source.read_gpus()
+    assert len(readings) == 2
+    assert readings.memory_total[1] == 24576
+
+
+def test_source_selected_from_environment():
+    os.environ['GPU_SENTINEL_METRICS_SOURCE'] = 'synthetic'
+    try:
+        assert isinstance(create_metrics_source(), SyntheticSource)
+    finally:
+        del os.environ['GPU_SENTINEL_METRICS_SOURCE']
+
+
+if __name__ == "__main__":
+    test_synthetic_source_is_deterministic()
+    test_nvidia_smi_source_with_fake_binary()
+    test_source_selected_from_environment()
+    print("Metrics source tests passed")
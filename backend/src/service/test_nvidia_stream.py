@@ -0,0 +1,120 @@
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+import os
+import time
+
+from src.service.nvidia_stream import NvidiaSmiStream
+from src.service.system_health import SystemHealthCheck, GPU_METRICS_QUERY
+
+FAKE_NVIDIA_SMI = str(Path(__file__).resolve().parent.parent.parent / "tools" / "fake-nvidia-smi")
+
+
+def make_health_check() -> SystemHealthCheck:
+    health_check = SystemHealthCheck()
+    health_check.nvidia_smi_path = FAKE_NVIDIA_SMI
+    return health_check
+
+
+def wait_for(condition, timeout: float = 5.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.02)
+    return False
+
+
+def test_loop_argument_validation():
+    health_check = make_health_check()
+    base = [FAKE_NVIDIA_SMI, GPU_METRICS_QUERY, "--format=csv,noheader,nounits"]
+
+    assert health_check._validate_nvidia_command(base + ["-lms", "250"])
+    assert not health_check._validate_nvidia_command(base + ["-lms"])
+    assert not health_check._validate_nvidia_command(base + ["-lms", "10"])
+    assert not health_check._validate_nvidia_command(base + ["-lms", "250; rm -rf /"])
+    assert not health_check._validate_nvidia_command(base + ["-lms", "250", "-f", "/tmp/out"])
+
+
+def test_stream_reads_complete_blocks():
+    os.environ["FAKE_NVIDIA_SMI_GPUS"] = "3"
+    stream = NvidiaSmiStream(make_health_check(), interval=0.05)
+    try:
+        stream.start()
+        assert wait_for(lambda: stream.blocks >= 2)
+        lines = stream.read().split("\n")
+        assert [line.split(",")[0] for line in lines] == ["0", "1", "2"]
+        assert len(lines[0].split(",")) == 10
+    finally:
+        stream.stop()
+        del os.environ["FAKE_NVIDIA_SMI_GPUS"]
+
+
+def test_stream_restarts_child():
+    os.environ["FAKE_NVIDIA_SMI_EXIT_AFTER"] = "2"
+    stream = NvidiaSmiStream(make_health_check(), interval=0.05, restart_delay=0.05)
+    try:
+        stream.start()
+        assert wait_for(lambda: stream.restarts >= 2)
+        assert stream.read()
+    finally:
+        stream.stop()
+        del os.environ["FAKE_NVIDIA_SMI_EXIT_AFTER"]
+
+
+def test_stream_restarts_child_at_new_interval():
+    stream = NvidiaSmiStream(make_health_check(), interval=0.05)
+    try:
+        stream.start()
+        assert wait_for(lambda: stream.blocks >= 1)
+        first_pid = stream.get_stats()["pid"]
+
+        stream.set_interval(0.1)
+        assert wait_for(lambda: stream.get_stats()["pid"] not in (None, first_pid))
+        blocks = stream.blocks
+        assert wait_for(lambda: stream.blocks > blocks)
+        assert "-lms" in stream._command() and "100" in stream._command()
+        stats = stream.get_stats()
+        assert stats["interval_ms"] == 100
+        assert stats["interval_changes"] == 1
+        # An interval change is not counted or delayed as a crash
+        assert stats["restarts"] == 0
+        assert stream.read()
+
+        stream.set_interval(0.1)
+        assert stream.get_stats()["interval_changes"] == 1
+    finally:
+        stream.stop()
+
+
+def test_stream_follows_gpu_count_changes():
+    class FakeProcess:
+        def __init__(self, lines):
+            self.stdout = iter(lines)
+
+    stream = NvidiaSmiStream(make_health_check(), interval=0.05)
+    published = []
+    stream._publish = lambda lines: published.append([line.split(",")[0] for line in lines])
+
+    records = [["0", "1"], ["0", "1"], ["0", "1", "2"], ["0", "1", "2"], ["0", "1"], ["0", "1"]]
+    lines = [f"{index}, 45, 30, 10" for record in records for index in record]
+    assert stream._consume(FakeProcess(lines))
+
+    # A record is published early once the previous record's last GPU arrives,
+    # and published again if it grows past it
+    assert published == [
+        ["0", "1"], ["0", "1"],
+        ["0", "1"], ["0", "1", "2"],
+        ["0", "1", "2"],
+        ["0", "1"], ["0", "1"]
+    ]
+
+
+if __name__ == "__main__":
+    test_loop_argument_validation()
+    test_stream_reads_complete_blocks()
+    test_stream_restarts_child()
+    test_stream_restarts_child_at_new_interval()
+    test_stream_follows_gpu_count_changes()
+    print("nvidia-smi stream tests passed")
@@ -0,0 +1,104 @@
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+import asyncio
+import os
+import time
+
+from src.service.inventory import InventoryCache
+from src.service.metrics_source import NvidiaSmiSource, SyntheticSource
+from src.service.pipeline import CollectionPipeline
+from src.service.system_health import SystemHealthCheck
+
+FAKE_NVIDIA_SMI = str(Path(__file__).resolve().parent.parent.parent / "tools" / "fake-nvidia-smi")
+
+
+class RecordingAlerts:
+    def __init__(self):
+        self.checked = []
+
+    def check_metrics(self, metrics):
+        self.checked.append(metrics)
+        return []
+
+
+class SlowDatabase:
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.inserted = []
+
+    def insert_gpu_metrics(self, metrics):
+        time.sleep(self.delay)
+        self.inserted.append(metrics)
+        return {"id": len(self.inserted)}
+
+
+def make_pipeline(source, db=None, timeouts=None):
+    return CollectionPipeline(
+        source, InventoryCache(source.read_inventory), RecordingAlerts(),
+        db or SlowDatabase(), timeouts=timeouts
+    )
+
+
+def test_collect_runs_every_stage():
+    pipeline = make_pipeline(SyntheticSource(gpu_count=3))
+    metrics = asyncio.run(pipeline.collect())
+
+    assert len(metrics.gpus) == 3
+    assert metrics.nvidia_info.driver_version == "535.183.01"
+    assert pipeline.alert_system.checked == [metrics]
+    assert pipeline.db.inserted == [metrics]
+
+
+def test_slow_database_times_out_without_losing_sample():
+    pipeline = make_pipeline(SyntheticSource(), db=SlowDatabase(delay=0.5),
+                             timeouts={'store': 0.05})
+    metrics = asyncio.run(pipeline.collect())
+
+    assert len(metrics.gpus) == 2
+    assert pipeline.get_stats()['stages']['store']['timeouts'] == 1
+
+
+def test_hung_nvidia_smi_does_not_block_event_loop():
+    health_check = SystemHealthCheck()
+    health_check.nvidia_smi_path = FAKE_NVIDIA_SMI
+    pipeline = make_pipeline(NvidiaSmiSource(health_check, mode="poll"),
+                             timeouts={'collect': 0.3})
+
+    async def run():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        ticking = asyncio.ensure_future(ticker())
+        try:
+            await pipeline.collect()
+        except TimeoutError:
+            pass
+        else:
+            raise AssertionError("collect should have timed out")
+        finally:
+            ticking.cancel()
+        return ticks
+
+    os.environ["FAKE_NVIDIA_SMI_HANG"] = "1"
+    try:
+        ticks = asyncio.run(run())
+    finally:
+        del os.environ["FAKE_NVIDIA_SMI_HANG"]
+
+    # The loop kept running while nvidia-smi hung
+    assert ticks >= 10
+    assert pipeline.get_stats()['stages']['collect']['timeouts'] == 1
+
+
+if __name__ == "__main__":
+    test_collect_runs_every_stage()
+    test_slow_database_times_out_without_losing_sample()
+    test_hung_nvidia_smi_does_not_block_event_loop()
+    print("Pipeline tests passed")
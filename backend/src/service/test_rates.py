@@ -0,0 +1,49 @@
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+from src.service.rates import GpuRates, RollingSlope, RESYNC_EVERY
+from src.service.smi_parser import MISSING
+
+
+def test_slope_of_linear_series():
+    slope = RollingSlope(window=30)
+    for t in range(20):
+        value = slope.add(1000.0 + t, 40 + 0.5 * t)
+    assert abs(value - 0.5) < 1e-9
+
+
+def test_old_points_leave_the_window():
+    slope = RollingSlope(window=10)
+    # Rising for a minute, then flat
+    for t in range(60):
+        slope.add(t, float(t))
+    for t in range(60, 80):
+        value = slope.add(t, 60.0)
+    assert abs(value) < 1e-9
+    assert len(slope._points) == 11
+
+
+def test_resync_keeps_slope_accurate():
+    slope = RollingSlope(window=5)
+    for i in range(RESYNC_EVERY + 50):
+        t = 1.7e9 + i * 0.25
+        value = slope.add(t, 2.0 * t - 3.4e9)
+    assert abs(value - 2.0) < 1e-6
+
+
+def test_gpu_rates_are_per_minute_and_skip_missing():
+    rates = GpuRates(window=30)
+    for t in range(10):
+        change = rates.update(t, 50 + t / 60, 100.0 + t, MISSING)
+    assert change['temperature'] == 1.0
+    assert change['power_draw'] == 60.0
+    assert change['gpu_utilization'] == 0.0
+
+
+if __name__ == "__main__":
+    test_slope_of_linear_series()
+    test_old_points_leave_the_window()
+    test_resync_keeps_slope_accurate()
+    test_gpu_rates_are_per_minute_and_skip_missing()
+    print("Rate tests passed")
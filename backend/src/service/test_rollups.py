@@ -0,0 +1,65 @@
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+from datetime import datetime, timezone
+
+from src.database.rollups import aggregate, choose_resolution, rollup_point, ROLLUP_COLUMNS
+from src.service.smi_parser import MISSING
+from src.service.test_sampler import make_record
+
+
+def record_at(second: float, temperature: int):
+    record = make_record(temperature).model_dump()
+    record['timestamp'] = datetime.fromtimestamp(1708441200 + second, timezone.utc).isoformat()
+    return record
+
+
+def test_aggregates_per_resolution():
+    # 1708441200 is 2024-02-20T15:00:00Z, aligned to every bucket width
+    records = [record_at(0, 50), record_at(4, 70), record_at(12, 60)]
+    records[1]['gpus'][0]['fan_speed'] = MISSING
+    groups = aggregate(records)
+
+    assert sorted(groups['10s']) == [(0, 1708441200), (0, 1708441210)]
+    first = groups['10s'][(0, 1708441200)]
+    assert first.samples == 2
+    temperature = first.stats[0]
+    assert temperature == [50, 70, 120.0, 2, 70]
+    fan_speed = first.stats[4]
+    assert fan_speed[3] == 1  # missing reading left out
+
+    minute = groups['1m'][(0, 1708441200)]
+    assert minute.samples == 3
+    assert minute.stats[0][:2] == [50, 70] and minute.stats[0][4] == 60
+
+
+def test_out_of_order_samples_keep_newest_last():
+    groups = aggregate([record_at(8, 80), record_at(2, 40)])
+    assert groups['10s'][(0, 1708441200)].stats[0][4] == 80
+
+
+def test_rollup_point_shape():
+    bucket = aggregate([record_at(0, 50), record_at(1, 70)])['1h'][(0, 1708441200)]
+    row = dict(zip(ROLLUP_COLUMNS, bucket.row(0, 1708441200)))
+    point = rollup_point(row)
+    assert point['samples'] == 2
+    assert point['temperature'] == {'min': 50, 'max': 70, 'avg': 60.0, 'last': 70}
+
+
+def test_choose_resolution():
+    hour, week = 3600, 7 * 86400
+    assert choose_resolution(hour, 20000, raw_interval=0.25) == 'raw'
+    assert choose_resolution(hour, 1000, raw_interval=0.25) == '10s'
+    assert choose_resolution(week, 1000, raw_interval=0.25) == '1h'
+    assert choose_resolution(week, 20000, raw_interval=0.25) == '1m'
+    # Nothing fits: coarsest available
+    assert choose_resolution(week, 10, raw_interval=0.25) == '1h'
+
+
+if __name__ == "__main__":
+    test_aggregates_per_resolution()
+    test_out_of_order_samples_keep_newest_last()
+    test_rollup_point_shape()
+    test_choose_resolution()
+    print("Rollup tests passed")
@@ -0,0 +1,141 @@
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+import asyncio
+import json
+from datetime import datetime
+
+from src.service.sampler import MetricsSampler
+from src.models.gpu_metrics import GpuMetricsRecord, GpuMetrics, NvidiaInfo, GpuBurnMetrics
+
+
+def make_record(temperature: int = 48) -> GpuMetricsRecord:
+    return GpuMetricsRecord(
+        gpu_burn_metrics=GpuBurnMetrics(duration=0, errors=0, running=False),
+        gpus=[
+            GpuMetrics(
+                compute_mode="Default",
+                fan_speed=30,
+                gpu_utilization=10,
+                index=0,
+                memory_total=12288,
+                memory_used=135,
+                name="NVIDIA TITAN Xp",
+                peak_temperature=temperature,
+                power_draw=67.17,
+                power_limit=250,
+                temp_change_rate=0,
+                temperature=temperature
+            )
+        ],
+        nvidia_info=NvidiaInfo(cuda_version="12.2", driver_version="535.183.01"),
+        processes=[],
+        success=True,
+        timestamp=datetime.utcnow().isoformat()
+    )
+
+
+def test_sample_once_publishes_snapshot():
+    async def collect():
+        return make_record(55)
+
+    sampler = MetricsSampler(collect, interval=0.01)
+    assert sampler.snapshot is None
+
+    snapshot = asyncio.run(sampler.sample_once())
+
+    assert sampler.snapshot is snapshot
+    assert snapshot.sequence == 1
+    gpus = json.loads(snapshot.gpus_json)
+    assert gpus[0]["temperature"] == 55
+
+
+def test_loop_keeps_sampling_after_errors():
+    calls = []
+
+    async def collect():
+        calls.append(1)
+        if len(calls) == 1:
+            raise RuntimeError("nvidia-smi not found or not executable")
+        return make_record()
+
+    async def run():
+        sampler = MetricsSampler(collect, interval=0.01)
+        sampler.start()
+        await asyncio.sleep(0.1)
+        await sampler.stop()
+        return sampler
+
+    sampler = asyncio.run(run())
+    stats = sampler.get_stats()
+    assert stats["errors"] == 1
+    assert stats["samples"] >= 1
+    assert not stats["running"]
+
+
+def test_snapshot_turns_stale_while_collection_fails():
+    failing = []
+
+    async def collect():
+        if failing:
+            raise RuntimeError("nvidia-smi has failed")
+        return make_record()
+
+    sampler = MetricsSampler(collect, interval=0.01, stale_after=2)
+    asyncio.run(sampler.sample_once())
+    assert not sampler.is_stale()
+
+    async def run():
+        failing.append(True)
+        sampler.start()
+        await asyncio.sleep(0.05)
+        await sampler.stop()
+
+    asyncio.run(run())
+    assert sampler.last_error == "nvidia-smi has failed"
+    assert sampler.consecutive_errors >= 1
+    assert sampler.snapshot_age() > 0.02
+    assert sampler.is_stale()
+
+    # The next good sample clears the error
+    failing.clear()
+    asyncio.run(sampler.sample_once())
+    assert sampler.last_error is None
+    assert sampler.consecutive_errors == 0
+    assert not sampler.is_stale()
+
+
+def test_interval_changes_are_passed_on():
+    class SteppingScheduler:
+        def __init__(self):
+            self.intervals = iter([0.01, 0.02, 0.02])
+
+        def observe(self, record):
+            return next(self.intervals, 0.02)
+
+        def get_stats(self):
+            return {}
+
+    async def collect():
+        return make_record()
+
+    changes = []
+
+    async def run():
+        sampler = MetricsSampler(collect, interval=0.01, scheduler=SteppingScheduler(),
+                                 on_interval_change=changes.append)
+        sampler.start()
+        await asyncio.sleep(0.1)
+        await sampler.stop()
+
+    asyncio.run(run())
+    assert changes == [0.02]
+
+
+if __name__ == "__main__":
+    test_sample_once_publishes_snapshot()
+    test_loop_keeps_sampling_after_errors()
+    test_snapshot_turns_stale_while_collection_fails()
+    test_interval_changes_are_passed_on()
+    print("Sampler tests passed")
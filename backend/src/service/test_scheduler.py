@@ -0,0 +1,81 @@
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+import asyncio
+
+from src.service.sampler import MetricsSampler
+from src.service.scheduler import AdaptiveScheduler
+from src.service.test_sampler import make_record
+
+THRESHOLDS = {
+    'low': {'idle_time': 30, 'interval': 1.0},
+    'medium': {'idle_time': 300, 'interval': 5.0},
+    'high': {'idle_time': 1800, 'interval': 60.0}
+}
+
+
+def idle_record(temperature: int = 40):
+    record = make_record(temperature)
+    record.gpus[0].gpu_utilization = 0
+    return record
+
+
+def make_scheduler() -> AdaptiveScheduler:
+    return AdaptiveScheduler(base_interval=0.25, max_interval=10.0, thresholds=THRESHOLDS)
+
+
+def test_backs_off_while_idle():
+    scheduler = make_scheduler()
+    idle = idle_record(40)
+
+    assert scheduler.observe(idle, now=0) == 0.25
+    assert scheduler.observe(idle, now=29) == 0.25
+    assert scheduler.observe(idle, now=31) == 1.0
+    assert scheduler.observe(idle, now=400) == 5.0
+    # Capped by max_interval
+    assert scheduler.observe(idle, now=2000) == 10.0
+    assert scheduler.level == 'high'
+
+
+def test_snaps_back_on_activity():
+    scheduler = make_scheduler()
+    scheduler.observe(idle_record(40), now=0)
+    assert scheduler.observe(idle_record(40), now=500) == 5.0
+
+    # A temperature jump resets to the base interval on the next sample
+    assert scheduler.observe(idle_record(45), now=501) == 0.25
+    assert scheduler.level == 'active'
+
+
+def test_busy_gpu_is_never_idle():
+    scheduler = make_scheduler()
+    busy = make_record(40)
+    busy.gpus[0].gpu_utilization = 100
+    scheduler.observe(busy, now=0)
+    assert scheduler.observe(busy, now=5000) == 0.25
+
+
+def test_sampler_uses_deadlines():
+    async def collect():
+        await asyncio.sleep(0.005)
+        return make_record()
+
+    async def run():
+        sampler = MetricsSampler(collect, interval=0.02)
+        sampler.start()
+        await asyncio.sleep(0.41)
+        await sampler.stop()
+        return sampler
+
+    sampler = asyncio.run(run())
+    # Sleep-after-work would give ~16 samples; deadlines keep ~21
+    assert sampler.get_stats()["samples"] >= 19
+
+
+if __name__ == "__main__":
+    test_backs_off_while_idle()
+    test_snaps_back_on_activity()
+    test_busy_gpu_is_never_idle()
+    test_sampler_uses_deadlines()
+    print("Scheduler tests passed")
@@ -0,0 +1,82 @@
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+import asyncio
+
+from src.service.singleflight import SingleFlight, make_key
+
+
+def test_concurrent_identical_requests_share_one_call():
+    calls = []
+
+    async def query():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return ["row"]
+
+    async def run():
+        flight = SingleFlight()
+        key = make_key("history", hours=24)
+        results = await asyncio.gather(*[flight.do(key, query) for _ in range(10)])
+        return flight, results
+
+    flight, results = asyncio.run(run())
+    assert len(calls) == 1
+    assert all(result == ["row"] for result in results)
+    stats = flight.get_stats()
+    assert stats["endpoints"]["history"] == {"hits": 9, "misses": 1}
+    assert stats["in_flight"] == 0
+
+
+def test_distinct_parameters_are_not_coalesced():
+    calls = []
+
+    async def query():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+
+    async def run():
+        flight = SingleFlight()
+        await asyncio.gather(
+            flight.do(make_key("history", hours=1), query),
+            flight.do(make_key("history", hours=2), query),
+        )
+
+    asyncio.run(run())
+    assert len(calls) == 2
+
+
+def test_errors_reach_every_caller_and_cancellation_is_isolated():
+    async def failing():
+        await asyncio.sleep(0.02)
+        raise RuntimeError("database unavailable")
+
+    async def slow():
+        await asyncio.sleep(0.05)
+        return 42
+
+    async def run():
+        flight = SingleFlight()
+        outcomes = await asyncio.gather(
+            flight.do("alerts", failing), flight.do("alerts", failing),
+            return_exceptions=True
+        )
+
+        leader = asyncio.ensure_future(flight.do("history", slow))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(flight.do("history", slow))
+        await asyncio.sleep(0)
+        leader.cancel()
+        return outcomes, await follower
+
+    outcomes, follower_result = asyncio.run(run())
+    assert all(isinstance(o, RuntimeError) for o in outcomes)
+    assert follower_result == 42
+
+
+if __name__ == "__main__":
+    test_concurrent_identical_requests_share_one_call()
+    test_distinct_parameters_are_not_coalesced()
+    test_errors_reach_every_caller_and_cancellation_is_isolated()
+    print("Single-flight tests passed")
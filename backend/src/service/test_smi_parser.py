@@ -0,0 +1,55 @@
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+from src.service.smi_parser import MISSING, GpuColumns, parse_gpu_csv
+
+SAMPLE = """0, NVIDIA TITAN Xp, 23, 67.17, 12288, 135, 10, 48, Default, 250.00
+1, NVIDIA A100-SXM4-80GB, [N/A], 61.05, 81920, 4, 0, 33, Default, 400.00
+2, NVIDIA A100-SXM4-80GB, [N/A], [Not Supported], 81920, 4, [Unknown Error], 34, \
+Exclusive_Process, [N/A]
+"""
+
+
+def test_parse_typed_columns():
+    columns = parse_gpu_csv(SAMPLE)
+
+    assert len(columns) == 3
+    assert list(columns.index) == [0, 1, 2]
+    assert columns.name[1] == "NVIDIA A100-SXM4-80GB"
+    assert columns.fan_speed[0] == 23
+    assert columns.power_draw[0] == 67.17
+    assert columns.power_limit[1] == 400.0
+    assert columns.memory_total[2] == 81920
+    assert columns.compute_mode[2] == "Exclusive_Process"
+
+
+def test_missing_values_become_sentinels():
+    columns = parse_gpu_csv(SAMPLE)
+
+    assert columns.fan_speed[1] == MISSING
+    assert columns.power_draw[2] == MISSING
+    assert columns.gpu_utilization[2] == MISSING
+    assert columns.power_limit[2] == MISSING
+    # The rest of the row is still parsed
+    assert columns.temperature[2] == 34
+
+
+def test_malformed_lines_are_skipped():
+    columns = parse_gpu_csv("\nNVIDIA-SMI has failed\n" + SAMPLE.splitlines()[0] + "\n")
+    assert len(columns) == 1
+    assert len(parse_gpu_csv("")) == 0
+
+
+def test_from_rows_round_trip():
+    columns = parse_gpu_csv(SAMPLE)
+    rebuilt = GpuColumns.from_rows(list(columns.rows()))
+    assert list(rebuilt.rows()) == list(columns.rows())
+
+
+if __name__ == "__main__":
+    test_parse_typed_columns()
+    test_missing_values_become_sentinels()
+    test_malformed_lines_are_skipped()
+    test_from_rows_round_trip()
+    print("nvidia-smi parser tests passed")
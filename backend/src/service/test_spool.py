@@ -0,0 +1,184 @@
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+import tempfile
+import time
+from contextlib import contextmanager
+
+from psycopg2 import errors
+
+from src.database.bulk import BulkIngest
+from src.database.deadband import DeadbandFilter
+from src.service.spool import MetricsSpool, encode_record, read_records
+from src.service.test_bulk_ingest import RecordingDatabase
+from src.service.test_sampler import make_record
+
+
+def make_spool(directory, flush, **options):
+    return MetricsSpool(flush, {'directory': directory, 'fsync_interval': 0.01,
+                                'retry_delay': 0.01, **options})
+
+
+def wait_for(condition, timeout: float = 5.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+def test_records_round_trip_and_detect_damage():
+    with tempfile.TemporaryFile() as f:
+        f.write(encode_record(b'{"a": 1}', 1.5) + encode_record(b'{"b": 2}', 2.5))
+        f.seek(0)
+        records, offset, damaged = read_records(f, None, 10)
+        assert records == [(1.5, b'{"a": 1}'), (2.5, b'{"b": 2}')] and not damaged
+        assert offset == f.tell()
+
+        # Flip a payload byte of the second record
+        f.seek(offset - 2)
+        f.write(b'X')
+        f.seek(0)
+        records, good_offset, damaged = read_records(f, None, 10)
+        assert len(records) == 1 and damaged and good_offset < offset
+
+
+def test_samples_are_replayed_in_order():
+    written = []
+    with tempfile.TemporaryDirectory() as directory:
+        spool = make_spool(directory, lambda batch, replay=None: written.extend(batch),
+                           batch_size=2)
+        spool.start()
+        for temperature in range(50, 55):
+            spool.submit(make_record(temperature))
+        assert wait_for(lambda: len(written) == 5)
+        spool.stop()
+        assert [record.gpus[0].temperature for record in written] == [50, 51, 52, 53, 54]
+        stats = spool.get_stats()
+        assert stats['appended'] == 5 and stats['replayed'] == 5
+        assert stats['pending_bytes'] == 0 and stats['lag_seconds'] == 0.0
+
+
+def test_outage_keeps_samples_on_disk_across_restarts():
+    written = []
+    database_up = False
+
+    def flush(batch, replay=None):
+        if not database_up:
+            raise ConnectionError("database unavailable")
+        written.extend(batch)
+
+    with tempfile.TemporaryDirectory() as directory:
+        spool = make_spool(directory, flush, segment_bytes=1024)
+        spool.start()
+        for temperature in range(60, 70):
+            spool.submit(make_record(temperature))
+        assert wait_for(lambda: spool.failed_replays > 0)
+        stats = spool.get_stats()
+        assert stats['segments'] > 1 and stats['pending_bytes'] > 0
+        spool.stop()
+        assert not written
+
+        # A new process picks the segments up and replays them once the database is back
+        database_up = True
+        spool = make_spool(directory, flush)
+        spool.start()
+        assert wait_for(lambda: len(written) == 10)
+        spool.stop()
+        assert [record.gpus[0].temperature for record in written] == list(range(60, 70))
+        assert len(list(Path(directory).glob('*.spool'))) == 1
+
+
+def test_max_bytes_drops_oldest_segments():
+    with tempfile.TemporaryDirectory() as directory:
+        spool = make_spool(directory, lambda batch, replay=None: None,
+                           segment_bytes=1024, max_bytes=2048)
+        for temperature in range(40):
+            spool.submit(make_record(temperature))
+        stats = spool.get_stats()
+        assert stats['dropped_segments'] > 0 and stats['spool_bytes'] <= 2048 + 1024
+        spool.stop(flush=False)
+
+
+class TransactionalDatabase(RecordingDatabase):
+    """Keeps what committed transactions wrote and rejects duplicate gpu_samples keys"""
+
+    def __init__(self):
+        super().__init__()
+        self.samples = set()
+        self.rollup_merges = 0
+
+    @contextmanager
+    def get_connection(self):
+        copies, inserts, positions = len(self.copies), len(self.inserts), dict(self.positions)
+        try:
+            yield self
+        except Exception:
+            del self.copies[copies:], self.inserts[inserts:]
+            self.positions = positions
+            raise
+        keys = set()
+        for statement, data in self.copies[copies:]:
+            if statement.startswith('COPY gpu_samples'):
+                keys.update(tuple(line.split('\t')[:2]) for line in data.splitlines())
+        if keys & self.samples:
+            del self.copies[copies:], self.inserts[inserts:]
+            self.positions = positions
+            raise errors.UniqueViolation(
+                'duplicate key value violates unique constraint "gpu_samples_pkey"')
+        self.samples |= keys
+        self.rollup_merges += sum('gpu_rollup_10s' in statement
+                                  for statement in self.inserts[inserts:])
+        for statement, params in self.queries:
+            if statement.startswith('INSERT INTO spool_positions'):
+                self.positions[params[0]] = params[1:]
+        self.queries.clear()
+
+
+def test_batch_replayed_after_crash_is_written_once():
+    db = TransactionalDatabase()
+    ingest = BulkIngest(db.get_connection, samples={'enabled': True})
+
+    def make_flush():
+        # The deadband filter starts empty after a restart, like the service
+        deadband = DeadbandFilter({'enabled': True})
+        return lambda batch, replay=None: ingest.gpu_metrics(
+            (record.model_dump() for record in batch), deadband, replay)
+
+    with tempfile.TemporaryDirectory() as directory:
+        spool = make_spool(directory, make_flush())
+        for temperature in range(50, 53):
+            spool.submit(make_record(temperature))
+        spool._sync()
+        checkpoint = (Path(directory) / 'checkpoint.json').read_text()
+        assert spool._replay_batch() == 3
+        assert len(db.samples) == 3 and db.rollup_merges == 1
+
+        # Crash after the commit but before the checkpoint was saved
+        (Path(directory) / 'checkpoint.json').write_text(checkpoint)
+        spool.stop(flush=False)
+
+        spool = make_spool(directory, make_flush())
+        spool.submit(make_record(60))
+        spool._sync()
+        # The old batch is read again but nothing of it is written
+        assert spool._replay_batch() == 3
+        assert spool.failed_replays == 0
+        assert len(db.samples) == 3 and db.rollup_merges == 1
+        assert ingest.replay_skipped == 3
+
+        # ...and replay moves on to later samples
+        while spool._replay_batch():
+            pass
+        assert len(db.samples) == 4 and db.rollup_merges == 2
+        assert spool.get_stats()['pending_bytes'] == 0
+        spool.stop(flush=False)
+
+
+if __name__ == "__main__":
+    test_records_round_trip_and_detect_damage()
+    test_samples_are_replayed_in_order()
+    test_outage_keeps_samples_on_disk_across_restarts()
+    test_max_bytes_drops_oldest_segments()
+    test_batch_replayed_after_crash_is_written_once()
+    print("Spool tests passed")
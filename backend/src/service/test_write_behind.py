@@ -0,0 +1,97 @@
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+import time
+
+from src.service.test_sampler import make_record
+from src.service.write_behind import WriteBehindBuffer
+
+
+class RecordingDatabase:
+    def __init__(self, fail_times: int = 0):
+        self.batches = []
+        self.fail_times = fail_times
+
+    def insert_gpu_metrics_batch(self, records):
+        if self.fail_times:
+            self.fail_times -= 1
+            raise RuntimeError("connection refused")
+        self.batches.append(list(records))
+        return len(records)
+
+
+def make_buffer(db, **options):
+    defaults = {'batch_size': 10, 'max_latency': 5.0, 'max_queue': 100, 'retry_delay': 0.01}
+    defaults.update(options)
+    return WriteBehindBuffer(db.insert_gpu_metrics_batch, defaults)
+
+
+def wait_for(condition, timeout: float = 2.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def test_flushes_full_batches_in_one_call():
+    db = RecordingDatabase()
+    buffer = make_buffer(db)
+    buffer.start()
+    try:
+        for temperature in range(25):
+            buffer.submit(make_record(temperature))
+        assert wait_for(lambda: len(db.batches) == 2)
+        assert [len(batch) for batch in db.batches] == [10, 10]
+        assert buffer.get_stats()['depth'] == 5
+    finally:
+        buffer.stop()
+    # The remainder is written on shutdown
+    assert [len(batch) for batch in db.batches] == [10, 10, 5]
+
+
+def test_flushes_partial_batch_after_max_latency():
+    db = RecordingDatabase()
+    buffer = make_buffer(db, max_latency=0.05)
+    buffer.start()
+    try:
+        buffer.submit(make_record())
+        assert wait_for(lambda: len(db.batches) == 1)
+    finally:
+        buffer.stop()
+
+
+def test_bounded_queue_drops_oldest():
+    db = RecordingDatabase()
+    buffer = make_buffer(db, max_queue=5)
+    for temperature in range(8):
+        buffer.submit(make_record(temperature))
+    buffer.stop(flush=True)
+
+    written = [record.gpus[0].temperature for batch in db.batches for record in batch]
+    assert written == [3, 4, 5, 6, 7]
+    assert buffer.get_stats()['dropped'] == 3
+
+
+def test_failed_flush_is_retried_in_order():
+    db = RecordingDatabase(fail_times=2)
+    buffer = make_buffer(db, batch_size=3)
+    buffer.start()
+    try:
+        for temperature in range(3):
+            buffer.submit(make_record(temperature))
+        assert wait_for(lambda: len(db.batches) == 1)
+    finally:
+        buffer.stop()
+    assert [record.gpus[0].temperature for record in db.batches[0]] == [0, 1, 2]
+    assert buffer.get_stats()['failed_flushes'] == 2
+
+
+if __name__ == "__main__":
+    test_flushes_full_batches_in_one_call()
+    test_flushes_partial_batch_after_max_latency()
+    test_bounded_queue_drops_oldest()
+    test_failed_flush_is_retried_in_order()
+    print("Write-behind tests passed")
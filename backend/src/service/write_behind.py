@@ -0,0 +1,174 @@
+import logging
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, List, Optional
+
+from src.models.gpu_metrics import GpuMetricsRecord
+from src.service.settings import settings
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WRITE_BEHIND = {
+    'enabled': True,
+    'batch_size': 100,
+    'max_latency': 2.0,
+    'max_queue': 10000,
+    'flush_on_shutdown': True,
+    'retry_delay': 1.0
+}
+
+
+class WriteBehindBuffer:
+    """
+    Bounded queue between the sampler and the database. Samples are
+    accepted immediately and written by a background thread in a single
+    multi-row statement once batch_size samples are queued or the oldest
+    one has waited max_latency seconds. When the queue is full the oldest
+    samples are dropped and counted.
+    """
+
+    def __init__(self, flush: Callable[[List[GpuMetricsRecord]], int],
+                 options: Optional[Dict] = None):
+        self._flush = flush
+        self.options = dict(DEFAULT_WRITE_BEHIND)
+        self.options.update(options or settings.get('persistence', 'write_behind', default={}))
+        self.batch_size = self.options['batch_size']
+        self.max_latency = self.options['max_latency']
+        self.max_queue = self.options['max_queue']
+
+        self._queue = deque()  # (enqueued_at, record)
+        self._condition = threading.Condition()
+        self._stop = False
+        self._thread: Optional[threading.Thread] = None
+
+        self.submitted = 0
+        self.flushed = 0
+        self.dropped = 0
+        self.failed_flushes = 0
+        self.flushes = 0
+        self.last_flush_size = 0
+        self.last_flush_duration: Optional[float] = None
+        self.max_flush_duration = 0.0
+        self._total_flush_duration = 0.0
+        self.last_error: Optional[str] = None
+
+    def start(self):
+        """Start the flush thread"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop = False
+        self._thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+        self._thread.start()
+        logger.info(f"Write-behind buffer started (batch {self.batch_size}, "
+                    f"max latency {self.max_latency}s)")
+
+    def stop(self, flush: Optional[bool] = None, timeout: float = 10.0):
+        """Stop the flush thread, writing out queued samples unless flush is False"""
+        if flush is None:
+            flush = self.options['flush_on_shutdown']
+        with self._condition:
+            self._stop = True
+            self._condition.notify()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+        if flush:
+            while self._queue and self._flush_batch():
+                pass
+        if self._queue:
+            logger.warning(f"Write-behind buffer stopped with {len(self._queue)} unsaved samples")
+
+    def submit(self, record: GpuMetricsRecord):
+        """Queue a sample for writing; never blocks on the database"""
+        with self._condition:
+            if len(self._queue) >= self.max_queue:
+                self._queue.popleft()
+                self.dropped += 1
+            self._queue.append((time.monotonic(), record))
+            self.submitted += 1
+            # Wake the flusher to start the max_latency clock or flush a full batch
+            if len(self._queue) == 1 or len(self._queue) >= self.batch_size:
+                self._condition.notify()
+
+    def _take_batch(self) -> List:
+        batch = []
+        while self._queue and len(batch) < self.batch_size:
+            batch.append(self._queue.popleft())
+        return batch
+
+    def _flush_batch(self) -> bool:
+        """Write one batch; on failure put it back at the front of the queue"""
+        with self._condition:
+            batch = self._take_batch()
+        if not batch:
+            return True
+
+        started = time.monotonic()
+        try:
+            self._flush([record for _, record in batch])
+        except Exception as e:
+            self.failed_flushes += 1
+            self.last_error = str(e)
+            logger.error(f"Failed to flush {len(batch)} metrics: {e}")
+            with self._condition:
+                # Requeue in order, keeping the newest samples if space ran out
+                space = self.max_queue - len(self._queue)
+                if space < len(batch):
+                    self.dropped += len(batch) - space
+                    batch = batch[len(batch) - space:] if space > 0 else []
+                self._queue.extendleft(reversed(batch))
+            return False
+
+        duration = time.monotonic() - started
+        self.flushes += 1
+        self.flushed += len(batch)
+        self.last_flush_size = len(batch)
+        self.last_flush_duration = duration
+        self.max_flush_duration = max(self.max_flush_duration, duration)
+        self._total_flush_duration += duration
+        return True
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._stop:
+                    if len(self._queue) >= self.batch_size:
+                        break
+                    if self._queue:
+                        wait = self._queue[0][0] + self.max_latency - time.monotonic()
+                        if wait <= 0:
+                            break
+                    else:
+                        wait = None
+                    self._condition.wait(wait)
+                if self._stop:
+                    return
+
+            if not self._flush_batch():
+                # Database is unhappy; back off before retrying
+                with self._condition:
+                    self._condition.wait_for(lambda: self._stop, self.options['retry_delay'])
+
+    def get_stats(self) -> Dict:
+        """Queue depth and flush timings for diagnostics"""
+        with self._condition:
+            depth = len(self._queue)
+            oldest_age = time.monotonic() - self._queue[0][0] if self._queue else 0.0
+        return {
+            'running': self._thread is not None and self._thread.is_alive(),
+            'depth': depth,
+            'max_queue': self.max_queue,
+            'oldest_age': oldest_age,
+            'submitted': self.submitted,
+            'flushed': self.flushed,
+            'dropped': self.dropped,
+            'flushes': self.flushes,
+            'failed_flushes': self.failed_flushes,
+            'last_flush_size': self.last_flush_size,
+            'last_flush_duration': self.last_flush_duration,
+            'avg_flush_duration': (self._total_flush_duration / self.flushes
+                                   if self.flushes else None),
+            'max_flush_duration': self.max_flush_duration,
+            'last_error': self.last_error
+        }
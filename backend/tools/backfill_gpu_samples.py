@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""
+Backfill gpu_samples from the gpus JSONB blobs in gpu_metrics.
+
+Calls backfill_gpu_samples() (migrations/003_create_gpu_samples_table.sql)
+in a loop, one short transaction per chunk, so the collector keeps writing
+while it runs. Safe to re-run or resume with --after: samples already in
+gpu_samples are skipped.
+
+Usage:
+    python tools/backfill_gpu_samples.py [--chunk-rows 5000] [--after 2024-02-20T00:00:00Z]
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from src.database.client import db
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--chunk-rows', type=int, default=5000,
+                        help='gpu_metrics rows per transaction')
+    parser.add_argument('--after', default=None,
+                        help='only backfill samples newer than this timestamp')
+    args = parser.parse_args()
+
+    after = args.after
+    chunks = 0
+    started = time.monotonic()
+    while True:
+        with db.get_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("SELECT backfill_gpu_samples(%s, %s)", (after, args.chunk_rows))
+                upper = cur.fetchone()[0]
+        if upper is None:
+            break
+        after = upper
+        chunks += 1
+        print(f"chunk {chunks}: up to {upper.isoformat()} ({time.monotonic() - started:.1f}s)")
+
+    print(f"Backfill complete: {chunks} chunks in {time.monotonic() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
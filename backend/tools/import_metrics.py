@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Bulk-load GPU metrics into gpu_metrics.
+
+Accepts the JSON array written by LoggingManager.export_data, or NDJSON
+with one record per line (either exported gpu_metrics rows or
+GpuMetricsRecord documents as served by /api/gpu-stats). Rows are streamed
+through the COPY-based bulk ingest path in chunks of
+persistence.bulk.chunk_size, so files larger than memory are fine in
+NDJSON form.
+
+Usage:
+    python tools/import_metrics.py metrics.ndjson [more.json ...]
+"""
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+from typing import Dict, Iterator
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from src.database.client import db
+
+
+def read_records(path: Path) -> Iterator[Dict]:
+    with open(path) as f:
+        first = f.read(1)
+        while first and first.isspace():
+            first = f.read(1)
+        f.seek(0)
+        if first == '[':
+            yield from json.load(f)
+            return
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('files', nargs='+', type=Path)
+    args = parser.parse_args()
+
+    total = 0
+    started = time.monotonic()
+    for path in args.files:
+        count = db.bulk.gpu_metrics(read_records(path))
+        print(f"{path}: {count} rows")
+        total += count
+    elapsed = time.monotonic() - started
+    stats = db.bulk.get_stats()
+    print(f"Imported {total} rows in {elapsed:.1f}s ({total / max(elapsed, 1e-9):.0f} rows/s, "
+          f"method {stats['method']})")
+
+
+if __name__ == "__main__":
+    main()